@@ -0,0 +1,68 @@
+"""Latency of deepl_translate_structured versus line count.
+
+Compares the batched implementation against the previous one-request-per-line
+loop, both against a local DeepL stub with a fixed per-request latency.
+
+    python -m benchmarks.bench_deepl_structured [--latency-ms 50]
+"""
+
+import argparse
+import asyncio
+import time
+
+import translate_core
+from benchmarks.stubs import Profile, deepl_stub
+
+
+LINE_COUNTS = [1, 5, 10, 20, 40, 60]
+
+
+async def _per_line(text: str, target_lang: str) -> dict:
+    translated = []
+    for line in text.splitlines():
+        if not line.strip():
+            translated.append(line)
+            continue
+        result = await translate_core.deepl_translate(line, target_lang)
+        if not result["ok"]:
+            return result
+        translated.append(result["text"])
+    return {"ok": True, "text": "\n".join(translated)}
+
+
+async def _measure(stub, func, text: str) -> tuple[float, int]:
+    before = stub.requests
+    started = time.perf_counter()
+    result = await func(text, "EN")
+    elapsed = time.perf_counter() - started
+    assert result["ok"], result
+    return elapsed, stub.requests - before
+
+
+async def _run(latency_ms: float) -> None:
+    with deepl_stub(Profile(latency_seconds=latency_ms / 1000)) as stub:
+        translate_core.DEEPL_API_URL = f"{stub.url}/v2/translate"
+        translate_core.DEEPL_API_KEY = translate_core.DEEPL_API_KEY or "bench"
+        print(f"stub latency: {latency_ms:.0f} ms per request")
+        print(f"{'lines':>5} {'per-line ms':>12} {'reqs':>5} {'batched ms':>11} {'reqs':>5}")
+        for count in LINE_COUNTS:
+            text = "\n".join(f"{i + 1}. item number {i + 1}" for i in range(count))
+            old_seconds, old_requests = await _measure(stub, _per_line, text)
+            new_seconds, new_requests = await _measure(
+                stub, translate_core.deepl_translate_structured, text
+            )
+            print(
+                f"{count:>5} {old_seconds * 1000:>12.1f} {old_requests:>5} "
+                f"{new_seconds * 1000:>11.1f} {new_requests:>5}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+    asyncio.run(_run(args.latency_ms))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Per-request cost of Mini App initData authentication.
+
+Compares the original path (derive the WebAppData secret, parse and sort the
+query string, then parse it again for the username) with the current
+single-parse check on a cache miss and on a verified-cache hit.
+
+    python -m benchmarks.bench_initdata [--requests 20000]
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import time
+from urllib.parse import parse_qs, unquote
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:bench-token")
+
+import main as app_main  # noqa: E402
+from benchmarks.stubs import signed_initdata  # noqa: E402
+
+
+def _legacy_access(init_data: str, token: str) -> bool:
+    received_hash = None
+    check_pairs = []
+    for pair in init_data.split("&"):
+        key, _, value = pair.partition("=")
+        if key == "hash":
+            received_hash = unquote(value)
+        else:
+            check_pairs.append(f"{key}={unquote(value)}")
+    check_pairs.sort()
+    secret_key = hmac.new(b"WebAppData", token.encode(), hashlib.sha256).digest()
+    computed = hmac.new(secret_key, "\n".join(check_pairs).encode(), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(computed, received_hash):
+        return False
+    user = json.loads(parse_qs(init_data)["user"][0])
+    return bool(user.get("username"))
+
+
+def _time(func, requests: int) -> float:
+    started = time.perf_counter()
+    for _ in range(requests):
+        func()
+    return (time.perf_counter() - started) / requests
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    token = app_main.TELEGRAM_BOT_TOKEN
+    init_data = signed_initdata(token, "bench_user")
+
+    def cold() -> None:
+        app_main._INITDATA_CACHE.clear()
+        app_main._verify_tg_initdata(init_data)
+
+    assert _legacy_access(init_data, token)
+    assert app_main._verify_tg_initdata(init_data).username == "bench_user"
+    results = [
+        ("legacy", _time(lambda: _legacy_access(init_data, token), args.requests)),
+        ("single parse", _time(cold, args.requests)),
+        ("cached", _time(lambda: app_main._verify_tg_initdata(init_data), args.requests)),
+    ]
+    baseline = results[0][1]
+    print(f"{'path':<14} {'us/request':>11} {'speedup':>8}")
+    for name, seconds in results:
+        print(f"{name:<14} {seconds * 1e6:>11.2f} {baseline / seconds:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
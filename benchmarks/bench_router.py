@@ -0,0 +1,76 @@
+"""Router term matching cost: per-term regexes versus the single-pass TermMatcher.
+
+Runs both over 10,000-character inputs and repeats with the term lists
+multiplied (synthetic suffixed terms) to show how each scales with term count.
+
+    python -m benchmarks.bench_router [--repeat 20]
+"""
+
+import argparse
+import random
+import re
+import time
+
+from translate_core import STRONG_TERMS_STT, WEAK_TERMS_STT, TermMatcher, _normalize_router_text
+
+
+def _compile_term_pattern(term: str) -> re.Pattern:
+    words = term.split()
+    has_wildcard = words[-1].endswith("*")
+    if has_wildcard:
+        words[-1] = words[-1][:-1]
+    pattern = r"\b" + r"\s+".join(re.escape(word) for word in words)
+    if has_wildcard:
+        pattern += r"\w*"
+    return re.compile(pattern + r"\b", re.IGNORECASE)
+
+
+def _make_text(length: int) -> str:
+    rng = random.Random(7)
+    words = ["hello", "привет", "hola", "olá", "message", "translation", "сегодня", "amigo", "oral"]
+    parts = []
+    size = 0
+    while size < length:
+        word = rng.choice(words)
+        parts.append(word)
+        size += len(word) + 1
+    return " ".join(parts)[:length]
+
+
+def _expand(terms: list[str], factor: int) -> list[str]:
+    expanded = list(terms)
+    for i in range(1, factor):
+        expanded += [f"{term.rstrip('*')}q{i}" + ("*" if term.endswith("*") else "") for term in terms]
+    return expanded
+
+
+def _time(func, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    normalized = _normalize_router_text(_make_text(10_000))
+    print(f"input: {len(normalized)} chars")
+    print(f"{'terms':>6} {'regex ms':>9} {'matcher ms':>11} {'speedup':>8}")
+    for factor in (1, 4, 16):
+        strong = _expand(STRONG_TERMS_STT, factor)
+        weak = _expand(WEAK_TERMS_STT, factor)
+        patterns = [_compile_term_pattern(term) for term in strong + weak]
+        matcher = TermMatcher({"strong": strong, "weak": weak})
+        regex_seconds = _time(lambda: [p.search(normalized) for p in patterns], args.repeat)
+        matcher_seconds = _time(lambda: matcher.match(normalized), args.repeat)
+        print(
+            f"{len(patterns):>6} {regex_seconds * 1000:>9.2f} {matcher_seconds * 1000:>11.2f} "
+            f"{regex_seconds / matcher_seconds:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
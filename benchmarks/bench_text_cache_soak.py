@@ -0,0 +1,76 @@
+"""Simulated multi-day soak of the bot's message text cache.
+
+Drives a TTLCache configured like bot_handlers._TEXT_CACHE with synthetic
+messages on a simulated clock, sweeping at the production interval, and
+reports entries, accounted bytes and traced Python heap per simulated hour.
+Memory should plateau once the TTL window is full and stay flat.
+
+    python -m benchmarks.bench_text_cache_soak [--days 3] [--messages-per-second 5]
+"""
+
+import argparse
+import random
+import sys
+import tracemalloc
+
+import bot_handlers
+from cache import TTLCache
+from message_store import ENTRY_OVERHEAD
+
+
+class SimulatedClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=float, default=3)
+    parser.add_argument("--messages-per-second", type=float, default=5)
+    parser.add_argument("--sweep-seconds", type=float, default=60)
+    args = parser.parse_args()
+
+    clock = SimulatedClock()
+    cache = TTLCache(
+        "soak",
+        max_entries=bot_handlers.TEXT_CACHE_MAX_ENTRIES,
+        ttl_seconds=bot_handlers.TEXT_CACHE_TTL_SECONDS,
+        max_bytes=bot_handlers.TEXT_CACHE_MAX_BYTES,
+        clock=clock,
+    )
+    rng = random.Random(3)
+    step = 1 / args.messages_per_second
+    total_seconds = args.days * 24 * 3600
+    next_sweep = args.sweep_seconds
+    next_report = 0.0
+    message_id = 0
+
+    tracemalloc.start()
+    print(f"{'hour':>6} {'entries':>8} {'bytes':>11} {'heap MiB':>9} {'evictions':>10}")
+    while clock.now < total_seconds:
+        message_id += 1
+        text = "x" * rng.randint(5, 800)
+        cache.set(
+            bot_handlers._make_cache_key(rng.randint(1, 5000), message_id),
+            (text, "text"),
+            size=sys.getsizeof(text) + ENTRY_OVERHEAD,
+        )
+        clock.now += step
+        if clock.now >= next_sweep:
+            cache.sweep()
+            next_sweep += args.sweep_seconds
+        if clock.now >= next_report:
+            heap, _ = tracemalloc.get_traced_memory()
+            stats = cache.stats()
+            print(
+                f"{clock.now / 3600:>6.0f} {stats['entries']:>8} {stats['bytes']:>11} "
+                f"{heap / 2**20:>9.1f} {stats['evictions']:>10}"
+            )
+            next_report += 6 * 3600
+
+
+if __name__ == "__main__":
+    main()
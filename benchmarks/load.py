@@ -0,0 +1,357 @@
+"""Load test of /api/translate, /api/translate/batch and /tg/webhook against local stubs.
+
+Starts OpenAI, DeepL and Telegram stubs in this process and the service
+itself under uvicorn in a subprocess pointed at them, then drives each
+workload at increasing concurrency (a ``batch`` request carries
+BATCH_ITEMS texts). For every step it reports req/s, p50/p95/p99 latency
+and the peak thread and socket count of the server process. Results can
+be saved as JSON and compared against a baseline:
+
+    python -m benchmarks.load --output benchmarks/results/base.json
+    python -m benchmarks.load --openai-profile latency_ms=400,rate_limit_rate=0.05
+    python -m benchmarks.load --compare benchmarks/results/base.json benchmarks/results/new.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+from benchmarks.stubs import Profile, deepl_stub, openai_stub, signed_initdata, telegram_stub
+
+
+ROOT = Path(__file__).resolve().parent.parent
+BOT_TOKEN = "123456:bench-token"
+WEBHOOK_SECRET = "bench-webhook-secret"
+WORKLOADS = ("translate", "batch", "webhook")
+BATCH_ITEMS = 50
+# Relative change that counts as a regression in --compare.
+REGRESSION_THRESHOLD = 0.10
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _process_usage(pid: int) -> tuple[Optional[int], Optional[int]]:
+    """Threads and open sockets of ``pid``; ``None`` where /proc is unavailable."""
+    try:
+        threads = len(os.listdir(f"/proc/{pid}/task"))
+        sockets = 0
+        for fd in os.listdir(f"/proc/{pid}/fd"):
+            try:
+                if os.readlink(f"/proc/{pid}/fd/{fd}").startswith("socket:"):
+                    sockets += 1
+            except OSError:
+                continue
+        return threads, sockets
+    except OSError:
+        return None, None
+
+
+def _percentile(ordered: list[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+def _start_server(port: int, stubs: dict, cache: bool) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": "sk-bench",
+        "DEEPL_API_KEY": "bench",
+        "OPENAI_CHAT_URL": f"{stubs['openai'].url}/v1/chat/completions",
+        "OPENAI_STT_URL": f"{stubs['openai'].url}/v1/audio/transcriptions",
+        "DEEPL_API_URL": f"{stubs['deepl'].url}/v2/translate",
+        "TELEGRAM_BOT_TOKEN": BOT_TOKEN,
+        "TELEGRAM_API_BASE_URL": stubs["telegram"].url,
+        "TG_WEBHOOK_SECRET": WEBHOOK_SECRET,
+        "TG_ALLOWED_USERNAMES": "",
+    }
+    if not cache:
+        env["TRANSLATION_CACHE_MAX_ENTRIES"] = "0"
+    command = [
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--log-level", "warning", "--no-access-log",
+    ]
+    return subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL)
+
+
+async def _wait_until_healthy(client: httpx.AsyncClient, server: subprocess.Popen) -> None:
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"server exited with {server.returncode}")
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError("server did not become healthy")
+
+
+def _make_request(workload: str, index: int, initdata: str) -> dict:
+    if workload == "translate":
+        return {
+            "url": "/api/translate",
+            "json": {"text": f"Hello, this is benchmark message number {index}.", "target": "ru"},
+            "headers": {"X-TG-INITDATA": initdata},
+        }
+    if workload == "batch":
+        items = [
+            {"text": f"Benchmark string {index}-{item}.", "target": "ru" if item % 2 else "en"}
+            for item in range(BATCH_ITEMS)
+        ]
+        return {
+            "url": "/api/translate/batch",
+            "json": {"items": items},
+            "headers": {"X-TG-INITDATA": initdata},
+        }
+    update = {
+        "update_id": index,
+        "message": {
+            "message_id": index,
+            "date": int(time.time()),
+            "chat": {"id": 1000 + index % 50, "type": "private"},
+            "from": {
+                "id": 1000 + index % 50,
+                "is_bot": False,
+                "first_name": "Bench",
+                "username": "bench",
+            },
+            "text": f"Hello, this is benchmark message number {index}.",
+        },
+    }
+    return {
+        "url": "/tg/webhook",
+        "json": update,
+        "headers": {"X-Telegram-Bot-Api-Secret-Token": WEBHOOK_SECRET},
+    }
+
+
+async def _run_step(
+    client: httpx.AsyncClient,
+    server: subprocess.Popen,
+    stubs: dict,
+    workload: str,
+    concurrency: int,
+    requests: int,
+    offset: int,
+) -> dict:
+    initdata = signed_initdata(BOT_TOKEN, "bench")
+    latencies: list[float] = []
+    statuses: dict[str, int] = {}
+    upstream_before = {name: stub.stats() for name, stub in stubs.items()}
+    peak = {"threads": None, "sockets": None}
+    next_index = iter(range(offset, offset + requests))
+    done = asyncio.Event()
+
+    async def worker() -> None:
+        for index in next_index:
+            request = _make_request(workload, index, initdata)
+            started = time.perf_counter()
+            try:
+                response = await client.post(
+                    request["url"], json=request["json"], headers=request["headers"]
+                )
+                status = str(response.status_code)
+            except httpx.HTTPError as exc:
+                status = type(exc).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    async def sample() -> None:
+        while not done.is_set():
+            threads, sockets = _process_usage(server.pid)
+            for key, value in (("threads", threads), ("sockets", sockets)):
+                if value is not None and (peak[key] is None or value > peak[key]):
+                    peak[key] = value
+            try:
+                await asyncio.wait_for(done.wait(), 0.05)
+            except asyncio.TimeoutError:
+                pass
+
+    sampler = asyncio.create_task(sample())
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await sampler
+
+    ordered = sorted(latencies)
+    return {
+        "workload": workload,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "seconds": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(_percentile(ordered, 0.50) * 1000, 2),
+        "p95_ms": round(_percentile(ordered, 0.95) * 1000, 2),
+        "p99_ms": round(_percentile(ordered, 0.99) * 1000, 2),
+        "statuses": statuses,
+        "peak_threads": peak["threads"],
+        "peak_sockets": peak["sockets"],
+        "upstream": {
+            name: {
+                key: value - upstream_before[name][key] for key, value in stub.stats().items()
+            }
+            for name, stub in stubs.items()
+        },
+    }
+
+
+def _print_result(result: dict) -> None:
+    print(
+        f"{result['workload']:<10} {result['concurrency']:>5} {result['rps']:>9.1f} "
+        f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+        f"{str(result['peak_threads']):>8} {str(result['peak_sockets']):>8}  "
+        + " ".join(f"{status}:{count}" for status, count in sorted(result["statuses"].items()))
+    )
+
+
+async def _run(args: argparse.Namespace) -> dict:
+    profiles = {
+        "openai": Profile.parse(args.openai_profile),
+        "deepl": Profile.parse(args.deepl_profile),
+        "telegram": Profile.parse(args.telegram_profile),
+    }
+    stubs = {
+        "openai": openai_stub(profiles["openai"]),
+        "deepl": deepl_stub(profiles["deepl"]),
+        "telegram": telegram_stub(profiles["telegram"]),
+    }
+    for stub in stubs.values():
+        stub.__enter__()
+    port = _free_port()
+    server = _start_server(port, stubs, args.cache)
+    results = []
+    try:
+        connections = max(args.concurrency)
+        limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60
+        ) as client:
+            await _wait_until_healthy(client, server)
+            print(
+                f"{'workload':<10} {'conc':>5} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} "
+                f"{'p99 ms':>8} {'threads':>8} {'sockets':>8}  statuses"
+            )
+            offset = 0
+            for workload in args.workloads:
+                await _run_step(client, server, stubs, workload, 1, args.warmup, offset)
+                offset += args.warmup
+                for concurrency in args.concurrency:
+                    result = await _run_step(
+                        client, server, stubs, workload, concurrency, args.requests, offset
+                    )
+                    offset += args.requests
+                    _print_result(result)
+                    results.append(result)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+        for stub in stubs.values():
+            stub.__exit__(None, None, None)
+    return {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "profiles": {
+                "openai": args.openai_profile,
+                "deepl": args.deepl_profile,
+                "telegram": args.telegram_profile,
+            },
+            "requests_per_step": args.requests,
+            "cache": args.cache,
+        },
+        "results": results,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.strip()
+
+
+def compare(baseline_path: str, current_path: str, threshold: float = REGRESSION_THRESHOLD) -> bool:
+    """Print per-step deltas; returns True when any step regressed beyond ``threshold``."""
+    baseline = json.loads(Path(baseline_path).read_text())
+    current = json.loads(Path(current_path).read_text())
+    base_steps = {(item["workload"], item["concurrency"]): item for item in baseline["results"]}
+    regressed = False
+    print(f"{'workload':<10} {'conc':>5} {'req/s':>16} {'p95 ms':>18} {'p99 ms':>18}")
+    for item in current["results"]:
+        base = base_steps.get((item["workload"], item["concurrency"]))
+        if base is None:
+            continue
+        cells = []
+        flags = []
+        for key, higher_is_better in (("rps", True), ("p95_ms", False), ("p99_ms", False)):
+            before, after = base[key], item[key]
+            change = (after - before) / before if before else 0.0
+            worse = -change if higher_is_better else change
+            if worse > threshold:
+                flags.append(key)
+            cells.append(f"{after:>9.1f} {change:>+6.0%}")
+        regressed = regressed or bool(flags)
+        marker = f"  REGRESSION: {', '.join(flags)}" if flags else ""
+        print(f"{item['workload']:<10} {item['concurrency']:>5} " + " ".join(cells) + marker)
+    return regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workloads", type=lambda value: value.split(","), default=list(WORKLOADS))
+    parser.add_argument(
+        "--concurrency",
+        type=lambda value: [int(item) for item in value.split(",")],
+        default=[1, 8, 32, 128],
+    )
+    parser.add_argument("--requests", type=int, default=400, help="requests per concurrency step")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--openai-profile", default="latency_ms=300,jitter_ms=200")
+    parser.add_argument("--deepl-profile", default="latency_ms=80,jitter_ms=40")
+    parser.add_argument("--telegram-profile", default="latency_ms=30,jitter_ms=20")
+    parser.add_argument("--cache", action="store_true", help="keep the translation cache enabled")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"))
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, threshold=args.threshold) else 0)
+
+    report = asyncio.run(_run(args))
+    if args.output:
+        path = Path(args.output)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
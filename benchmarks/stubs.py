@@ -0,0 +1,272 @@
+"""Local stand-ins for the upstream APIs, used by the benchmarks.
+
+Each stub is a threaded HTTP server on 127.0.0.1 with a configurable
+latency, error and rate-limit profile, so benchmark numbers reflect our own
+overhead and request counts rather than the public internet.
+"""
+
+import fnmatch
+import hashlib
+import hmac
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+from urllib.parse import parse_qs, quote
+
+
+@dataclass
+class Profile:
+    latency_seconds: float = 0.05
+    # Extra uniform random latency added on top of ``latency_seconds``.
+    jitter_seconds: float = 0.0
+    # Fraction of requests answered with 500 / 429 (with ``Retry-After``).
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after_seconds: int = 1
+    seed: Optional[int] = None
+
+    @classmethod
+    def parse(cls, spec: str) -> "Profile":
+        """Build a profile from e.g. ``latency_ms=80,jitter_ms=20,error_rate=0.01``.
+
+        Keys: ``latency_ms``, ``jitter_ms``, ``error_rate``, ``rate_limit_rate``
+        and ``retry_after`` (seconds).
+        """
+        values = {}
+        for item in filter(None, (part.strip() for part in spec.split(","))):
+            key, _, value = item.partition("=")
+            values[key.strip()] = float(value)
+        return cls(
+            latency_seconds=values.get("latency_ms", 50) / 1000,
+            jitter_seconds=values.get("jitter_ms", 0) / 1000,
+            error_rate=values.get("error_rate", 0.0),
+            rate_limit_rate=values.get("rate_limit_rate", 0.0),
+            retry_after_seconds=int(values.get("retry_after", 1)),
+        )
+
+
+Route = Callable[["StubRequest"], tuple[int, dict, bytes]]
+
+
+@dataclass
+class StubRequest:
+    method: str
+    path: str
+    headers: dict
+    body: bytes
+
+
+class StubServer:
+    def __init__(self, routes: dict[tuple[str, str], Route], profile: Profile = Profile()) -> None:
+        self.routes = routes
+        self.profile = profile
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self._random = random.Random(profile.seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Buffer headers and body into one write to avoid Nagle/delayed-ACK stalls.
+            wbufsize = 64 * 1024
+
+            def _dispatch(self, method: str) -> None:
+                body = self._read_body()
+                profile = stub.profile
+                with stub._lock:
+                    stub.requests += 1
+                    roll = stub._random.random()
+                    delay = profile.latency_seconds + stub._random.random() * profile.jitter_seconds
+                time.sleep(delay)
+                path = self.path.split("?", 1)[0]
+                route = stub._find_route(method, path)
+                if roll < profile.rate_limit_rate:
+                    with stub._lock:
+                        stub.rate_limited += 1
+                    retry_after = str(profile.retry_after_seconds)
+                    status, headers, payload = 429, {"Retry-After": retry_after}, b""
+                elif roll < profile.rate_limit_rate + profile.error_rate:
+                    with stub._lock:
+                        stub.errors += 1
+                    status, headers, payload = 500, {}, b"stub error"
+                elif route is None:
+                    status, headers, payload = 404, {}, b"not found"
+                else:
+                    request = StubRequest(method, self.path, dict(self.headers), body)
+                    status, headers, payload = route(request)
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _read_body(self) -> bytes:
+                if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+                    parts = []
+                    while True:
+                        size = int(self.rfile.readline().split(b";", 1)[0], 16)
+                        if size == 0:
+                            self.rfile.readline()
+                            return b"".join(parts)
+                        parts.append(self.rfile.read(size))
+                        self.rfile.readline()
+                length = int(self.headers.get("Content-Length") or 0)
+                return self.rfile.read(length) if length else b""
+
+            def do_GET(self) -> None:
+                self._dispatch("GET")
+
+            def do_POST(self) -> None:
+                self._dispatch("POST")
+
+            def log_message(self, format, *args) -> None:
+                pass
+
+        return Handler
+
+    def _find_route(self, method: str, path: str) -> Optional[Route]:
+        route = self.routes.get((method, path))
+        if route is not None:
+            return route
+        for (route_method, pattern), candidate in self.routes.items():
+            if route_method == method and fnmatch.fnmatchcase(path, pattern):
+                return candidate
+        return None
+
+    def stats(self) -> dict:
+        return {"requests": self.requests, "errors": self.errors, "rate_limited": self.rate_limited}
+
+    def __enter__(self) -> "StubServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _json(status: int, data: dict) -> tuple[int, dict, bytes]:
+    return status, {"Content-Type": "application/json"}, json.dumps(data).encode()
+
+
+def deepl_translate_route(request: StubRequest) -> tuple[int, dict, bytes]:
+    texts = parse_qs(request.body.decode(), keep_blank_values=True).get("text", [])
+    return _json(200, {"translations": [{"text": text.upper()} for text in texts]})
+
+
+def deepl_stub(profile: Profile = Profile()) -> StubServer:
+    return StubServer({("POST", "/v2/translate"): deepl_translate_route}, profile)
+
+
+def openai_chat_route(request: StubRequest) -> tuple[int, dict, bytes]:
+    body = json.loads(request.body or b"{}")
+    text = body["messages"][-1]["content"] if body.get("messages") else ""
+    translated = f"[{body.get('model', 'stub')}] {text}"
+    if body.get("response_format", {}).get("type") == "json_object":
+        # Batch contract: {"texts": [...]} in, {"translations": [...]} out.
+        texts = json.loads(text)["texts"]
+        translated = json.dumps(
+            {"translations": [f"[{body.get('model', 'stub')}] {item}" for item in texts]},
+            ensure_ascii=False,
+        )
+    if not body.get("stream"):
+        choice = {"message": {"content": translated}, "finish_reason": "stop"}
+        return _json(200, {"choices": [choice]})
+    events = []
+    for word in translated.split(" "):
+        chunk = {"choices": [{"delta": {"content": word + " "}, "finish_reason": None}]}
+        events.append(f"data: {json.dumps(chunk)}\n\n")
+    events.append('data: {"choices": [{"delta": {}, "finish_reason": "stop"}]}\n\n')
+    events.append("data: [DONE]\n\n")
+    return 200, {"Content-Type": "text/event-stream"}, "".join(events).encode()
+
+
+def openai_transcription_route(request: StubRequest) -> tuple[int, dict, bytes]:
+    return _json(200, {"text": f"transcribed {len(request.body)} bytes"})
+
+
+def openai_stub(profile: Profile = Profile()) -> StubServer:
+    return StubServer(
+        {
+            ("POST", "/v1/chat/completions"): openai_chat_route,
+            ("POST", "/v1/audio/transcriptions"): openai_transcription_route,
+        },
+        profile,
+    )
+
+
+_BOT_USER = {"id": 1, "is_bot": True, "first_name": "Stub", "username": "stub_bot"}
+
+
+def _telegram_message(request: StubRequest) -> dict:
+    params = json.loads(request.body or b"{}") if request.body.startswith(b"{") else {}
+    chat_id = params.get("chat_id", 1)
+    return {
+        "message_id": int(time.monotonic_ns() % 1_000_000_000),
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private"},
+        "from": _BOT_USER,
+        "text": params.get("text", ""),
+    }
+
+
+def telegram_route(request: StubRequest) -> tuple[int, dict, bytes]:
+    method = request.path.split("?", 1)[0].rsplit("/", 1)[-1]
+    if method == "getMe":
+        return _json(200, {"ok": True, "result": _BOT_USER})
+    if method == "getFile":
+        result = {"file_id": "voice", "file_unique_id": "voice", "file_path": "voice/file.oga"}
+        return _json(200, {"ok": True, "result": result})
+    if method in ("sendMessage", "editMessageText", "sendDocument"):
+        return _json(200, {"ok": True, "result": _telegram_message(request)})
+    return _json(200, {"ok": True, "result": True})
+
+
+def telegram_file_route(request: StubRequest) -> tuple[int, dict, bytes]:
+    # An Ogg page header followed by filler is enough for a download.
+    return 200, {"Content-Type": "audio/ogg"}, b"OggS" + bytes(16 * 1024)
+
+
+def telegram_stub(profile: Profile = Profile()) -> StubServer:
+    """Bot API at ``{url}/bot<token>/<method>`` and files at ``{url}/file/bot<token>/<path>``."""
+    return StubServer(
+        {
+            ("POST", "/bot*"): telegram_route,
+            ("GET", "/file/bot*"): telegram_file_route,
+        },
+        profile,
+    )
+
+
+def signed_initdata(bot_token: str, username: str = "bench_user", user_id: int = 123) -> str:
+    """Mini App ``initData`` signed the way Telegram signs it."""
+    fields = {
+        "auth_date": str(int(time.time())),
+        "query_id": "AAHdF6IQAAAAAN0XohDhrOrc",
+        "user": json.dumps(
+            {"id": user_id, "first_name": "Bench", "username": username, "language_code": "en"},
+            separators=(",", ":"),
+        ),
+    }
+    data_check_string = "\n".join(f"{key}={value}" for key, value in sorted(fields.items()))
+    secret_key = hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest()
+    signature = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
+    query = "&".join(f"{key}={quote(value, safe='')}" for key, value in sorted(fields.items()))
+    return f"{query}&hash={signature}"
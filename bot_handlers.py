@@ -8,7 +8,7 @@ from typing import Optional
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.constants import ParseMode
-from telegram.error import BadRequest, TimedOut, NetworkError
+from telegram.error import BadRequest, TimedOut, NetworkError, RetryAfter
 from telegram.ext import (
     Application,
     CallbackQueryHandler,
@@ -18,22 +18,71 @@ from telegram.ext import (
     filters,
 )
 
+from cache import TTLCache
 from gpt_prompts import TARGET_PROMPTS
-from stt import transcribe
-from translate_core import translate_core
+from message_store import MessageStore, create_message_store
+from speculation import CharacterBudget, Speculator, TargetHistory
+from stt import (
+    cached_transcript,
+    should_segment,
+    store_transcript,
+    transcribe,
+    transcribe_segmented,
+    transcribe_url,
+)
+from translate_core import OPENAI_LIMITER, translate_core, translate_core_stream, translate_many
 
 
 logger = logging.getLogger(__name__)
 
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
+# Bot API server root, e.g. a local telegram-bot-api instance or a benchmark stub.
+TELEGRAM_API_BASE_URL = os.getenv("TELEGRAM_API_BASE_URL", "").rstrip("/")
 TG_ALLOWED_USERNAMES = {
     value.strip().lower()
     for value in os.getenv("TG_ALLOWED_USERNAMES", "").split(",")
     if value.strip()
 }
 
+TG_STREAM_TRANSLATIONS = os.getenv("TG_STREAM_TRANSLATIONS", "") == "1"
+TG_STREAM_EDIT_INTERVAL_SECONDS = float(os.getenv("TG_STREAM_EDIT_INTERVAL_SECONDS", "1.0"))
+STREAM_PREVIEW_LIMIT = 3900
+
 TEXT_CACHE_TTL_SECONDS = 45 * 60
-_TEXT_CACHE: dict[str, tuple[float, str, str]] = {}
+TEXT_CACHE_MAX_ENTRIES = int(os.getenv("TEXT_CACHE_MAX_ENTRIES", "20000"))
+TEXT_CACHE_MAX_BYTES = int(os.getenv("TEXT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Empty keeps message text in process memory; redis://[:password@]host:port/db
+# shares it between instances and across restarts.
+MESSAGE_STORE_URL = os.getenv("MESSAGE_STORE_URL", "")
+_TEXT_CACHE = TTLCache(
+    "bot_text",
+    max_entries=TEXT_CACHE_MAX_ENTRIES,
+    ttl_seconds=TEXT_CACHE_TTL_SECONDS,
+    max_bytes=TEXT_CACHE_MAX_BYTES,
+)
+_MESSAGE_STORE: MessageStore = create_message_store(MESSAGE_STORE_URL, _TEXT_CACHE)
+
+# Speculative translation: while the language keyboard is shown, translate
+# into the target the user usually picks. Off unless TG_SPECULATIVE_TRANSLATIONS=1.
+TG_SPECULATIVE_TRANSLATIONS = os.getenv("TG_SPECULATIVE_TRANSLATIONS", "") == "1"
+TG_SPECULATIVE_CHARS_PER_MINUTE = int(os.getenv("TG_SPECULATIVE_CHARS_PER_MINUTE", "20000"))
+TG_SPECULATIVE_MIN_SHARE = float(os.getenv("TG_SPECULATIVE_MIN_SHARE", "0.6"))
+SPECULATION_MIN_CHOICES = 3
+SPECULATION_TTL_SECONDS = 10 * 60
+TARGET_HISTORY_TTL_SECONDS = 30 * 24 * 60 * 60
+_SPECULATOR = Speculator(
+    translate_core,
+    TargetHistory(
+        TTLCache("bot_target_history", max_entries=50000, ttl_seconds=TARGET_HISTORY_TTL_SECONDS)
+    ),
+    CharacterBudget(TG_SPECULATIVE_CHARS_PER_MINUTE),
+    # Parked next to the message text, under the same chat:message key.
+    TTLCache("bot_speculations", max_entries=1000, ttl_seconds=SPECULATION_TTL_SECONDS),
+    # Only idle OpenAI capacity is used; real requests never queue behind a guess.
+    is_busy=lambda: OPENAI_LIMITER.queued > 0,
+    min_choices=SPECULATION_MIN_CHOICES,
+    min_share=TG_SPECULATIVE_MIN_SHARE,
+)
 
 
 def _has_access(username: Optional[str]) -> bool:
@@ -48,27 +97,23 @@ def _make_cache_key(chat_id: int, source_message_id: int) -> str:
     return f"{chat_id}:{source_message_id}"
 
 
-def _store_cached_text(
+async def _store_cached_text(
     chat_id: int, source_message_id: int, text: str, source: str
 ) -> None:
-    expires_at = time.time() + TEXT_CACHE_TTL_SECONDS
-    _TEXT_CACHE[_make_cache_key(chat_id, source_message_id)] = (
-        expires_at,
-        text,
-        source,
-    )
+    await _MESSAGE_STORE.set(_make_cache_key(chat_id, source_message_id), text, source)
 
 
-def _get_cached_text(chat_id: int, source_message_id: int) -> Optional[tuple[str, str]]:
-    key = _make_cache_key(chat_id, source_message_id)
-    cached = _TEXT_CACHE.get(key)
-    if not cached:
-        return None
-    expires_at, text, source = cached
-    if time.time() > expires_at:
-        _TEXT_CACHE.pop(key, None)
-        return None
-    return text, source
+async def _get_cached_text(chat_id: int, source_message_id: int) -> Optional[tuple[str, str]]:
+    return await _MESSAGE_STORE.get(_make_cache_key(chat_id, source_message_id))
+
+
+def _speculate(update: Update, text: str, source: str) -> None:
+    if not TG_SPECULATIVE_TRANSLATIONS or not update.effective_user:
+        return
+    key = _make_cache_key(update.effective_chat.id, update.message.message_id)
+    target = _SPECULATOR.start(key, update.effective_user.id, text, source)
+    if target:
+        logger.info("Speculative translation started for target %s", target)
 
 
 def _build_root_keyboard() -> InlineKeyboardMarkup:
@@ -81,6 +126,7 @@ def _build_root_keyboard() -> InlineKeyboardMarkup:
             InlineKeyboardButton("ES ▸", callback_data="lang:root:es"),
             InlineKeyboardButton("PT ▸", callback_data="lang:root:pt"),
         ],
+        [InlineKeyboardButton("🌐 All languages", callback_data="lang:all")],
     ]
     return InlineKeyboardMarkup(rows)
 
@@ -196,7 +242,8 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
     text = update.message.text.strip()
     if not text:
         return
-    _store_cached_text(update.effective_chat.id, update.message.message_id, text, "text")
+    await _store_cached_text(update.effective_chat.id, update.message.message_id, text, "text")
+    _speculate(update, text, "text")
     await update.message.reply_text(
         "Choose a target language:",
         reply_markup=_build_root_keyboard(),
@@ -204,19 +251,35 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
     )
 
 
+async def _transcribe_voice(voice) -> str:
+    file = await voice.get_file()
+    if should_segment(voice.duration):
+        # Splitting needs the whole file; long notes gain more from parallel
+        # segments than from overlapping download and upload.
+        audio_bytes = await file.download_as_bytearray()
+        return await transcribe_segmented(bytes(audio_bytes))
+    if file.file_path and file.file_path.startswith(("https://", "http://")):
+        return await transcribe_url(file.file_path)
+    # A local Bot API server in --local mode hands out file system paths.
+    audio_bytes = await file.download_as_bytearray()
+    return await transcribe(bytes(audio_bytes))
+
+
 async def handle_voice(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if not await _guard_access(update):
         return
     if not update.message or not update.message.voice:
         return
     voice = update.message.voice
-    file = await voice.get_file()
-    audio_bytes = await file.download_as_bytearray()
-    text = await asyncio.to_thread(transcribe, bytes(audio_bytes))
+    text = cached_transcript(voice.file_unique_id, voice.file_size, voice.duration)
+    if text is None:
+        text = await _transcribe_voice(voice)
+        store_transcript(voice.file_unique_id, text)
     if not text:
         await update.message.reply_text("Could not transcribe the audio.")
         return
-    _store_cached_text(update.effective_chat.id, update.message.message_id, text, "stt")
+    await _store_cached_text(update.effective_chat.id, update.message.message_id, text, "stt")
+    _speculate(update, text, "stt")
     await update.message.reply_text(
         f"Transcribed text:\n\n{text}\n\nChoose a target language:",
         reply_markup=_build_root_keyboard(),
@@ -246,28 +309,31 @@ async def handle_language_choice(
     if data == "lang:pick":
         await _safe_edit_markup(query, _build_root_keyboard())
         return
+    if data == "lang:all":
+        await _translate_all_languages(update, query)
+        return
     if not data.startswith("lang:set:"):
         return
     target = data.split(":", 2)[-1]
     if target not in TARGET_PROMPTS:
         await _safe_edit_text(query, "Unsupported target language.")
         return
-    reply_to = query.message.reply_to_message if query.message else None
-    source_message_id = reply_to.message_id if reply_to else None
-    if not source_message_id:
-        await _safe_edit_text(query, "No text to translate. Send a message first.")
-        return
-    chat_id = update.effective_chat.id if update.effective_chat else 0
-    if not chat_id:
-        await _safe_edit_text(query, "No text to translate. Send a message first.")
-        return
-    cached = _get_cached_text(chat_id, source_message_id)
+    cached = await _get_source_text(update, query)
     if not cached:
-        await _safe_edit_text(query, "No text to translate. Send a message first.")
         return
     text, source = cached
-    await _safe_edit_text(query, "⏳ Translating...")
-    result = await asyncio.to_thread(translate_core, text, target, source=source)
+    if update.effective_user:
+        _SPECULATOR.history.record(update.effective_user.id, target)
+    key = _make_cache_key(update.effective_chat.id, query.message.reply_to_message.message_id)
+    result = await _SPECULATOR.claim(
+        key, target, on_wait=lambda: _safe_edit_text(query, "⏳ Translating...")
+    )
+    if result is None:
+        await _safe_edit_text(query, "⏳ Translating...")
+        if TG_STREAM_TRANSLATIONS:
+            result = await _translate_with_live_edits(query, text, target, source)
+        else:
+            result = await translate_core(text, target, source=source)
     if not result.get("ok"):
         error = result.get("error", "Translation failed")
         await _safe_edit_text(query, f"Translation error: {error}")
@@ -277,27 +343,168 @@ async def handle_language_choice(
     formatted_translation = _format_translation(translation)
     message_text = f"{formatted_translation}\n\nProvider: {provider} · {target.upper()}"
     if len(message_text) > 3900:
-        translation_bytes = io.BytesIO(translation.encode("utf-8"))
-        translation_bytes.name = "translation.txt"
-        await _safe_edit_text(
-            query,
-            f"Sent as file.\n\nProvider: {provider} · {target.upper()}",
-            parse_mode=None,
-            reply_markup=_build_retranslate_keyboard(),
-        )
-        if query.message:
+        await _send_as_file(query, translation, f"Sent as file.\n\nProvider: {provider} · {target.upper()}")
+        return
+    await _safe_edit_text(query, message_text, parse_mode=ParseMode.HTML, reply_markup=_build_retranslate_keyboard())
+
+
+class _LiveEditor:
+    """Coalesces partial translations into rate-limited message edits.
+
+    Only the latest buffer is sent; at most one edit goes out per
+    ``interval`` seconds, the first one as soon as text is available.
+    Under Telegram flood control (``RetryAfter``) intermediate edits are
+    dropped until the window has passed.
+    """
+
+    def __init__(self, query, interval: float) -> None:
+        self._query = query
+        self._interval = interval
+        self._buffer = ""
+        self._sent = ""
+        self._changed = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._resume_at = 0.0
+
+    def update(self, text: str) -> None:
+        self._buffer = text
+        self._changed.set()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while not self._closing.is_set():
+            await self._changed.wait()
+            self._changed.clear()
+            if self._closing.is_set():
+                return
+            text = self._buffer
+            if len(text) > STREAM_PREVIEW_LIMIT:
+                text = text[:STREAM_PREVIEW_LIMIT] + "…"
+            pause = self._interval
+            if text != self._sent:
+                try:
+                    await _safe_edit_text(self._query, f"{text} ▌")
+                    self._sent = text
+                except RetryAfter as e:
+                    logger.warning("Flood control on live edit, pausing for %s s", e.retry_after)
+                    pause = max(pause, float(e.retry_after))
+                    self._resume_at = time.monotonic() + pause
             try:
-                await query.message.reply_document(translation_bytes)
-            except (BadRequest, TimedOut, NetworkError) as e:
-                logger.warning("Failed to send translation file: %s", e)
+                await asyncio.wait_for(self._closing.wait(), pause)
+            except asyncio.TimeoutError:
+                pass
+
+    async def close(self) -> None:
+        """Stop editing; waits for an in-flight edit so it cannot land after the final one.
+
+        Never raises, and returns only once any flood-control window is over,
+        so the caller's final edit can always go out.
+        """
+        self._closing.set()
+        self._changed.set()
+        if self._task is not None:
+            try:
+                await self._task
+            except Exception:
+                logger.exception("Live edit task failed")
+        remaining = self._resume_at - time.monotonic()
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+
+
+async def _translate_with_live_edits(query, text: str, target: str, source: str) -> dict:
+    editor = _LiveEditor(query, TG_STREAM_EDIT_INTERVAL_SECONDS)
+    partial = ""
+    result: dict = {"ok": False, "error": "Translation failed"}
+    try:
+        async for event in translate_core_stream(text, target, source=source):
+            if event["event"] == "delta":
+                partial += event["text"]
+                editor.update(partial)
+            elif event["event"] == "reset":
+                partial = ""
+                editor.update("⏳ Translating...")
+            elif event["event"] == "done":
+                result = event["result"]
+    finally:
+        await editor.close()
+    return result
+
+
+async def _get_source_text(update: Update, query) -> Optional[tuple[str, str]]:
+    reply_to = query.message.reply_to_message if query.message else None
+    source_message_id = reply_to.message_id if reply_to else None
+    if not source_message_id:
+        await _safe_edit_text(query, "No text to translate. Send a message first.")
+        return None
+    chat_id = update.effective_chat.id if update.effective_chat else 0
+    if not chat_id:
+        await _safe_edit_text(query, "No text to translate. Send a message first.")
+        return None
+    cached = await _get_cached_text(chat_id, source_message_id)
+    if not cached:
+        await _safe_edit_text(query, "No text to translate. Send a message first.")
+        return None
+    return cached
+
+
+async def _send_as_file(query, translation: str, caption: str) -> None:
+    translation_bytes = io.BytesIO(translation.encode("utf-8"))
+    translation_bytes.name = "translation.txt"
+    await _safe_edit_text(
+        query,
+        caption,
+        parse_mode=None,
+        reply_markup=_build_retranslate_keyboard(),
+    )
+    if query.message:
+        try:
+            await query.message.reply_document(translation_bytes)
+        except (BadRequest, TimedOut, NetworkError) as e:
+            logger.warning("Failed to send translation file: %s", e)
+
+
+async def _translate_all_languages(update: Update, query) -> None:
+    cached = await _get_source_text(update, query)
+    if not cached:
+        return
+    text, source = cached
+    await _safe_edit_text(query, "⏳ Translating...")
+    results = await translate_many(text, list(TARGET_PROMPTS), source=source)
+    blocks = []
+    plain_blocks = []
+    for target, result in results.items():
+        if not result.get("ok"):
+            error = result.get("error", "Translation failed")
+            blocks.append(f"{target.upper()}: Translation error: {html.escape(error, quote=False)}")
+            plain_blocks.append(f"{target.upper()}: Translation error: {error}")
+            continue
+        translation = result.get("text", "")
+        provider = result.get("provider_used", "unknown")
+        blocks.append(f"{target.upper()} · {provider}\n{_format_translation(translation)}")
+        plain_blocks.append(f"{target.upper()} · {provider}\n{translation}")
+    message_text = "\n\n".join(blocks)
+    if len(message_text) > 3900:
+        await _send_as_file(query, "\n\n".join(plain_blocks), "Sent as file.\n\nAll languages")
         return
     await _safe_edit_text(query, message_text, parse_mode=ParseMode.HTML, reply_markup=_build_retranslate_keyboard())
 
 
+async def _close_message_store(application: Application) -> None:
+    await _MESSAGE_STORE.close()
+
+
 def build_application() -> Application:
     if not BOT_TOKEN:
         raise RuntimeError("TELEGRAM_BOT_TOKEN is missing")
-    application = Application.builder().token(BOT_TOKEN).build()
+    builder = Application.builder().token(BOT_TOKEN).post_shutdown(_close_message_store)
+    if TELEGRAM_API_BASE_URL:
+        builder = builder.base_url(f"{TELEGRAM_API_BASE_URL}/bot").base_file_url(
+            f"{TELEGRAM_API_BASE_URL}/file/bot"
+        )
+    application = builder.build()
     application.add_handler(CommandHandler("start", start_command))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text))
     application.add_handler(MessageHandler(filters.VOICE, handle_voice))
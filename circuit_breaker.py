@@ -0,0 +1,120 @@
+import os
+import time
+from collections import deque
+from typing import Callable
+
+
+BREAKER_WINDOW_SIZE = int(os.getenv("BREAKER_WINDOW_SIZE", "20"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "10"))
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_SLOW_CALL_SECONDS = float(os.getenv("BREAKER_SLOW_CALL_SECONDS", "10"))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+BREAKER_HALF_OPEN_PROBES = int(os.getenv("BREAKER_HALF_OPEN_PROBES", "1"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_REGISTRY: dict[str, "CircuitBreaker"] = {}
+
+
+class CircuitBreaker:
+    """Per-provider breaker over a sliding window of recent calls.
+
+    A call counts as failed when it errored or took longer than
+    ``slow_call_seconds``. Once ``min_calls`` are in the window and the
+    failure rate reaches ``failure_rate``, the breaker opens and
+    :meth:`allow` refuses calls for ``open_seconds``. It then lets
+    ``half_open_probes`` calls through; if they all succeed it closes,
+    otherwise it opens again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window_size: int = BREAKER_WINDOW_SIZE,
+        min_calls: int = BREAKER_MIN_CALLS,
+        failure_rate: float = BREAKER_FAILURE_RATE,
+        slow_call_seconds: float = BREAKER_SLOW_CALL_SECONDS,
+        open_seconds: float = BREAKER_OPEN_SECONDS,
+        half_open_probes: int = BREAKER_HALF_OPEN_PROBES,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self._clock = clock
+        self._window: deque[bool] = deque(maxlen=window_size)
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self.rejected = 0
+        self.transitions: deque[dict] = deque(maxlen=20)
+        _REGISTRY[name] = self
+
+    def _transition(self, state: str) -> None:
+        print(f"breaker={self.name} transition={self.state}->{state}")
+        self.transitions.append({"at": time.time(), "from": self.state, "to": state})
+        self.state = state
+        if state == OPEN:
+            self._opened_at = self._clock()
+        if state == HALF_OPEN:
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+        if state == CLOSED:
+            self._window.clear()
+
+    def allow(self) -> bool:
+        if self.state == OPEN and self._clock() - self._opened_at >= self.open_seconds:
+            self._transition(HALF_OPEN)
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+            self._probes_in_flight += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def record(self, success: bool, latency_seconds: float) -> None:
+        failed = not success or latency_seconds > self.slow_call_seconds
+        if self.state == HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            if failed:
+                self._transition(OPEN)
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_probes:
+                self._transition(CLOSED)
+            return
+        if self.state == OPEN:
+            return
+        self._window.append(failed)
+        if len(self._window) >= self.min_calls and self._failure_ratio() >= self.failure_rate:
+            self._transition(OPEN)
+
+    def abandon(self) -> None:
+        """Release a call admitted by :meth:`allow` that finished without an outcome."""
+        if self.state == HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def _failure_ratio(self) -> float:
+        if not self._window:
+            return 0.0
+        return sum(self._window) / len(self._window)
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "window_calls": len(self._window),
+            "failure_ratio": round(self._failure_ratio(), 4),
+            "rejected": self.rejected,
+            "transitions": list(self.transitions),
+        }
+
+
+def all_snapshots() -> dict:
+    return {name: breaker.snapshot() for name, breaker in _REGISTRY.items()}
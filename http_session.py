@@ -1,19 +1,104 @@
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-
-
-def create_session() -> requests.Session:
-    retry = Retry(
-        total=3,
-        status_forcelist=[429, 500, 502, 503, 504],
-        allowed_methods={"POST"},
-        backoff_factor=0.6,
-        respect_retry_after_header=True,
-        raise_on_status=False,
+import asyncio
+import email.utils
+import time
+from typing import Optional
+
+import httpx
+
+from tracing import span
+
+
+RETRY_TOTAL = 3
+RETRY_STATUS_FORCELIST = frozenset({429, 500, 502, 503, 504})
+RETRY_AFTER_STATUS_CODES = frozenset({413, 429, 503})
+RETRY_BACKOFF_FACTOR = 0.6
+RETRY_BACKOFF_MAX = 120.0
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class RetryTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of the urllib3 ``Retry`` policy the sessions used to mount."""
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        total: int = RETRY_TOTAL,
+        status_forcelist: frozenset[int] = RETRY_STATUS_FORCELIST,
+        backoff_factor: float = RETRY_BACKOFF_FACTOR,
+        respect_retry_after_header: bool = True,
+    ) -> None:
+        self._transport = transport
+        self.total = total
+        self.status_forcelist = status_forcelist
+        self.backoff_factor = backoff_factor
+        self.respect_retry_after_header = respect_retry_after_header
+
+    def _backoff(self, consecutive_errors: int) -> float:
+        # Same curve as urllib3: no sleep before the first retry, then exponential.
+        if consecutive_errors <= 1:
+            return 0.0
+        return min(RETRY_BACKOFF_MAX, self.backoff_factor * (2 ** (consecutive_errors - 1)))
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        # Callers name their requests with ``extensions={"span_name": ...}``;
+        # every attempt, including retries, becomes its own span. A body that
+        # can only be read once (a streamed upload) opts out with
+        # ``extensions={"retry": False}``.
+        span_name = f"{request.extensions.get('span_name') or request.url.host}.attempt"
+        total = self.total if request.extensions.get("retry", True) else 0
+        attempt = 0
+        while True:
+            with span(span_name, attempt=attempt, host=request.url.host) as attempt_span:
+                try:
+                    response = await self._transport.handle_async_request(request)
+                except httpx.TransportError as exc:
+                    if attempt_span is not None:
+                        attempt_span.attributes["error"] = type(exc).__name__
+                    if attempt >= total:
+                        raise
+                    response = None
+                else:
+                    if attempt_span is not None:
+                        attempt_span.attributes["http.status_code"] = response.status_code
+            if response is None:
+                attempt += 1
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+
+            if response.status_code not in self.status_forcelist or attempt >= total:
+                return response
+
+            attempt += 1
+            delay = None
+            if self.respect_retry_after_header and response.status_code in RETRY_AFTER_STATUS_CODES:
+                delay = _parse_retry_after(response.headers.get("Retry-After"))
+            await response.aclose()
+            await asyncio.sleep(delay if delay is not None else self._backoff(attempt))
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def create_session(
+    max_connections: int = 100, max_keepalive_connections: int = 20
+) -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
     )
-    adapter = HTTPAdapter(max_retries=retry)
-    session = requests.Session()
-    session.mount("https://", adapter)
-    session.mount("http://", adapter)
-    return session
+    transport = RetryTransport(httpx.AsyncHTTPTransport(limits=limits))
+    return httpx.AsyncClient(transport=transport)
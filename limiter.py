@@ -0,0 +1,164 @@
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from metrics import Counter, Histogram
+
+
+LIMITER_MAX_WAIT_SECONDS = float(os.getenv("LIMITER_MAX_WAIT_SECONDS", "10"))
+
+LIMITER_WAIT = Histogram(
+    "translator_limiter_wait_seconds",
+    "Time spent queued for a concurrency slot.",
+    ("limiter",),
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+LIMITER_REJECTED = Counter(
+    "translator_limiter_rejected_total",
+    "Calls turned away because the queue was full or the wait timed out.",
+    ("limiter", "reason"),
+)
+
+_REGISTRY: dict[str, "ConcurrencyLimiter"] = {}
+
+
+class Overloaded(Exception):
+    def __init__(self, name: str, retry_after: int) -> None:
+        super().__init__(f"{name} is overloaded")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    """At most ``max_concurrent`` holders, with a bounded FIFO queue behind them.
+
+    :meth:`acquire` raises :class:`Overloaded` straight away when
+    ``max_queue`` callers are already waiting, and after
+    ``max_wait_seconds`` in the queue, so overload becomes a quick
+    rejection instead of an ever-growing backlog.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrent: int,
+        max_queue: int,
+        max_wait_seconds: float = LIMITER_MAX_WAIT_SECONDS,
+    ) -> None:
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self._in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        # Smoothed time a slot is held, for the Retry-After estimate.
+        self._hold_seconds = 1.0
+        self.acquired = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        _REGISTRY[name] = self
+
+    @classmethod
+    def from_env(cls, name: str, max_concurrent: int, max_queue: int) -> "ConcurrencyLimiter":
+        """Limits from ``<NAME>_MAX_CONCURRENCY`` / ``<NAME>_MAX_QUEUE`` when set."""
+        prefix = name.upper()
+        return cls(
+            name,
+            max_concurrent=int(os.getenv(f"{prefix}_MAX_CONCURRENCY", str(max_concurrent))),
+            max_queue=int(os.getenv(f"{prefix}_MAX_QUEUE", str(max_queue))),
+        )
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def would_reject(self) -> bool:
+        return self._in_flight >= self.max_concurrent and len(self._waiters) >= self.max_queue
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue has probably drained."""
+        rounds = (len(self._waiters) + 1) / max(1, self.max_concurrent)
+        return max(1, min(60, math.ceil(rounds * self._hold_seconds)))
+
+    def _reject(self, reason: str) -> Overloaded:
+        self.rejected += 1
+        LIMITER_REJECTED.inc(self.name, reason)
+        return Overloaded(self.name, self.retry_after())
+
+    async def acquire(self) -> None:
+        if self._in_flight < self.max_concurrent and not self._waiters:
+            self._in_flight += 1
+            self._record_wait(0.0)
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject("queue_full")
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        started = time.monotonic()
+        try:
+            # A released slot is handed over by resolving the future, so
+            # in_flight already counts this caller when it wakes up.
+            await asyncio.wait_for(waiter, self.max_wait_seconds)
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            raise self._reject("timeout") from None
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            self._discard(waiter)
+            raise
+        self._record_wait(time.monotonic() - started)
+
+    def _discard(self, waiter: asyncio.Future) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def _record_wait(self, seconds: float) -> None:
+        self.acquired += 1
+        self.wait_seconds_total += seconds
+        LIMITER_WAIT.observe(seconds, self.name)
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._in_flight = max(0, self._in_flight - 1)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        await self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._hold_seconds = 0.8 * self._hold_seconds + 0.2 * (time.monotonic() - started)
+            self.release()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self._in_flight,
+            "queued": len(self._waiters),
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "acquired": self.acquired,
+            "rejected": self.rejected,
+            "avg_wait_seconds": round(self.wait_seconds_total / self.acquired, 4)
+            if self.acquired
+            else 0.0,
+        }
+
+
+def all_stats() -> dict:
+    return {name: limiter.stats() for name, limiter in _REGISTRY.items()}
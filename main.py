@@ -6,46 +6,115 @@ import os
 import time
 from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Optional
-from urllib.parse import parse_qs, unquote
+from typing import AsyncIterator, NamedTuple, Optional
+from urllib.parse import unquote
 
-from fastapi import Depends, FastAPI, Header, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, JSONResponse, Response
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 from telegram import Update
 from telegram.ext import Application
 
 from bot_handlers import build_application
+from cache import TTLCache
+from cache import all_stats as cache_stats
+from cache import sweep_periodically as sweep_caches_periodically
+from circuit_breaker import all_snapshots as breaker_snapshots
 from gpt_prompts import TARGET_PROMPTS
-from translate_core import translate_core
+from limiter import ConcurrencyLimiter, Overloaded
+from limiter import all_stats as limiter_stats
+from metrics import register_collector as register_metrics_collector
+from metrics import render as render_metrics
+from singleflight import all_stats as single_flight_stats
+from static_assets import StaticAsset
+from stt import transcript_savings
+from tracing import TRACE_EXPORT_URL, TimingMiddleware, current_trace, span
+from tracing import export_periodically as export_traces_periodically
+from translate_core import (
+    hedge_stats,
+    translate_batch,
+    translate_core,
+    translate_core_stream,
+    translate_many,
+)
+from update_dispatcher import REJECTED, UpdateDispatcher
 
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 TG_WEBHOOK_SECRET = os.getenv("TG_WEBHOOK_SECRET", "")
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
+CACHE_SWEEP_INTERVAL_SECONDS = float(os.getenv("CACHE_SWEEP_INTERVAL_SECONDS", "60"))
+TRANSLATE_BATCH_MAX_ITEMS = int(os.getenv("TRANSLATE_BATCH_MAX_ITEMS", "500"))
+TRANSLATE_BATCH_MAX_CHARS = int(os.getenv("TRANSLATE_BATCH_MAX_CHARS", "100000"))
 INITDATA_MAX_AGE_SECONDS = int(os.getenv("INITDATA_MAX_AGE_SECONDS", "3600"))
+INITDATA_CACHE_MAX_ENTRIES = int(os.getenv("INITDATA_CACHE_MAX_ENTRIES", "10000"))
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "16"))
+WEBHOOK_MAX_QUEUE = int(os.getenv("WEBHOOK_MAX_QUEUE", "1000"))
+WEBHOOK_DEDUP_WINDOW = int(os.getenv("WEBHOOK_DEDUP_WINDOW", "10000"))
+WEBHOOK_DRAIN_SECONDS = float(os.getenv("WEBHOOK_DRAIN_SECONDS", "8"))
 TG_ALLOWED_USERNAMES = {
     value.strip().lower()
     for value in os.getenv("TG_ALLOWED_USERNAMES", "").split(",")
     if value.strip()
 }
 
+# Telegram derives the Mini App signing key from the bot token; it never changes
+# while the process runs.
+_INITDATA_SECRET_KEY = hmac.new(b"WebAppData", TELEGRAM_BOT_TOKEN.encode(), hashlib.sha256).digest()
+_INITDATA_CACHE = TTLCache(
+    "initdata",
+    max_entries=INITDATA_CACHE_MAX_ENTRIES,
+    ttl_seconds=INITDATA_MAX_AGE_SECONDS,
+)
+
+# Translations handled at once by the API; beyond the queue, requests get a 503.
+TRANSLATE_LIMITER = ConcurrencyLimiter.from_env("translate", max_concurrent=64, max_queue=256)
+OVERLOADED_ERROR = "Too many translations in progress, retry shortly"
+
 BASE_DIR = Path(__file__).resolve().parent
 APP_HTML_PATH = BASE_DIR / "app.html"
 APP_CSS_PATH = BASE_DIR / "app.css"
+# HTML is revalidated on every open so a deploy shows up at once; the ETag
+# makes that a bodyless 304 when nothing changed.
+APP_HTML = StaticAsset(APP_HTML_PATH, "text/html; charset=utf-8", "no-cache")
+APP_CSS = StaticAsset(APP_CSS_PATH, "text/css; charset=utf-8", "public, max-age=300")
 
 telegram_application: Optional[Application] = None
+webhook_dispatcher: Optional[UpdateDispatcher] = None
+
+
+async def _process_update(payload: dict) -> None:
+    update = Update.de_json(payload, telegram_application.bot)
+    if update is not None:
+        await telegram_application.process_update(update)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global telegram_application
+    global telegram_application, webhook_dispatcher
     if not TG_WEBHOOK_SECRET:
         raise RuntimeError("TG_WEBHOOK_SECRET is missing")
     telegram_application = build_application()
     await telegram_application.initialize()
     await telegram_application.start()
+    webhook_dispatcher = UpdateDispatcher(
+        _process_update,
+        workers=WEBHOOK_WORKERS,
+        max_queue=WEBHOOK_MAX_QUEUE,
+        dedup_window=WEBHOOK_DEDUP_WINDOW,
+    )
+    webhook_dispatcher.start()
+    sweeper = asyncio.create_task(sweep_caches_periodically(CACHE_SWEEP_INTERVAL_SECONDS))
+    exporter = asyncio.create_task(export_traces_periodically()) if TRACE_EXPORT_URL else None
     yield
+    sweeper.cancel()
+    if exporter:
+        exporter.cancel()
+        await asyncio.gather(exporter, return_exceptions=True)
+    # Updates already acked to Telegram would otherwise be lost; new ones get
+    # a 503 meanwhile, so Telegram redelivers them to the next instance.
+    if not await webhook_dispatcher.drain(WEBHOOK_DRAIN_SECONDS):
+        print(f"webhook_drain_incomplete queued={webhook_dispatcher.queued}")
     if telegram_application:
         await telegram_application.stop()
         await telegram_application.shutdown()
@@ -53,6 +122,8 @@ async def lifespan(app: FastAPI):
 
 app = FastAPI(lifespan=lifespan)
 
+app.add_middleware(TimingMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -68,28 +139,30 @@ def _key_prefix(key: str) -> Optional[str]:
     return key[:8]
 
 
-def _parse_username_from_init_data(init_data: str) -> Optional[str]:
-    if not init_data:
-        return None
-    parsed = parse_qs(init_data, keep_blank_values=True)
-    user_json = parsed.get("user", [""])[0]
+class VerifiedInitData(NamedTuple):
+    auth_date: int
+    username: Optional[str]
+
+
+def _parse_username(user_json: str) -> Optional[str]:
     if not user_json:
         return None
     try:
         user = json.loads(user_json)
     except json.JSONDecodeError:
         return None
+    if not isinstance(user, dict):
+        return None
     username = user.get("username")
     if not username:
         return None
     return str(username)
 
 
-def _verify_tg_initdata(init_data: str) -> bool:
-    if not TELEGRAM_BOT_TOKEN or not init_data:
-        return False
+def _check_initdata_signature(init_data: str) -> Optional[VerifiedInitData]:
     received_hash = None
     auth_date = None
+    user_json = ""
     check_pairs: list[str] = []
     for pair in init_data.split("&"):
         if not pair:
@@ -104,25 +177,52 @@ def _verify_tg_initdata(init_data: str) -> bool:
                 try:
                     auth_date = int(value)
                 except ValueError:
-                    return False
+                    return None
+            elif key == "user":
+                user_json = decoded_value
     if not received_hash or auth_date is None:
-        return False
+        return None
     if time.time() - auth_date > INITDATA_MAX_AGE_SECONDS:
-        return False
+        return None
     check_pairs.sort()
     data_check_string = "\n".join(check_pairs)
-    secret_key = hmac.new(b"WebAppData", TELEGRAM_BOT_TOKEN.encode(), hashlib.sha256).digest()
-    computed = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
-    return hmac.compare_digest(computed, received_hash)
+    computed = hmac.new(_INITDATA_SECRET_KEY, data_check_string.encode(), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(computed, received_hash):
+        return None
+    return VerifiedInitData(auth_date, _parse_username(user_json))
 
 
-def require_access(x_tg_initdata: Optional[str] = Header(None)) -> None:
+def _verify_tg_initdata(init_data: str) -> Optional[VerifiedInitData]:
+    """Check the initData signature and freshness; ``None`` when it is not valid.
+
+    Mini App clients send the same initData on every request of a session, so
+    verified results are cached under a digest of the whole string. A hit
+    still has to pass the ``auth_date`` age check.
+    """
+    if not TELEGRAM_BOT_TOKEN or not init_data:
+        return None
+    cache_key = hashlib.sha256(init_data.encode()).digest()
+    verified = _INITDATA_CACHE.get(cache_key)
+    if verified is None:
+        verified = _check_initdata_signature(init_data)
+        if verified is None:
+            return None
+        _INITDATA_CACHE.set(cache_key, verified)
+    if time.time() - verified.auth_date > INITDATA_MAX_AGE_SECONDS:
+        _INITDATA_CACHE.pop(cache_key)
+        return None
+    return verified
+
+
+async def require_access(x_tg_initdata: Optional[str] = Header(None)) -> None:
     if not x_tg_initdata:
         raise HTTPException(status_code=401, detail="Unauthorized")
-    if not _verify_tg_initdata(x_tg_initdata):
+    with span("auth"):
+        verified = _verify_tg_initdata(x_tg_initdata)
+    if verified is None:
         raise HTTPException(status_code=401, detail="Unauthorized")
     if TG_ALLOWED_USERNAMES:
-        username = _parse_username_from_init_data(x_tg_initdata)
+        username = verified.username
         if not username or username.lower() not in TG_ALLOWED_USERNAMES:
             raise HTTPException(status_code=403, detail="Forbidden")
 
@@ -141,29 +241,264 @@ def debug_env() -> dict:
     }
 
 
+@app.get("/debug/cache")
+def debug_cache() -> dict:
+    return {"ok": True, "caches": cache_stats(), "transcripts_saved": transcript_savings()}
+
+
+_CACHE_METRICS = (
+    ("translator_cache_hits_total", "counter", "Cache lookups that hit.", "hits"),
+    ("translator_cache_misses_total", "counter", "Cache lookups that missed.", "misses"),
+    ("translator_cache_hit_ratio", "gauge", "Hits over lookups since start.", "hit_rate"),
+    ("translator_cache_entries", "gauge", "Entries currently cached.", "entries"),
+    ("translator_cache_bytes", "gauge", "Estimated bytes currently cached.", "bytes"),
+    ("translator_cache_evictions_total", "counter", "Entries evicted by the size bounds.", "evictions"),
+)
+_BREAKER_STATES = ("closed", "half_open", "open")
+
+
+def _cache_samples():
+    stats = cache_stats()
+    for name, kind, documentation, field in _CACHE_METRICS:
+        for cache_name, values in stats.items():
+            yield name, kind, documentation, {"cache": cache_name}, values[field]
+
+
+def _breaker_samples():
+    for breaker_name, snapshot in breaker_snapshots().items():
+        for state in _BREAKER_STATES:
+            yield (
+                "translator_breaker_state",
+                "gauge",
+                "1 for the breaker's current state.",
+                {"breaker": breaker_name, "state": state},
+                1 if snapshot["state"] == state else 0,
+            )
+
+
+def _limiter_samples():
+    stats = limiter_stats()
+    for name, field, documentation in (
+        ("translator_limiter_in_flight", "in_flight", "Calls holding a concurrency slot."),
+        ("translator_limiter_queued", "queued", "Calls waiting for a concurrency slot."),
+    ):
+        for limiter_name, values in stats.items():
+            yield name, "gauge", documentation, {"limiter": limiter_name}, values[field]
+
+
+def _webhook_samples():
+    if webhook_dispatcher is None:
+        return
+    stats = webhook_dispatcher.stats()
+    for name, field, documentation in (
+        ("translator_webhook_queued", "queued", "Webhook updates waiting for a worker."),
+        ("translator_webhook_active", "active", "Webhook updates being processed."),
+    ):
+        yield name, "gauge", documentation, {}, stats[field]
+
+
+register_metrics_collector(_cache_samples)
+register_metrics_collector(_limiter_samples)
+register_metrics_collector(_webhook_samples)
+register_metrics_collector(_breaker_samples)
+
+
+@app.get("/metrics")
+def metrics() -> Response:
+    return Response(content=render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/debug/providers")
+def debug_providers() -> dict:
+    return {
+        "ok": True,
+        "breakers": breaker_snapshots(),
+        "hedge": hedge_stats(),
+        "single_flight": single_flight_stats(),
+        "limiters": limiter_stats(),
+        "webhook": webhook_dispatcher.stats() if webhook_dispatcher else None,
+    }
+
+
 @app.post("/api/translate")
 async def translate(
     payload: dict,
     _: None = Depends(require_access),
 ) -> JSONResponse:
     text = (payload.get("text") or "").strip()
+    targets = payload.get("targets")
     target = (payload.get("target") or "").strip()
 
-    if not text:
-        return JSONResponse(status_code=400, content={"error": "Text is required"})
-
-    if len(text) > 10000:
-        return JSONResponse(status_code=400, content={"error": "Text is too long"})
+    text_error = _validate_text(text)
+    if text_error:
+        return text_error
+
+    if targets is not None:
+        if not isinstance(targets, list) or not targets:
+            return JSONResponse(status_code=400, content={"error": "Targets must be a non-empty list"})
+        if any(not isinstance(item, str) or item not in TARGET_PROMPTS for item in targets):
+            return JSONResponse(status_code=400, content={"error": "Unsupported target"})
+        try:
+            async with TRANSLATE_LIMITER.slot():
+                return await _translate_many_response(text, targets, bool(payload.get("debug")))
+        except Overloaded as exc:
+            return _overloaded_response(exc.retry_after)
 
     if target not in TARGET_PROMPTS:
         return JSONResponse(status_code=400, content={"error": "Unsupported target"})
 
-    result = await asyncio.to_thread(translate_core, text, target)
+    try:
+        async with TRANSLATE_LIMITER.slot():
+            result = await translate_core(text, target)
+    except Overloaded as exc:
+        return _overloaded_response(exc.retry_after)
     status_code = result.pop("status_code", 200)
     result.pop("ok", None)
+    if payload.get("debug"):
+        result["debug"] = _debug_timings()
     return JSONResponse(status_code=status_code, content=result)
 
 
+def _debug_timings() -> dict:
+    trace = current_trace()
+    if trace is None:
+        return {}
+    return {"trace_id": trace.trace_id, "spans": [recorded.as_dict() for recorded in trace.spans]}
+
+
+def _overloaded_response(retry_after: int) -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={"error": OVERLOADED_ERROR},
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
+def _text_error(text: str) -> Optional[str]:
+    if not text:
+        return "Text is required"
+    if len(text) > 10000:
+        return "Text is too long"
+    return None
+
+
+def _validate_text(text: str) -> Optional[JSONResponse]:
+    error = _text_error(text)
+    if error:
+        return JSONResponse(status_code=400, content={"error": error})
+    return None
+
+
+def _batch_item_error(item) -> Optional[str]:
+    if not isinstance(item, dict):
+        return "Item must be an object"
+    text = item.get("text")
+    target = item.get("target")
+    if not isinstance(text, str) or not isinstance(target, str):
+        return "Item needs text and target strings"
+    if target not in TARGET_PROMPTS:
+        return "Unsupported target"
+    return _text_error(text.strip())
+
+
+@app.post("/api/translate/batch")
+async def translate_batch_endpoint(
+    payload: dict,
+    _: None = Depends(require_access),
+) -> JSONResponse:
+    items = payload.get("items")
+    if not isinstance(items, list) or not items:
+        return JSONResponse(status_code=400, content={"error": "Items must be a non-empty list"})
+    if len(items) > TRANSLATE_BATCH_MAX_ITEMS:
+        return JSONResponse(status_code=400, content={"error": "Too many items"})
+
+    # Invalid items get their own error; the rest are still translated.
+    results: list[dict] = []
+    valid: list[tuple[int, str, str]] = []
+    for position, item in enumerate(items):
+        error = _batch_item_error(item)
+        results.append({"ok": False, "status_code": 400, "error": error} if error else {})
+        if not error:
+            valid.append((position, item["text"].strip(), item["target"]))
+    if sum(len(text) for _, text, _ in valid) > TRANSLATE_BATCH_MAX_CHARS:
+        return JSONResponse(status_code=400, content={"error": "Batch is too long"})
+
+    if valid:
+        try:
+            async with TRANSLATE_LIMITER.slot():
+                translated = await translate_batch([(text, target) for _, text, target in valid])
+        except Overloaded as exc:
+            return _overloaded_response(exc.retry_after)
+        for (position, _, _), result in zip(valid, translated):
+            results[position] = result
+
+    status_code = 200
+    if not any(result.get("ok") for result in results):
+        status_code = results[0].get("status_code", 502)
+    for result in results:
+        result.pop("ok", None)
+    content = {"results": results}
+    if payload.get("debug"):
+        content["debug"] = _debug_timings()
+    return JSONResponse(status_code=status_code, content=content)
+
+
+@app.post("/api/translate/stream")
+async def translate_stream(
+    payload: dict,
+    _: None = Depends(require_access),
+) -> Response:
+    text = (payload.get("text") or "").strip()
+    target = (payload.get("target") or "").strip()
+
+    text_error = _validate_text(text)
+    if text_error:
+        return text_error
+
+    if target not in TARGET_PROMPTS:
+        return JSONResponse(status_code=400, content={"error": "Unsupported target"})
+
+    if TRANSLATE_LIMITER.would_reject():
+        return _overloaded_response(TRANSLATE_LIMITER.retry_after())
+
+    return StreamingResponse(
+        _translation_events(text, target),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _translation_events(text: str, target: str) -> AsyncIterator[str]:
+    try:
+        async with TRANSLATE_LIMITER.slot():
+            async for event in translate_core_stream(text, target):
+                name = event.pop("event")
+                data = event
+                if name == "done":
+                    data = event["result"]
+                    data.pop("ok", None)
+                yield f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    except Overloaded as exc:
+        # The 200 is already sent; the client reads the real status from here.
+        data = {"error": OVERLOADED_ERROR, "status_code": 503, "retry_after": exc.retry_after}
+        yield f"event: done\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _translate_many_response(
+    text: str, targets: list[str], debug: bool = False
+) -> JSONResponse:
+    results = await translate_many(text, targets)
+    status_code = 200
+    if not any(result.get("ok") for result in results.values()):
+        status_code = next(iter(results.values())).get("status_code", 502)
+    for result in results.values():
+        result.pop("ok", None)
+    content = {"results": results}
+    if debug:
+        content["debug"] = _debug_timings()
+    return JSONResponse(status_code=status_code, content=content)
+
+
 @app.post("/tg/webhook")
 async def telegram_webhook(
     payload: dict,
@@ -173,22 +508,22 @@ async def telegram_webhook(
 ) -> Response:
     if x_telegram_bot_api_secret_token != TG_WEBHOOK_SECRET:
         raise HTTPException(status_code=401, detail="Unauthorized")
-    if not telegram_application:
+    if not telegram_application or not webhook_dispatcher:
         raise HTTPException(status_code=503, detail="Bot not initialized")
-    update = Update.de_json(payload, telegram_application.bot)
-    if update is None:
-        return Response(status_code=200)
-    asyncio.create_task(telegram_application.process_update(update))
+    # Parsing and handling happen on the dispatcher's workers; the ack only
+    # records the update (duplicates are acked and dropped). A non-2xx answer
+    # makes Telegram deliver it again.
+    outcome = webhook_dispatcher.submit(payload)
+    if outcome == REJECTED:
+        raise HTTPException(status_code=503, detail="Too many pending updates")
     return Response(status_code=200)
 
 
 @app.get("/app", response_class=HTMLResponse)
-def app_page() -> HTMLResponse:
-    html = APP_HTML_PATH.read_text(encoding="utf-8")
-    return HTMLResponse(content=html)
+async def app_page(request: Request) -> Response:
+    return APP_HTML.response(request)
 
 
 @app.get("/app.css", response_class=Response)
-def app_css() -> Response:
-    css = APP_CSS_PATH.read_text(encoding="utf-8")
-    return Response(content=css, media_type="text/css")
+async def app_css(request: Request) -> Response:
+    return APP_CSS.response(request)
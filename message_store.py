@@ -0,0 +1,289 @@
+import asyncio
+import itertools
+import json
+import logging
+import sys
+from collections import deque
+from typing import Optional, Protocol
+from urllib.parse import unquote, urlparse
+
+from cache import TTLCache
+
+
+logger = logging.getLogger(__name__)
+
+# Rough per-entry cost of the key, the (text, source) tuple and the LRU slot.
+ENTRY_OVERHEAD = 256
+
+
+class MessageStore(Protocol):
+    """Where the bot keeps message text between the message and the button tap."""
+
+    async def set(self, key: str, text: str, source: str) -> None: ...
+
+    async def get(self, key: str) -> Optional[tuple[str, str]]: ...
+
+    def stats(self) -> dict: ...
+
+    async def close(self) -> None: ...
+
+
+class MemoryMessageStore:
+    """Process-local store; entries are lost on restart and not shared between instances."""
+
+    def __init__(self, cache: TTLCache) -> None:
+        self.cache = cache
+
+    async def set(self, key: str, text: str, source: str) -> None:
+        self.cache.set(key, (text, source), size=sys.getsizeof(text) + ENTRY_OVERHEAD)
+
+    async def get(self, key: str) -> Optional[tuple[str, str]]:
+        return self.cache.get(key)
+
+    def stats(self) -> dict:
+        return {"backend": "memory", **self.cache.stats()}
+
+    async def close(self) -> None:
+        return None
+
+
+class RedisError(Exception):
+    pass
+
+
+def _encode_command(*args) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode("utf-8")
+        elif isinstance(arg, int):
+            arg = str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+async def _read_reply(reader: asyncio.StreamReader):
+    line = await reader.readline()
+    if not line.endswith(b"\r\n"):
+        raise ConnectionError("connection closed")
+    kind, payload = line[:1], line[1:-2]
+    if kind == b"+":
+        return payload.decode()
+    if kind == b"-":
+        return RedisError(payload.decode())
+    if kind == b":":
+        return int(payload)
+    if kind == b"$":
+        length = int(payload)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        count = int(payload)
+        if count < 0:
+            return None
+        return [await _read_reply(reader) for _ in range(count)]
+    raise ConnectionError(f"unexpected reply type {kind!r}")
+
+
+class _RedisConnection:
+    """One socket with automatic pipelining.
+
+    Commands are written as soon as they are issued and their futures are
+    queued; a reader task resolves replies in order. Concurrent callers
+    therefore share the socket without waiting for each other's round trip.
+    """
+
+    def __init__(
+        self, host: str, port: int, password: Optional[str], db: int, timeout: float, ssl: bool
+    ) -> None:
+        self._host = host
+        self._port = port
+        self._ssl = ssl
+        self._password = password
+        self._db = db
+        self._timeout = timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._pending: deque[asyncio.Future] = deque()
+        self._reader_task: Optional[asyncio.Task] = None
+        self._connecting: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def _ensure_connected(self) -> None:
+        if self._writer is not None and not self._writer.is_closing():
+            return
+        if self._connecting is None:
+            self._connecting = asyncio.ensure_future(self._connect())
+        try:
+            await asyncio.shield(self._connecting)
+        finally:
+            if self._connecting is not None and self._connecting.done():
+                self._connecting = None
+
+    async def _connect(self) -> None:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self._host, self._port, ssl=self._ssl or None), self._timeout
+        )
+        # Each socket gets its own reply queue so a dying old socket cannot
+        # fail commands already sent on its replacement.
+        pending: deque[asyncio.Future] = deque()
+        self._writer, self._pending = writer, pending
+        self._reader_task = asyncio.create_task(self._read_loop(reader, writer, pending))
+        setup = []
+        if self._password:
+            setup.append(("AUTH", self._password))
+        if self._db:
+            setup.append(("SELECT", self._db))
+        try:
+            replies = await asyncio.wait_for(
+                asyncio.gather(*(self._send(command) for command in setup)), self._timeout
+            )
+            for reply in replies:
+                if isinstance(reply, RedisError):
+                    raise reply
+        except BaseException:
+            self._reader_task.cancel()
+            self._fail(writer, pending, ConnectionError("redis connection setup failed"))
+            raise
+
+    async def _read_loop(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, pending: deque
+    ) -> None:
+        try:
+            while True:
+                reply = await _read_reply(reader)
+                future = pending.popleft()
+                if not future.done():
+                    future.set_result(reply)
+        except (ConnectionError, asyncio.IncompleteReadError, OSError, ValueError, IndexError) as exc:
+            self._fail(writer, pending, ConnectionError(f"redis connection lost: {exc}"))
+
+    def _fail(self, writer: asyncio.StreamWriter, pending: deque, exc: Exception) -> None:
+        writer.close()
+        if self._writer is writer:
+            self._writer = None
+        while pending:
+            future = pending.popleft()
+            if not future.done():
+                future.set_exception(exc)
+
+    def _send(self, command: tuple) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(future)
+        self._writer.write(_encode_command(*command))
+        return future
+
+    async def execute(self, *commands: tuple) -> list:
+        """Send ``commands`` back to back and return their replies in order."""
+        await self._ensure_connected()
+        writer = self._writer
+        futures = [self._send(command) for command in commands]
+        await writer.drain()
+        return list(await asyncio.wait_for(asyncio.gather(*futures), self._timeout))
+
+    async def close(self) -> None:
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+        if self._writer is not None:
+            self._fail(self._writer, self._pending, ConnectionError("redis connection closed"))
+
+
+class RedisMessageStore:
+    """Shared store speaking the Redis protocol (Redis, Valkey, Memorystore...).
+
+    Keys expire server-side after ``ttl_seconds``. Errors are logged and
+    treated as misses, so an unavailable store degrades to
+    "Send a message first." instead of failing the handler.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        ttl_seconds: int,
+        pool_size: int = 4,
+        key_prefix: str = "tg:text:",
+        timeout: float = 2.0,
+    ) -> None:
+        parsed = urlparse(url)
+        password = unquote(parsed.password) if parsed.password else None
+        db = int(parsed.path.lstrip("/") or 0)
+        self.ttl_seconds = ttl_seconds
+        self.key_prefix = key_prefix
+        self._connections = [
+            _RedisConnection(
+                parsed.hostname or "localhost",
+                parsed.port or 6379,
+                password,
+                db,
+                timeout,
+                ssl=parsed.scheme == "rediss",
+            )
+            for _ in range(pool_size)
+        ]
+        self._round_robin = itertools.cycle(self._connections)
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _connection(self) -> _RedisConnection:
+        connection = next(self._round_robin)
+        idle = min(self._connections, key=lambda candidate: candidate.pending)
+        return idle if idle.pending < connection.pending else connection
+
+    async def execute(self, *commands: tuple) -> list:
+        return await self._connection().execute(*commands)
+
+    async def set(self, key: str, text: str, source: str) -> None:
+        value = json.dumps([text, source], ensure_ascii=False)
+        try:
+            (reply,) = await self.execute(("SET", self.key_prefix + key, value, "EX", self.ttl_seconds))
+            if isinstance(reply, RedisError):
+                raise reply
+        except (RedisError, ConnectionError, OSError, asyncio.TimeoutError) as exc:
+            self.errors += 1
+            logger.warning("Message store SET failed: %s", exc)
+
+    async def get(self, key: str) -> Optional[tuple[str, str]]:
+        try:
+            (reply,) = await self.execute(("GET", self.key_prefix + key))
+            if isinstance(reply, RedisError):
+                raise reply
+        except (RedisError, ConnectionError, OSError, asyncio.TimeoutError) as exc:
+            self.errors += 1
+            logger.warning("Message store GET failed: %s", exc)
+            return None
+        if reply is None:
+            self.misses += 1
+            return None
+        try:
+            text, source = json.loads(reply)
+        except (ValueError, TypeError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return text, source
+
+    def stats(self) -> dict:
+        return {
+            "backend": "redis",
+            "connections": len(self._connections),
+            "pending": sum(connection.pending for connection in self._connections),
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+        }
+
+    async def close(self) -> None:
+        for connection in self._connections:
+            await connection.close()
+
+
+def create_message_store(url: str, cache: TTLCache) -> MessageStore:
+    if url.startswith(("redis://", "rediss://")):
+        return RedisMessageStore(url, ttl_seconds=int(cache.ttl_seconds))
+    return MemoryMessageStore(cache)
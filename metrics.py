@@ -0,0 +1,157 @@
+import math
+import threading
+from typing import Callable, Iterable
+
+_LOCK = threading.Lock()
+_LOCAL = threading.local()
+_SHARDS: list[dict] = []
+_METRICS: dict[str, "_Metric"] = {}
+Sample = tuple[str, str, str, dict, float]
+_COLLECTORS: list[Callable[[], Iterable[Sample]]] = []
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0)
+
+
+def _shard() -> dict:
+    """This thread's private values; only the owning thread ever writes to it.
+
+    Updates are plain dict operations with no lock. Scrapes sum every
+    shard, so they may miss an update that is in progress at that moment.
+    """
+    shard = getattr(_LOCAL, "shard", None)
+    if shard is None:
+        shard = {}
+        _LOCAL.shard = shard
+        with _LOCK:
+            _SHARDS.append(shard)
+    return shard
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        _METRICS[name] = self
+
+    def _key(self, labels: tuple) -> tuple:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return (self.name, tuple(str(value) for value in labels))
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        shard = _shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def value(self, *labels) -> float:
+        key = self._key(labels)
+        with _LOCK:
+            shards = list(_SHARDS)
+        return sum(shard.get(key, 0) for shard in shards)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels) -> None:
+        shard = _shard()
+        key = self._key(labels)
+        # Per-bucket (non-cumulative) counts, then sum and count.
+        slots = shard.get(key)
+        if slots is None:
+            slots = [0] * (len(self.buckets) + 3)
+            shard[key] = slots
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        slots[index] += 1
+        slots[-2] += value
+        slots[-1] += 1
+
+
+def register_collector(collector: Callable[[], Iterable[Sample]]) -> None:
+    """Add a scrape-time source of ``(name, kind, help, labels, value)`` samples."""
+    _COLLECTORS.append(collector)
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for name, value in labels.items():
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{name}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _merged() -> dict:
+    with _LOCK:
+        shards = list(_SHARDS)
+    merged: dict = {}
+    for shard in shards:
+        for key, value in list(shard.items()):
+            if isinstance(value, list):
+                total = merged.setdefault(key, [0] * len(value))
+                for index, slot in enumerate(value):
+                    total[index] += slot
+            else:
+                merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format (0.0.4)."""
+    merged = _merged()
+    by_metric: dict[str, list] = {}
+    for (name, labels), value in merged.items():
+        by_metric.setdefault(name, []).append((labels, value))
+    lines = []
+    for name, metric in _METRICS.items():
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for labels, value in sorted(by_metric.get(name, [])):
+            label_dict = dict(zip(metric.labelnames, labels))
+            if metric.kind == "counter":
+                lines.append(f"{name}{_format_labels(label_dict)} {_format_value(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets + (math.inf,), value):
+                cumulative += count
+                bucket_labels = _format_labels({**label_dict, "le": _format_value(bound)})
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(label_dict)} {_format_value(value[-2])}")
+            lines.append(f"{name}_count{_format_labels(label_dict)} {_format_value(value[-1])}")
+    described: set[str] = set()
+    for collector in _COLLECTORS:
+        for name, kind, documentation, labels, value in collector():
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
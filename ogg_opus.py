@@ -0,0 +1,188 @@
+import struct
+import zlib
+from typing import NamedTuple
+
+
+OPUS_SAMPLE_RATE = 48000
+
+_PAGE_HEADER = struct.Struct("<4sBBqIIIB")
+_CRC_OFFSET = 22
+_FLAG_CONTINUED = 0x01
+_FLAG_BOS = 0x02
+_FLAG_EOS = 0x04
+# Each byte with its bits reversed, so zlib's reflected CRC-32 can compute
+# Ogg's unreflected one in C instead of a Python loop.
+_REVERSED_BITS = bytes(int(f"{value:08b}"[::-1], 2) for value in range(256))
+
+
+class OggError(ValueError):
+    pass
+
+
+class Page(NamedTuple):
+    flags: int
+    granule: int
+    serial: int
+    sequence: int
+    lacing: bytes
+    body: bytes
+
+    @property
+    def packets_completed(self) -> int:
+        return sum(1 for value in self.lacing if value < 255)
+
+
+def ogg_crc(data: bytes) -> int:
+    """CRC-32 of an Ogg page (polynomial 0x04c11db7, MSB first, no init or final xor)."""
+    reflected = zlib.crc32(data.translate(_REVERSED_BITS), 0xFFFFFFFF) ^ 0xFFFFFFFF
+    return int(f"{reflected:032b}"[::-1], 2)
+
+
+def parse_pages(data: bytes) -> list[Page]:
+    pages = []
+    offset = 0
+    while offset < len(data):
+        if len(data) - offset < _PAGE_HEADER.size:
+            raise OggError("truncated page header")
+        capture, version, flags, granule, serial, sequence, _, count = _PAGE_HEADER.unpack_from(
+            data, offset
+        )
+        if capture != b"OggS" or version != 0:
+            raise OggError(f"no Ogg page at byte {offset}")
+        lacing_start = offset + _PAGE_HEADER.size
+        lacing = data[lacing_start : lacing_start + count]
+        body_start = lacing_start + count
+        body = data[body_start : body_start + sum(lacing)]
+        if len(lacing) != count or len(body) != sum(lacing):
+            raise OggError("truncated page")
+        pages.append(Page(flags, granule, serial, sequence, lacing, body))
+        offset = body_start + len(body)
+    return pages
+
+
+def encode_page(page: Page) -> bytes:
+    raw = bytearray(
+        _PAGE_HEADER.pack(
+            b"OggS", 0, page.flags, page.granule, page.serial, page.sequence, 0, len(page.lacing)
+        )
+    )
+    raw += page.lacing
+    raw += page.body
+    struct.pack_into("<I", raw, _CRC_OFFSET, ogg_crc(bytes(raw)))
+    return bytes(raw)
+
+
+def _split_headers(pages: list[Page]) -> tuple[list[Page], list[Page], int]:
+    """Header pages (OpusHead, OpusTags), audio pages and the pre-skip."""
+    if not pages or not pages[0].body.startswith(b"OpusHead"):
+        raise OggError("not an Ogg Opus stream")
+    if len({page.serial for page in pages}) != 1:
+        raise OggError("multiplexed streams are not supported")
+    pre_skip = struct.unpack_from("<H", pages[0].body, 10)[0]
+    packets = 0
+    for index, page in enumerate(pages):
+        packets += page.packets_completed
+        # OpusTags is the second packet and always ends its page.
+        if packets >= 2:
+            return pages[: index + 1], pages[index + 1 :], pre_skip
+    raise OggError("missing OpusTags header")
+
+
+def _page_end_times(audio: list[Page]) -> list[float]:
+    ends = []
+    last = 0
+    for page in audio:
+        # -1 means no packet ends on this page; it ends where the previous one did.
+        if page.granule >= 0:
+            last = page.granule
+        ends.append(last / OPUS_SAMPLE_RATE)
+    return ends
+
+
+def _cut_points(
+    audio: list[Page], ends: list[float], target: float, search: float, limit: int
+) -> list[int]:
+    """Indexes of the pages that end each segment but the last, at most ``limit``.
+
+    Within ``search`` seconds of every ``target`` boundary, the cut goes after
+    the page with the fewest bytes per second of audio. Opus spends very few
+    bytes on silence, so that page is the quietest one nearby.
+    """
+    cuts = []
+    segment_start = 0.0
+    total = ends[-1]
+    while len(cuts) < limit and total - segment_start > target + search:
+        best = None
+        best_score = None
+        boundary = segment_start + target
+        for index in range(len(audio) - 1):
+            if ends[index] < boundary - search:
+                continue
+            if ends[index] > boundary + search:
+                break
+            # Never cut inside a packet: the next page must start a fresh one.
+            if audio[index].granule < 0 or audio[index + 1].flags & _FLAG_CONTINUED:
+                continue
+            duration = ends[index] - (ends[index - 1] if index else 0.0)
+            if duration <= 0:
+                continue
+            # Among equally quiet pages, the one closest to the boundary wins.
+            score = (len(audio[index].body) / duration, abs(ends[index] - boundary))
+            if best_score is None or score < best_score:
+                best, best_score = index, score
+        if best is None:
+            break
+        cuts.append(best)
+        segment_start = ends[best]
+    return cuts
+
+
+def split(
+    data: bytes,
+    target_seconds: float,
+    overlap_seconds: float = 0.0,
+    search_seconds: float = 5.0,
+    max_segments: int = 0,
+) -> list[bytes]:
+    """Split an Ogg Opus file into standalone files of about ``target_seconds`` each.
+
+    With ``max_segments``, segments are lengthened so there are no more
+    than that many. Cuts fall on page boundaries near silence. Each segment after the first
+    also repeats the last ``overlap_seconds`` of the one before, so a word
+    cut in half still appears whole in one of them. Every segment gets the
+    original headers, its own page numbering and granule positions, the
+    end-of-stream flag and fresh CRCs.
+    """
+    headers, audio, pre_skip = _split_headers(parse_pages(data))
+    if not audio:
+        return [data]
+    ends = _page_end_times(audio)
+    limit = max_segments - 1 if max_segments > 0 else len(audio)
+    if max_segments > 0:
+        target_seconds = max(target_seconds, ends[-1] / max_segments)
+    cuts = _cut_points(audio, ends, target_seconds, search_seconds, limit)
+    if not cuts:
+        return [data]
+    encoded_headers = b"".join(encode_page(page) for page in headers)
+    segments = []
+    start = 0
+    for stop in cuts + [len(audio) - 1]:
+        first = start
+        while first > 0 and ends[start - 1] - ends[first - 1] < overlap_seconds:
+            first -= 1
+        while first < start and audio[first].flags & _FLAG_CONTINUED:
+            first += 1
+        # Granules count from this segment's first sample, plus the pre-skip
+        # the decoder drops while it settles.
+        base = round(ends[first - 1] * OPUS_SAMPLE_RATE) - pre_skip if first else 0
+        pages = []
+        for offset, page in enumerate(audio[first : stop + 1]):
+            flags = page.flags & ~(_FLAG_BOS | _FLAG_EOS)
+            if first + offset == stop:
+                flags |= _FLAG_EOS
+            granule = page.granule - base if page.granule >= 0 else -1
+            sequence = len(headers) + offset
+            pages.append(encode_page(page._replace(flags=flags, granule=granule, sequence=sequence)))
+        segments.append(encoded_headers + b"".join(pages))
+        start = stop + 1
+    return segments
@@ -0,0 +1,134 @@
+import asyncio
+import time
+from collections import Counter as Tally
+from typing import Awaitable, Callable, Hashable, Optional
+
+from cache import TTLCache
+from metrics import Counter
+
+
+SPECULATIONS = Counter(
+    "translator_speculations_total",
+    "Speculative translations by outcome: started, hit, miss, failed, or skipped for budget/busy.",
+    ("outcome",),
+)
+
+
+class TargetHistory:
+    """Each user's most recent target choices, newest last."""
+
+    def __init__(self, cache: TTLCache, size: int = 10) -> None:
+        self._cache = cache
+        self.size = size
+
+    def record(self, user_id: int, target: str) -> None:
+        choices = (self._cache.get(user_id) or ()) + (target,)
+        self._cache.set(user_id, choices[-self.size :], size=8 * len(choices))
+
+    def likely(self, user_id: int, min_choices: int, min_share: float) -> Optional[str]:
+        """The user's usual target, if they have picked it often enough to bet on."""
+        choices = self._cache.get(user_id) or ()
+        if len(choices) < min_choices:
+            return None
+        counts = Tally(choices)
+        # Ties go to the most recent choice.
+        target = max(reversed(choices), key=counts.__getitem__)
+        if counts[target] / len(choices) < min_share:
+            return None
+        return target
+
+
+class CharacterBudget:
+    """Characters that may be spent, refilled continuously up to one minute's worth."""
+
+    def __init__(self, chars_per_minute: int, clock: Callable[[], float] = time.monotonic) -> None:
+        self.chars_per_minute = chars_per_minute
+        self._clock = clock
+        self._available = float(chars_per_minute)
+        self._updated = clock()
+
+    def try_spend(self, chars: int) -> bool:
+        now = self._clock()
+        refill = (now - self._updated) * self.chars_per_minute / 60
+        self._available = min(self.chars_per_minute, self._available + refill)
+        self._updated = now
+        if chars > self._available:
+            return False
+        self._available -= chars
+        return True
+
+
+class Speculator:
+    """Starts translations into a user's likely target before they choose it.
+
+    The running task is parked under the message's key; :meth:`claim`
+    hands it over when the user picks that target. Wrong guesses cost
+    tokens, so speculation stops when ``budget`` runs dry or ``is_busy``
+    says the provider has no spare capacity.
+    """
+
+    def __init__(
+        self,
+        translate: Callable[[str, str, str], Awaitable[dict]],
+        history: TargetHistory,
+        budget: CharacterBudget,
+        parked: TTLCache,
+        is_busy: Callable[[], bool],
+        min_choices: int,
+        min_share: float,
+    ) -> None:
+        self._translate = translate
+        self.history = history
+        self._budget = budget
+        self._parked = parked
+        self._is_busy = is_busy
+        self.min_choices = min_choices
+        self.min_share = min_share
+
+    def start(self, key: Hashable, user_id: int, text: str, source: str) -> Optional[str]:
+        """Begin translating ``text`` for ``user_id``; returns the guessed target."""
+        target = self.history.likely(user_id, self.min_choices, self.min_share)
+        if target is None:
+            return None
+        if self._is_busy():
+            SPECULATIONS.inc("busy")
+            return None
+        if not self._budget.try_spend(len(text)):
+            SPECULATIONS.inc("budget")
+            return None
+        task = asyncio.create_task(self._translate(text, target, source))
+        # Never-claimed guesses must not log "exception was never retrieved".
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._parked.set(key, (target, task), size=len(text.encode("utf-8")))
+        SPECULATIONS.inc("started")
+        return target
+
+    async def claim(
+        self,
+        key: Hashable,
+        target: str,
+        on_wait: Optional[Callable[[], Awaitable[object]]] = None,
+    ) -> Optional[dict]:
+        """The speculative result for ``target``, or None when there is none to use.
+
+        ``on_wait`` runs first when the guess is right but still in flight.
+        """
+        parked = self._parked.pop(key)
+        if parked is None:
+            return None
+        guessed, task = parked
+        if guessed != target:
+            SPECULATIONS.inc("miss")
+            return None
+        if not task.done() and on_wait is not None:
+            await on_wait()
+        try:
+            result = await task
+        except Exception:
+            result = None
+        # Right guess, unusable result: the caller translates again.
+        if not result or not result.get("ok"):
+            SPECULATIONS.inc("failed")
+            return None
+        SPECULATIONS.inc("hit")
+        return dict(result)
@@ -0,0 +1,99 @@
+import gzip
+import hashlib
+import os
+from pathlib import Path
+from typing import Optional
+
+import brotli
+from fastapi import Request
+from fastapi.responses import Response
+
+
+STATIC_RELOAD = os.getenv("STATIC_RELOAD", "") == "1"
+
+
+def _accepted_encodings(accept_encoding: str) -> dict[str, float]:
+    accepted: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison, so a W/ prefix added by a proxy still matches.
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class StaticAsset:
+    """A small file kept in memory as identity, gzip and brotli bodies.
+
+    Each encoding has its own strong ETag derived from the content hash.
+    With ``reload`` the file is re-read whenever its mtime changes, for
+    editing the Mini App locally.
+    """
+
+    def __init__(
+        self, path: Path, media_type: str, cache_control: str, reload: bool = STATIC_RELOAD
+    ) -> None:
+        self.path = path
+        self.media_type = media_type
+        self.cache_control = cache_control
+        self.reload = reload
+        self._mtime_ns: Optional[int] = None
+        self._variants: dict[str, tuple[bytes, str]] = {}
+        self.load()
+
+    def load(self) -> None:
+        self._mtime_ns = self.path.stat().st_mtime_ns
+        body = self.path.read_bytes()
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        variants = {"identity": (body, f'"{digest}"')}
+        compressed = gzip.compress(body, compresslevel=9, mtime=0)
+        if len(compressed) < len(body):
+            variants["gzip"] = (compressed, f'"{digest}-gzip"')
+        compressed = brotli.compress(body, quality=11)
+        if len(compressed) < len(body):
+            variants["br"] = (compressed, f'"{digest}-br"')
+        self._variants = variants
+
+    def _reload_if_changed(self) -> None:
+        if self.path.stat().st_mtime_ns != self._mtime_ns:
+            self.load()
+
+    def _select(self, accept_encoding: str) -> str:
+        accepted = _accepted_encodings(accept_encoding)
+        for encoding in ("br", "gzip"):
+            if encoding in self._variants and accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+                return encoding
+        return "identity"
+
+    def response(self, request: Request) -> Response:
+        if self.reload:
+            self._reload_if_changed()
+        encoding = self._select(request.headers.get("accept-encoding", ""))
+        body, etag = self._variants[encoding]
+        headers = {"ETag": etag, "Cache-Control": self.cache_control, "Vary": "Accept-Encoding"}
+        if _etag_matches(request.headers.get("if-none-match", ""), etag):
+            return Response(status_code=304, headers=headers)
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type=self.media_type, headers=headers)
@@ -1,54 +1,335 @@
+import asyncio
+import hashlib
 import json
 import os
+import secrets
+import string
+import time
+from typing import AsyncIterator, Optional
 
-import requests
+import httpx
 
-from http_session import create_session
+from cache import TTLCache
+from http_session import RETRY_STATUS_FORCELIST, create_session
+from limiter import ConcurrencyLimiter, Overloaded
+from metrics import Counter, Histogram
+from ogg_opus import OggError
+from ogg_opus import split as split_ogg_opus
 
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 OPENAI_STT_MODEL = os.getenv("OPENAI_STT_MODEL", "whisper-1")
+OPENAI_STT_URL = os.getenv("OPENAI_STT_URL", "https://api.openai.com/v1/audio/transcriptions")
+# Voice notes longer than twice this are cut into segments of about this
+# length near silence and transcribed concurrently; 0 disables it.
+STT_SEGMENT_SECONDS = float(os.getenv("STT_SEGMENT_SECONDS", "30"))
+STT_SEGMENT_OVERLAP_SECONDS = float(os.getenv("STT_SEGMENT_OVERLAP_SECONDS", "1.5"))
+# Longer notes get longer segments rather than more of them.
+STT_SEGMENT_MAX = int(os.getenv("STT_SEGMENT_MAX", "20"))
+# Segments of one note in flight at once; the rest wait their turn here
+# instead of filling the shared STT queue.
+STT_SEGMENT_CONCURRENCY = int(os.getenv("STT_SEGMENT_CONCURRENCY", "2"))
+STT_SEGMENT_ATTEMPTS = 3
+STT_SEGMENT_RETRY_DELAY = 1.0
+# How far a repeated run of words is looked for where two segments meet.
+STITCH_MAX_OVERLAP_WORDS = 20
+TRANSCRIPT_CACHE_MAX_ENTRIES = int(os.getenv("TRANSCRIPT_CACHE_MAX_ENTRIES", "5000"))
+TRANSCRIPT_CACHE_MAX_BYTES = int(os.getenv("TRANSCRIPT_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+TRANSCRIPT_CACHE_TTL_SECONDS = int(os.getenv("TRANSCRIPT_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+
+STT_PROMPT = (
+    "Transcribe exactly. Language may be Russian, Spanish, or English. "
+    "Do not add extra words. Do not translate."
+)
 
 OPENAI_SESSION = create_session()
+# Telegram file downloads; separate so they never wait on OpenAI connections.
+FILE_SESSION = create_session(max_connections=20, max_keepalive_connections=5)
+REQUEST_TIMEOUT = httpx.Timeout(30, connect=5)
+# Voice uploads are slow and large; cap them separately so a burst of voice
+# messages cannot take the connections text translations need.
+STT_LIMITER = ConcurrencyLimiter.from_env("stt", max_concurrent=4, max_queue=16)
+
+# Forwarded voice notes keep their file_unique_id, so a repeat skips both the
+# download and the STT call.
+TRANSCRIPT_CACHE = TTLCache(
+    "transcripts",
+    max_entries=TRANSCRIPT_CACHE_MAX_ENTRIES,
+    ttl_seconds=TRANSCRIPT_CACHE_TTL_SECONDS,
+    max_bytes=TRANSCRIPT_CACHE_MAX_BYTES,
+)
+_STT_PROMPT_HASH = hashlib.sha256(STT_PROMPT.encode("utf-8")).digest()[:16]
+
+STT_LATENCY = Histogram("translator_stt_request_seconds", "Speech-to-text call latency.")
+STT_RESPONSES = Counter(
+    "translator_stt_responses_total",
+    "Speech-to-text calls by HTTP status (0 for transport errors).",
+    ("status",),
+)
+TRANSCRIPT_SAVED_BYTES = Counter(
+    "translator_transcript_cache_saved_bytes_total",
+    "Audio bytes neither downloaded nor uploaded thanks to the transcript cache.",
+)
+TRANSCRIPT_SAVED_SECONDS = Counter(
+    "translator_transcript_cache_saved_audio_seconds_total",
+    "Seconds of audio not transcribed thanks to the transcript cache.",
+)
+
+
+def _transcript_cache_key(file_unique_id: str) -> tuple:
+    return (file_unique_id, OPENAI_STT_MODEL, _STT_PROMPT_HASH)
+
+
+def cached_transcript(
+    file_unique_id: Optional[str], file_size: Optional[int] = None, duration: Optional[int] = None
+) -> Optional[str]:
+    """Transcript of a Telegram file seen before, counting the audio it saves."""
+    if not file_unique_id or not TRANSCRIPT_CACHE.enabled:
+        return None
+    text = TRANSCRIPT_CACHE.get(_transcript_cache_key(file_unique_id))
+    if text is not None:
+        TRANSCRIPT_SAVED_BYTES.inc(amount=file_size or 0)
+        TRANSCRIPT_SAVED_SECONDS.inc(amount=duration or 0)
+        print(f"stt cache=hit bytes={file_size or 0} seconds={duration or 0}")
+    return text
+
 
+def store_transcript(file_unique_id: Optional[str], text: str) -> None:
+    if not file_unique_id or not text:
+        return
+    size = len(file_unique_id) + len(text.encode("utf-8"))
+    TRANSCRIPT_CACHE.set(_transcript_cache_key(file_unique_id), text, size=size)
 
-def _parse_text(response: requests.Response) -> str:
+
+def transcript_savings() -> dict:
+    return {
+        "bytes": TRANSCRIPT_SAVED_BYTES.value(),
+        "audio_seconds": TRANSCRIPT_SAVED_SECONDS.value(),
+    }
+
+
+def _parse_text(response: httpx.Response) -> Optional[str]:
+    """The transcript, "" for audio without speech, or None when the call failed."""
     if response.status_code != 200:
-        return ""
+        return None
     try:
         data = response.json()
     except json.JSONDecodeError:
-        return ""
+        return None
     text = data.get("text")
     if not text:
         return ""
     return str(text).strip()
 
 
-def transcribe(audio_bytes: bytes) -> str:
+async def transcribe(audio_bytes: bytes) -> str:
     if not OPENAI_API_KEY:
         return ""
     if not audio_bytes:
         return ""
+    return await _transcribe_bytes(audio_bytes) or ""
+
+
+async def _transcribe_bytes(audio_bytes: bytes) -> Optional[str]:
     files = {
         "file": ("audio.ogg", audio_bytes, "audio/ogg"),
     }
     data = {
         "model": OPENAI_STT_MODEL,
-        "prompt": (
-            "Transcribe exactly. Language may be Russian, Spanish, or English. "
-            "Do not add extra words. Do not translate."
-        ),
+        "prompt": STT_PROMPT,
         "temperature": 0,
     }
     try:
-        response = OPENAI_SESSION.post(
-            "https://api.openai.com/v1/audio/transcriptions",
+        async with STT_LIMITER.slot():
+            return await _transcribe_request(files, data)
+    except Overloaded:
+        print("stt_overloaded")
+        return None
+
+
+async def _transcribe_request(files: dict, data: dict) -> Optional[str]:
+    started = time.monotonic()
+    try:
+        response = await OPENAI_SESSION.post(
+            OPENAI_STT_URL,
             headers={"Authorization": f"Bearer {OPENAI_API_KEY}"},
             files=files,
             data=data,
-            timeout=(5, 30),
+            timeout=REQUEST_TIMEOUT,
+            extensions={"span_name": "stt"},
         )
-    except requests.RequestException:
-        return ""
+    except httpx.HTTPError:
+        STT_LATENCY.observe(time.monotonic() - started)
+        STT_RESPONSES.inc(0)
+        return None
+    STT_LATENCY.observe(time.monotonic() - started)
+    STT_RESPONSES.inc(response.status_code)
     return _parse_text(response)
+
+
+def should_segment(duration_seconds: Optional[float]) -> bool:
+    return STT_SEGMENT_SECONDS > 0 and (duration_seconds or 0) > 2 * STT_SEGMENT_SECONDS
+
+
+def _word_key(word: str) -> str:
+    return word.strip(string.punctuation + "¿¡«»…—").casefold()
+
+
+def stitch_transcripts(texts: list[str]) -> str:
+    """Join segment transcripts, dropping words repeated because segments overlap."""
+    words: list[str] = []
+    for text in texts:
+        following = text.split()
+        longest = min(STITCH_MAX_OVERLAP_WORDS, len(words), len(following))
+        overlap = 0
+        for size in range(longest, 0, -1):
+            tail = [_word_key(word) for word in words[-size:]]
+            if tail == [_word_key(word) for word in following[:size]]:
+                overlap = size
+                break
+        words.extend(following[overlap:])
+    return " ".join(words)
+
+
+async def transcribe_segmented(audio_bytes: bytes) -> str:
+    """Transcribe a long Ogg Opus voice note as concurrent segments.
+
+    At most ``STT_SEGMENT_CONCURRENCY`` segments of the note run at once. A
+    failed segment is retried on its own; if it still fails the note is not
+    transcribed, so a lost segment never leaves a hole in the transcript.
+    """
+    if not OPENAI_API_KEY:
+        return ""
+    if not audio_bytes:
+        return ""
+    try:
+        segments = await asyncio.to_thread(
+            split_ogg_opus,
+            audio_bytes,
+            STT_SEGMENT_SECONDS,
+            STT_SEGMENT_OVERLAP_SECONDS,
+            max_segments=STT_SEGMENT_MAX,
+        )
+    except OggError as exc:
+        print(f"stt_segment_failed error={exc}")
+        return await transcribe(audio_bytes)
+    if len(segments) == 1:
+        return await transcribe(audio_bytes)
+    gate = asyncio.Semaphore(max(1, STT_SEGMENT_CONCURRENCY))
+    texts = await asyncio.gather(*(_transcribe_segment(segment, gate) for segment in segments))
+    if any(text is None for text in texts):
+        print(f"stt_segment_failed segments={len(segments)} failed={texts.count(None)}")
+        return ""
+    print(f"stt_segmented segments={len(segments)}")
+    return stitch_transcripts(texts)
+
+
+async def _transcribe_segment(segment: bytes, gate: asyncio.Semaphore) -> Optional[str]:
+    for attempt in range(STT_SEGMENT_ATTEMPTS):
+        if attempt:
+            await asyncio.sleep(STT_SEGMENT_RETRY_DELAY * attempt)
+        async with gate:
+            text = await _transcribe_bytes(segment)
+        if text is not None:
+            return text
+    return None
+
+
+def _multipart_frame(boundary: str) -> tuple[bytes, bytes]:
+    """Bytes before and after the audio in a multipart body for the STT form."""
+    fields = {"model": OPENAI_STT_MODEL, "prompt": STT_PROMPT, "temperature": "0"}
+    head = "".join(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'
+        for name, value in fields.items()
+    )
+    head += (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="audio.ogg"\r\n'
+        "Content-Type: audio/ogg\r\n\r\n"
+    )
+    return head.encode(), f"\r\n--{boundary}--\r\n".encode()
+
+
+async def transcribe_url(file_url: str) -> str:
+    """Transcribe the audio at ``file_url`` while it downloads.
+
+    Download chunks go straight into the upload body, so download and upload
+    overlap and only a chunk or two is held in memory at a time. The streamed
+    body cannot be replayed, so when the upload hits a retryable status or a
+    connection error the file is downloaded whole and sent again through
+    :func:`transcribe`, which retries.
+    """
+    if not OPENAI_API_KEY:
+        return ""
+    if not file_url:
+        return ""
+    try:
+        async with STT_LIMITER.slot():
+            text = await _transcribe_streamed(file_url)
+    except Overloaded:
+        print("stt_overloaded")
+        return ""
+    if text is not None:
+        return text
+    print("stt_stream_failed fallback=buffered")
+    return await transcribe(await _download(file_url))
+
+
+async def _download(file_url: str) -> bytes:
+    try:
+        response = await FILE_SESSION.get(
+            file_url, timeout=REQUEST_TIMEOUT, extensions={"span_name": "tg_file"}
+        )
+    except httpx.HTTPError:
+        return b""
+    if response.status_code != 200:
+        print(f"stt_download_failed status={response.status_code}")
+        return b""
+    return response.content
+
+
+async def _transcribe_streamed(file_url: str) -> Optional[str]:
+    """The transcript, or None when the upload failed in a way worth retrying."""
+    boundary = secrets.token_hex(16)
+    head, tail = _multipart_frame(boundary)
+    started = time.monotonic()
+    try:
+        async with FILE_SESSION.stream(
+            "GET", file_url, timeout=REQUEST_TIMEOUT, extensions={"span_name": "tg_file"}
+        ) as download:
+            if download.status_code != 200:
+                print(f"stt_download_failed status={download.status_code}")
+                return ""
+
+            async def body() -> AsyncIterator[bytes]:
+                yield head
+                async for chunk in download.aiter_bytes():
+                    yield chunk
+                yield tail
+
+            headers = {
+                "Authorization": f"Bearer {OPENAI_API_KEY}",
+                "Content-Type": f"multipart/form-data; boundary={boundary}",
+            }
+            # With a known size the upload is sent with Content-Length,
+            # otherwise chunked.
+            length = download.headers.get("Content-Length", "")
+            if length.isdigit() and "Content-Encoding" not in download.headers:
+                headers["Content-Length"] = str(len(head) + int(length) + len(tail))
+            response = await OPENAI_SESSION.post(
+                OPENAI_STT_URL,
+                headers=headers,
+                content=body(),
+                timeout=REQUEST_TIMEOUT,
+                # The body is consumed as it is sent and cannot be replayed.
+                extensions={"span_name": "stt", "retry": False},
+            )
+    except httpx.HTTPError:
+        STT_LATENCY.observe(time.monotonic() - started)
+        STT_RESPONSES.inc(0)
+        return None
+    STT_LATENCY.observe(time.monotonic() - started)
+    STT_RESPONSES.inc(response.status_code)
+    if response.status_code in RETRY_STATUS_FORCELIST:
+        return None
+    return _parse_text(response) or ""
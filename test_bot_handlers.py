@@ -0,0 +1,173 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+from telegram.error import RetryAfter
+
+import bot_handlers
+import stt
+from message_store import MemoryMessageStore
+
+
+def _make_query():
+    query = MagicMock()
+    query.edit_message_text = AsyncMock()
+    return query
+
+
+def test_live_editor_coalesces_updates():
+    query = _make_query()
+
+    async def run():
+        editor = bot_handlers._LiveEditor(query, interval=0.05)
+        for i in range(1, 21):
+            editor.update("x" * i)
+            await asyncio.sleep(0.005)
+        await editor.close()
+
+    asyncio.run(run())
+    edits = [call.args[0] for call in query.edit_message_text.await_args_list]
+    assert edits[0] == "x ▌"
+    assert 1 < len(edits) < 20
+    assert all(len(a) < len(b) for a, b in zip(edits, edits[1:]))
+
+
+def test_translate_with_live_edits_returns_final_result(monkeypatch):
+    query = _make_query()
+
+    async def fake_stream(text, target, source="text"):
+        yield {"event": "delta", "text": "Hola"}
+        yield {"event": "reset", "reason": "too_short"}
+        yield {"event": "done", "result": {"ok": True, "text": "Hola amigo", "provider_used": "deepl"}}
+
+    monkeypatch.setattr(bot_handlers, "translate_core_stream", fake_stream)
+    monkeypatch.setattr(bot_handlers, "TG_STREAM_EDIT_INTERVAL_SECONDS", 0)
+    result = asyncio.run(bot_handlers._translate_with_live_edits(query, "Hi", "es-es", "text"))
+    assert result["text"] == "Hola amigo"
+
+
+def test_live_edits_survive_flood_control(monkeypatch):
+    query = _make_query()
+    query.edit_message_text.side_effect = [None, RetryAfter(0.05), None, None]
+
+    async def fake_stream(text, target, source="text"):
+        yield {"event": "delta", "text": "Hola"}
+        await asyncio.sleep(0.02)
+        yield {"event": "delta", "text": " amigo"}
+        await asyncio.sleep(0.02)
+        yield {"event": "delta", "text": " mío"}
+        yield {"event": "done", "result": {"ok": True, "text": "Hola amigo mío", "provider_used": "openai"}}
+
+    monkeypatch.setattr(bot_handlers, "translate_core_stream", fake_stream)
+    monkeypatch.setattr(bot_handlers, "TG_STREAM_EDIT_INTERVAL_SECONDS", 0.01)
+
+    async def run():
+        result = await bot_handlers._translate_with_live_edits(query, "Hi", "es-es", "text")
+        # The caller's final edit goes through once the editor has closed.
+        await bot_handlers._safe_edit_text(query, result["text"])
+        return result
+
+    result = asyncio.run(run())
+    assert result["text"] == "Hola amigo mío"
+    assert query.edit_message_text.await_args_list[-1].args[0] == "Hola amigo mío"
+
+
+def test_live_editor_close_swallows_edit_failures():
+    query = _make_query()
+    query.edit_message_text.side_effect = RuntimeError("boom")
+
+    async def run():
+        editor = bot_handlers._LiveEditor(query, interval=0.01)
+        editor.update("Hola")
+        await asyncio.sleep(0.01)
+        await editor.close()
+
+    asyncio.run(run())
+    assert query.edit_message_text.await_count == 1
+
+
+def test_text_cache_is_bounded(monkeypatch):
+    cache = bot_handlers.TTLCache("test-bot-text", max_entries=3, ttl_seconds=60)
+    monkeypatch.setattr(bot_handlers, "_MESSAGE_STORE", MemoryMessageStore(cache))
+
+    async def run():
+        for message_id in range(5):
+            await bot_handlers._store_cached_text(1, message_id, f"text {message_id}", "text")
+        return (
+            await bot_handlers._get_cached_text(1, 0),
+            await bot_handlers._get_cached_text(1, 4),
+        )
+
+    oldest, newest = asyncio.run(run())
+    assert len(cache) == 3
+    assert oldest is None
+    assert newest == ("text 4", "text")
+    assert cache.stats()["evictions"] == 2
+
+
+def test_repeated_voice_note_skips_download_and_stt(monkeypatch):
+    cache = bot_handlers.TTLCache("test-bot-voice-text", max_entries=10, ttl_seconds=60)
+    monkeypatch.setattr(bot_handlers, "_MESSAGE_STORE", MemoryMessageStore(cache))
+    stt.TRANSCRIPT_CACHE.clear()
+    transcribe_url = AsyncMock(return_value="hola")
+    monkeypatch.setattr(bot_handlers, "transcribe_url", transcribe_url)
+
+    def make_update(message_id):
+        update = MagicMock()
+        update.effective_user.username = None
+        update.effective_chat.id = 1
+        update.message.message_id = message_id
+        update.message.reply_text = AsyncMock()
+        voice = update.message.voice
+        voice.file_unique_id = "AgADvoice"
+        voice.file_size = 4096
+        voice.duration = 3
+        voice.get_file = AsyncMock(return_value=MagicMock(file_path="https://files.test/v.oga"))
+        return update
+
+    first, second = make_update(1), make_update(2)
+    asyncio.run(bot_handlers.handle_voice(first, None))
+    asyncio.run(bot_handlers.handle_voice(second, None))
+
+    assert transcribe_url.await_count == 1
+    second.message.voice.get_file.assert_not_awaited()
+    assert "hola" in second.message.reply_text.await_args.args[0]
+
+
+def test_language_tap_uses_the_speculative_translation(monkeypatch):
+    cache = bot_handlers.TTLCache("test-bot-spec-text", max_entries=10, ttl_seconds=60)
+    monkeypatch.setattr(bot_handlers, "_MESSAGE_STORE", MemoryMessageStore(cache))
+    monkeypatch.setattr(bot_handlers, "TG_SPECULATIVE_TRANSLATIONS", True)
+    monkeypatch.setattr(bot_handlers, "TG_STREAM_TRANSLATIONS", False)
+    translate = AsyncMock(return_value={"ok": True, "text": "Hola", "provider_used": "openai"})
+    monkeypatch.setattr(bot_handlers._SPECULATOR, "_translate", translate)
+    monkeypatch.setattr(bot_handlers, "translate_core", AsyncMock(side_effect=AssertionError))
+    for _ in range(3):
+        bot_handlers._SPECULATOR.history.record(42, "es-es")
+
+    message = MagicMock()
+    message.text = "Hello"
+    message.message_id = 7
+    message.reply_text = AsyncMock()
+    update = MagicMock()
+    update.effective_user.username = None
+    update.effective_user.id = 42
+    update.effective_chat.id = 1
+    update.message = message
+
+    tap = MagicMock()
+    tap.effective_user.username = None
+    tap.effective_user.id = 42
+    tap.effective_chat.id = 1
+    query = _make_query()
+    query.answer = AsyncMock()
+    query.data = "lang:set:es-es"
+    query.message.reply_to_message.message_id = 7
+    tap.callback_query = query
+
+    async def run():
+        await bot_handlers.handle_text(update, None)
+        await bot_handlers.handle_language_choice(tap, None)
+
+    asyncio.run(run())
+    translate.assert_awaited_once_with("Hello", "es-es", "text")
+    assert "Hola" in query.edit_message_text.await_args.args[0]
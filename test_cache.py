@@ -0,0 +1,86 @@
+import asyncio
+
+from cache import TTLCache, sweep_periodically
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_cache_hit_and_miss_counters():
+    cache = TTLCache("test-counters", max_entries=10, ttl_seconds=60)
+    assert cache.get("a") is None
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_ttl_cache_expires_entries():
+    clock = FakeClock()
+    cache = TTLCache("test-ttl", max_entries=10, ttl_seconds=60, clock=clock)
+    cache.set("a", 1)
+    clock.now += 61
+    assert cache.get("a") is None
+    assert len(cache) == 0
+    assert cache.stats()["expirations"] == 1
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache("test-lru", max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_cache_byte_bound():
+    cache = TTLCache("test-bytes", max_entries=100, ttl_seconds=60, max_bytes=10)
+    cache.set("a", "x", size=6)
+    cache.set("b", "y", size=6)
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] == 6
+    cache.set("huge", "z", size=11)
+    assert cache.get("huge") is None
+
+
+def test_ttl_cache_disabled_when_max_entries_zero():
+    cache = TTLCache("test-disabled", max_entries=0, ttl_seconds=60)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+
+
+def test_ttl_cache_sweep_removes_only_expired_entries():
+    clock = FakeClock()
+    cache = TTLCache("test-sweep", max_entries=10, ttl_seconds=60, clock=clock)
+    cache.set("old", 1, size=5)
+    clock.now += 30
+    cache.set("new", 2, size=5)
+    clock.now += 31
+    assert cache.sweep() == 1
+    assert len(cache) == 1
+    assert cache.stats()["bytes"] == 5
+    assert cache.get("new") == 2
+
+
+def test_sweep_periodically_sweeps_registered_caches():
+    clock = FakeClock()
+    cache = TTLCache("test-periodic", max_entries=10, ttl_seconds=1, clock=clock)
+    cache.set("a", 1)
+    clock.now += 2
+
+    async def run():
+        task = asyncio.create_task(sweep_periodically(0.001))
+        await asyncio.sleep(0.02)
+        task.cancel()
+
+    asyncio.run(run())
+    assert len(cache) == 0
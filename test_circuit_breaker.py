@@ -0,0 +1,76 @@
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def _breaker(clock, **kwargs):
+    options = {"window_size": 4, "min_calls": 4, "failure_rate": 0.5, "open_seconds": 10}
+    options.update(kwargs)
+    return CircuitBreaker("test", clock=clock, **options)
+
+
+def test_breaker_opens_on_error_rate():
+    breaker = _breaker(FakeClock())
+    for success in (True, False, True, False):
+        assert breaker.allow()
+        breaker.record(success, 0.1)
+    assert breaker.state == OPEN
+    assert breaker.allow() is False
+    assert breaker.snapshot()["rejected"] == 1
+
+
+def test_breaker_waits_for_min_calls():
+    breaker = _breaker(FakeClock())
+    for _ in range(3):
+        breaker.record(False, 0.1)
+    assert breaker.state == CLOSED
+
+
+def test_breaker_counts_slow_calls_as_failures():
+    breaker = _breaker(FakeClock(), slow_call_seconds=1.0)
+    for _ in range(4):
+        breaker.record(True, 2.0)
+    assert breaker.state == OPEN
+
+
+def test_breaker_half_open_probe_closes_on_success():
+    clock = FakeClock()
+    breaker = _breaker(clock)
+    for _ in range(4):
+        breaker.record(False, 0.1)
+    clock.now += 10
+    assert breaker.allow() is True
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() is False
+    breaker.record(True, 0.1)
+    assert breaker.state == CLOSED
+    assert [t["to"] for t in breaker.snapshot()["transitions"]] == [OPEN, HALF_OPEN, CLOSED]
+
+
+def test_breaker_half_open_probe_failure_reopens():
+    clock = FakeClock()
+    breaker = _breaker(clock)
+    for _ in range(4):
+        breaker.record(False, 0.1)
+    clock.now += 10
+    assert breaker.allow() is True
+    breaker.record(False, 0.1)
+    assert breaker.state == OPEN
+    assert breaker.allow() is False
+
+
+def test_breaker_abandoned_probe_frees_slot():
+    clock = FakeClock()
+    breaker = _breaker(clock)
+    for _ in range(4):
+        breaker.record(False, 0.1)
+    clock.now += 10
+    assert breaker.allow() is True
+    breaker.abandon()
+    assert breaker.allow() is True
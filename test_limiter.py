@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from limiter import ConcurrencyLimiter, Overloaded
+
+
+def test_slots_are_handed_over_in_fifo_order():
+    limiter = ConcurrencyLimiter("test-fifo", max_concurrent=1, max_queue=10)
+    order = []
+
+    async def work(name):
+        async with limiter.slot():
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.gather(*(work(i) for i in range(4)))
+
+    asyncio.run(run())
+    assert order == [0, 1, 2, 3]
+    stats = limiter.stats()
+    assert stats["in_flight"] == 0
+    assert stats["queued"] == 0
+    assert stats["acquired"] == 4
+    assert stats["avg_wait_seconds"] > 0
+
+
+def test_full_queue_rejects_immediately():
+    limiter = ConcurrencyLimiter("test-full", max_concurrent=1, max_queue=1)
+
+    async def run():
+        release = asyncio.Event()
+
+        async def hold():
+            async with limiter.slot():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        waiter = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        assert limiter.would_reject()
+        with pytest.raises(Overloaded) as info:
+            await limiter.acquire()
+        release.set()
+        await asyncio.gather(holder, waiter)
+        return info.value
+
+    overloaded = asyncio.run(run())
+    assert overloaded.retry_after >= 1
+    assert limiter.stats()["rejected"] == 1
+    assert limiter.in_flight == 0
+
+
+def test_queue_wait_times_out():
+    limiter = ConcurrencyLimiter("test-timeout", max_concurrent=1, max_queue=5, max_wait_seconds=0.02)
+
+    async def run():
+        await limiter.acquire()
+        with pytest.raises(Overloaded):
+            await limiter.acquire()
+        assert limiter.queued == 0
+        limiter.release()
+
+    asyncio.run(run())
+    assert limiter.in_flight == 0
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    limiter = ConcurrencyLimiter("test-cancel", max_concurrent=1, max_queue=5)
+
+    async def run():
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        limiter.release()
+        assert limiter.in_flight == 0
+        await asyncio.wait_for(limiter.acquire(), 0.1)
+        limiter.release()
+
+    asyncio.run(run())
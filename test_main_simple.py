@@ -5,6 +5,7 @@ import os
 import sys
 import time
 import urllib.parse
+from typing import Optional
 import pytest
 from unittest.mock import MagicMock, AsyncMock, patch
 
@@ -36,21 +37,22 @@ sys.modules['bot_handlers'] = mock_bot_handlers
 _TEST_BOT_TOKEN = os.environ["TELEGRAM_BOT_TOKEN"]
 
 
-def _make_initdata(username: str = "testuser") -> str:
+def _make_initdata(username: str = "testuser", auth_date: Optional[int] = None) -> str:
     user_json = json.dumps({"id": 123, "username": username}, separators=(",", ":"))
-    auth_date = str(int(time.time()))
-    pairs = sorted([
-        f"auth_date={auth_date}",
-        f"user={urllib.parse.quote(user_json, safe='')}",
-    ])
-    data_check_string = "\n".join(pairs)
+    auth_date = str(int(time.time()) if auth_date is None else auth_date)
+    fields = {"auth_date": auth_date, "user": user_json}
+    data_check_string = "\n".join(f"{key}={value}" for key, value in sorted(fields.items()))
     secret_key = _hmac.new(b"WebAppData", _TEST_BOT_TOKEN.encode(), hashlib.sha256).digest()
     hash_val = _hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
-    return "&".join(pairs) + f"&hash={hash_val}"
+    query = "&".join(
+        f"{key}={urllib.parse.quote(value, safe='')}" for key, value in sorted(fields.items())
+    )
+    return query + f"&hash={hash_val}"
 
 
 # Now safe to import
 from fastapi.testclient import TestClient
+import main
 from main import app
 
 
@@ -87,6 +89,17 @@ def test_app_css_endpoint(client):
     assert "text/css" in response.headers["content-type"]
 
 
+def test_app_endpoint_revalidates_with_etag(client):
+    response = client.get("/app", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["cache-control"] == "no-cache"
+    repeat = client.get(
+        "/app", headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["etag"]}
+    )
+    assert repeat.status_code == 304
+    assert repeat.content == b""
+
+
 def test_translate_without_auth(client):
     response = client.post(
         "/api/translate",
@@ -141,3 +154,238 @@ def test_telegram_webhook_with_wrong_secret(client):
         headers={"X-Telegram-Bot-Api-Secret-Token": "wrong_secret"}
     )
     assert response.status_code == 401
+
+
+def test_telegram_webhook_acks_and_drops_redelivery(client):
+    mock_app_instance.process_update = AsyncMock()
+    headers = {"X-Telegram-Bot-Api-Secret-Token": os.environ["TG_WEBHOOK_SECRET"]}
+    payload = {"update_id": 321, "message": {"chat": {"id": 5}, "text": "hi"}}
+
+    first = client.post("/tg/webhook", json=payload, headers=headers)
+    second = client.post("/tg/webhook", json=payload, headers=headers)
+
+    assert first.status_code == 200
+    assert second.status_code == 200
+    stats = client.get("/debug/providers").json()["webhook"]
+    assert stats["duplicates"] == 1
+
+
+def test_translate_batch_validates_each_item(client):
+    async def fake_batch(items):
+        return [
+            {"ok": True, "status_code": 200, "text": text.upper(), "provider_used": "openai"}
+            for text, _ in items
+        ]
+
+    with patch("main.translate_batch", AsyncMock(side_effect=fake_batch)) as translate_batch:
+        response = client.post(
+            "/api/translate/batch",
+            json={
+                "items": [
+                    {"text": " hola ", "target": "en"},
+                    {"text": "", "target": "en"},
+                    {"text": "hi", "target": "xx"},
+                    "nope",
+                    {"text": "adiós", "target": "ru"},
+                ]
+            },
+            headers={"X-TG-INITDATA": _make_initdata()},
+        )
+    translate_batch.assert_awaited_once_with([("hola", "en"), ("adiós", "ru")])
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result.get("text") for result in results] == ["HOLA", None, None, None, "ADIÓS"]
+    assert results[1] == {"status_code": 400, "error": "Text is required"}
+    assert results[2]["error"] == "Unsupported target"
+    assert results[3]["error"] == "Item must be an object"
+
+
+def test_translate_batch_rejects_bad_payloads(client):
+    headers = {"X-TG-INITDATA": _make_initdata()}
+    assert client.post("/api/translate/batch", json={"items": []}, headers=headers).status_code == 400
+    too_many = {"items": [{"text": "a", "target": "en"}] * (main.TRANSLATE_BATCH_MAX_ITEMS + 1)}
+    assert client.post("/api/translate/batch", json=too_many, headers=headers).status_code == 400
+    invalid_only = {"items": [{"text": "", "target": "en"}]}
+    assert client.post("/api/translate/batch", json=invalid_only, headers=headers).status_code == 400
+
+
+def test_debug_cache_endpoint(client):
+    response = client.get("/debug/cache")
+    assert response.status_code == 200
+    assert "translation" in response.json()["caches"]
+
+
+def test_translate_multiple_targets(client):
+    results = {
+        "en": {"ok": True, "status_code": 200, "text": "hello", "provider_used": "openai", "fallback_reason": None},
+        "ru": {"ok": False, "status_code": 502, "error": "DeepL error", "provider_used": "deepl", "fallback_reason": "openai_error"},
+    }
+    with patch("main.translate_many", AsyncMock(return_value=results)) as translate_many:
+        response = client.post(
+            "/api/translate",
+            json={"text": "hola", "targets": ["en", "ru"]},
+            headers={"X-TG-INITDATA": _make_initdata()},
+        )
+    translate_many.assert_awaited_once_with("hola", ["en", "ru"])
+    assert response.status_code == 200
+    data = response.json()["results"]
+    assert data["en"]["text"] == "hello"
+    assert data["ru"]["fallback_reason"] == "openai_error"
+    assert "ok" not in data["en"]
+
+
+def test_translate_multiple_targets_rejects_unknown_target(client):
+    response = client.post(
+        "/api/translate",
+        json={"text": "hola", "targets": ["en", "xx"]},
+        headers={"X-TG-INITDATA": _make_initdata()},
+    )
+    assert response.status_code == 400
+
+
+def test_translate_stream_sends_server_sent_events(client):
+    async def fake_stream(text, target):
+        yield {"event": "delta", "text": "Hel"}
+        yield {"event": "delta", "text": "lo"}
+        yield {"event": "done", "result": {"ok": True, "status_code": 200, "text": "Hello", "provider_used": "openai"}}
+
+    with patch("main.translate_core_stream", fake_stream):
+        response = client.post(
+            "/api/translate/stream",
+            json={"text": "hola", "target": "en"},
+            headers={"X-TG-INITDATA": _make_initdata()},
+        )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    frames = [frame for frame in response.text.split("\n\n") if frame]
+    assert frames[0] == 'event: delta\ndata: {"text": "Hel"}'
+    assert frames[-1].startswith("event: done\n")
+    done = json.loads(frames[-1].split("data: ", 1)[1])
+    assert done["text"] == "Hello"
+    assert "ok" not in done
+
+
+def test_translate_stream_reports_a_queue_timeout_as_503(client, monkeypatch):
+    limiter = main.ConcurrencyLimiter("test-translate-stream-timeout", 1, 1)
+
+    async def timed_out():
+        raise limiter._reject("timeout")
+
+    monkeypatch.setattr(limiter, "acquire", timed_out)
+    monkeypatch.setattr(main, "TRANSLATE_LIMITER", limiter)
+    response = client.post(
+        "/api/translate/stream",
+        json={"text": "hola", "target": "en"},
+        headers={"X-TG-INITDATA": _make_initdata()},
+    )
+    assert response.status_code == 200
+    done = json.loads(response.text.split("data: ", 1)[1])
+    assert done["status_code"] == 503
+    assert done["error"] == main.OVERLOADED_ERROR
+    assert done["retry_after"] >= 1
+
+
+def test_translate_stream_validates_before_streaming(client):
+    response = client.post(
+        "/api/translate/stream",
+        json={"text": "", "target": "en"},
+        headers={"X-TG-INITDATA": _make_initdata()},
+    )
+    assert response.status_code == 400
+
+
+def test_debug_providers_endpoint(client):
+    response = client.get("/debug/providers")
+    assert response.status_code == 200
+    assert "fired" in response.json()["hedge"]
+    assert response.json()["breakers"]["openai"]["state"] in {"closed", "open", "half_open"}
+
+
+def test_verify_initdata_caches_verified_result():
+    main._INITDATA_CACHE.clear()
+    init_data = _make_initdata("alice")
+    first = main._verify_tg_initdata(init_data)
+    hits = main._INITDATA_CACHE.hits
+    second = main._verify_tg_initdata(init_data)
+    assert first == second
+    assert first.username == "alice"
+    assert main._INITDATA_CACHE.hits == hits + 1
+
+
+def test_verify_initdata_rejects_tampered_data_with_cached_hash():
+    main._INITDATA_CACHE.clear()
+    init_data = _make_initdata("alice")
+    assert main._verify_tg_initdata(init_data)
+    tampered = init_data.replace("alice", "mallory")
+    assert main._verify_tg_initdata(tampered) is None
+
+
+def test_verify_initdata_rejects_cached_entry_once_expired(monkeypatch):
+    main._INITDATA_CACHE.clear()
+    init_data = _make_initdata(auth_date=int(time.time()) - main.INITDATA_MAX_AGE_SECONDS + 5)
+    assert main._verify_tg_initdata(init_data)
+    later = time.time() + 10
+    monkeypatch.setattr(main.time, "time", lambda: later)
+    assert main._verify_tg_initdata(init_data) is None
+    assert len(main._INITDATA_CACHE) == 0
+
+
+def test_allowlist_uses_verified_username(client, monkeypatch):
+    monkeypatch.setattr(main, "TG_ALLOWED_USERNAMES", {"alice"})
+    response = client.post(
+        "/api/translate",
+        json={"target": "ru"},
+        headers={"X-TG-INITDATA": _make_initdata("bob")},
+    )
+    assert response.status_code == 403
+    response = client.post(
+        "/api/translate",
+        json={"target": "ru"},
+        headers={"X-TG-INITDATA": _make_initdata("Alice")},
+    )
+    assert response.status_code == 400
+
+
+def test_metrics_endpoint(client):
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE translator_provider_request_seconds histogram" in response.text
+    assert 'translator_cache_hits_total{cache="translation"}' in response.text
+    assert 'translator_breaker_state{breaker="openai",state="closed"}' in response.text
+
+
+def test_translate_reports_phase_timings(client):
+    async def fake_translate_core(text, target):
+        with main.span("openai"):
+            pass
+        return {"ok": True, "status_code": 200, "text": "hello", "provider_used": "openai"}
+
+    with patch("main.translate_core", fake_translate_core):
+        response = client.post(
+            "/api/translate",
+            json={"text": "hola", "target": "en", "debug": True},
+            headers={"X-TG-INITDATA": _make_initdata()},
+        )
+    assert response.status_code == 200
+    timing = response.headers["server-timing"]
+    assert "auth;dur=" in timing and "openai;dur=" in timing and "total;dur=" in timing
+    spans = response.json()["debug"]["spans"]
+    assert [recorded["name"] for recorded in spans] == ["auth", "openai"]
+
+
+def test_translate_returns_503_when_overloaded(client, monkeypatch):
+    monkeypatch.setattr(main, "TRANSLATE_LIMITER", main.ConcurrencyLimiter("test-translate-full", 0, 0))
+    response = client.post(
+        "/api/translate",
+        json={"text": "hola", "target": "en"},
+        headers={"X-TG-INITDATA": _make_initdata()},
+    )
+    assert response.status_code == 503
+    assert int(response.headers["retry-after"]) >= 1
+    stream = client.post(
+        "/api/translate/stream",
+        json={"text": "hola", "target": "en"},
+        headers={"X-TG-INITDATA": _make_initdata()},
+    )
+    assert stream.status_code == 503
@@ -0,0 +1,168 @@
+import asyncio
+
+from cache import TTLCache
+from message_store import (
+    MemoryMessageStore,
+    RedisMessageStore,
+    _encode_command,
+    create_message_store,
+)
+
+
+class FakeRedis:
+    """Just enough of a RESP server for the commands the store sends."""
+
+    def __init__(self, password=None):
+        self.password = password
+        self.data = {}
+        self.commands = []
+        self.connections = 0
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _serve(self, reader, writer):
+        self.connections += 1
+        authed = self.password is None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                args = []
+                for _ in range(int(line[1:-2])):
+                    length = int((await reader.readline())[1:-2])
+                    args.append((await reader.readexactly(length + 2))[:-2])
+                command = args[0].decode().upper()
+                self.commands.append([command] + [arg.decode() for arg in args[1:]])
+                if command == "AUTH":
+                    authed = args[1].decode() == self.password
+                    writer.write(b"+OK\r\n" if authed else b"-WRONGPASS invalid password\r\n")
+                elif not authed:
+                    writer.write(b"-NOAUTH Authentication required.\r\n")
+                elif command in ("PING", "SELECT"):
+                    writer.write(b"+OK\r\n")
+                elif command == "SET":
+                    self.data[args[1]] = args[2]
+                    writer.write(b"+OK\r\n")
+                elif command == "GET":
+                    value = self.data.get(args[1])
+                    if value is None:
+                        writer.write(b"$-1\r\n")
+                    else:
+                        writer.write(b"$%d\r\n%s\r\n" % (len(value), value))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def _run_with_server(scenario, password=None):
+    async def run():
+        server = FakeRedis(password=password)
+        port = await server.start()
+        try:
+            return await scenario(server, port)
+        finally:
+            await server.stop()
+
+    return asyncio.run(run())
+
+
+def test_encode_command():
+    assert _encode_command("GET", "k") == b"*2\r\n$3\r\nGET\r\n$1\r\nk\r\n"
+    assert _encode_command("SET", "k", "é", "EX", 60) == (
+        b"*5\r\n$3\r\nSET\r\n$1\r\nk\r\n$2\r\n\xc3\xa9\r\n$2\r\nEX\r\n$2\r\n60\r\n"
+    )
+
+
+def test_memory_store_round_trip():
+    store = MemoryMessageStore(TTLCache("test-store-memory", max_entries=10, ttl_seconds=60))
+
+    async def run():
+        await store.set("1:1", "hello", "text")
+        return await store.get("1:1"), await store.get("1:2")
+
+    assert asyncio.run(run()) == (("hello", "text"), None)
+    assert store.stats()["backend"] == "memory"
+
+
+def test_create_message_store_picks_backend():
+    cache = TTLCache("test-store-factory", max_entries=10, ttl_seconds=2700)
+    assert isinstance(create_message_store("", cache), MemoryMessageStore)
+    store = create_message_store("redis://localhost:6379/0", cache)
+    assert isinstance(store, RedisMessageStore)
+    assert store.ttl_seconds == 2700
+
+
+def test_redis_store_round_trip_with_ttl():
+    async def scenario(server, port):
+        store = RedisMessageStore(f"redis://127.0.0.1:{port}/0", ttl_seconds=2700)
+        await store.set("1:7", "¿Qué tal?", "stt")
+        found = await store.get("1:7")
+        missing = await store.get("1:8")
+        await store.close()
+        return store, found, missing
+
+    store, found, missing = _run_with_server(scenario)
+    assert found == ("¿Qué tal?", "stt")
+    assert missing is None
+    assert store.stats()["hits"] == 1
+    assert store.stats()["misses"] == 1
+
+
+def test_redis_store_sends_expiry_auth_and_db():
+    async def scenario(server, port):
+        store = RedisMessageStore(f"redis://:s3cret@127.0.0.1:{port}/2", ttl_seconds=60, pool_size=1)
+        await store.set("1:1", "hi", "text")
+        await store.close()
+        return server.commands
+
+    commands = _run_with_server(scenario, password="s3cret")
+    assert commands[:2] == [["AUTH", "s3cret"], ["SELECT", "2"]]
+    assert commands[2] == ["SET", "tg:text:1:1", '["hi", "text"]', "EX", "60"]
+
+
+def test_redis_store_pipelines_concurrent_commands():
+    async def scenario(server, port):
+        store = RedisMessageStore(f"redis://127.0.0.1:{port}", ttl_seconds=60, pool_size=2)
+        await asyncio.gather(*(store.set(f"1:{i}", f"text {i}", "text") for i in range(200)))
+        found = await asyncio.gather(*(store.get(f"1:{i}") for i in range(200)))
+        await store.close()
+        return server.connections, found
+
+    connections, found = _run_with_server(scenario)
+    assert connections <= 2
+    assert found == [(f"text {i}", "text") for i in range(200)]
+
+
+def test_redis_store_errors_degrade_to_miss():
+    async def scenario(server, port):
+        store = RedisMessageStore(f"redis://:wrong@127.0.0.1:{port}", ttl_seconds=60, pool_size=1)
+        await store.set("1:1", "hi", "text")
+        found = await store.get("1:1")
+        await store.close()
+        return store, found
+
+    store, found = _run_with_server(scenario, password="s3cret")
+    assert found is None
+    assert store.stats()["errors"] == 2
+
+
+def test_redis_store_unreachable_server_is_a_miss():
+    async def run():
+        server = await asyncio.start_server(lambda r, w: None, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        server.close()
+        await server.wait_closed()
+        store = RedisMessageStore(f"redis://127.0.0.1:{port}", ttl_seconds=60, timeout=0.5)
+        return await store.get("1:1"), store.stats()["errors"]
+
+    assert asyncio.run(run()) == (None, 1)
@@ -0,0 +1,52 @@
+import threading
+
+from metrics import Counter, Histogram, register_collector, render
+
+
+def _lines(prefix: str) -> list[str]:
+    return [line for line in render().splitlines() if line.startswith(prefix)]
+
+
+def test_counter_renders_labels_and_totals():
+    counter = Counter("test_requests_total", "Requests.", ("provider", "status"))
+    counter.inc("openai", 200)
+    counter.inc("openai", 200, amount=2)
+    counter.inc("deepl", 0)
+    assert _lines("test_requests_total") == [
+        'test_requests_total{provider="deepl",status="0"} 1',
+        'test_requests_total{provider="openai",status="200"} 3',
+    ]
+    assert "# TYPE test_requests_total counter" in render()
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(value)
+    assert _lines("test_latency_seconds") == [
+        'test_latency_seconds_bucket{le="0.1"} 1',
+        'test_latency_seconds_bucket{le="1"} 3',
+        'test_latency_seconds_bucket{le="+Inf"} 4',
+        "test_latency_seconds_sum 4.25",
+        "test_latency_seconds_count 4",
+    ]
+
+
+def test_per_thread_shards_are_merged():
+    counter = Counter("test_threaded_total", "Threaded increments.")
+
+    def work():
+        for _ in range(1000):
+            counter.inc()
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert _lines("test_threaded_total") == ["test_threaded_total 8000"]
+
+
+def test_collector_samples_and_label_escaping():
+    register_collector(lambda: [("test_gauge", "gauge", "A gauge.", {"name": 'a"b'}, 0.5)])
+    assert _lines("test_gauge") == ['test_gauge{name="a\\"b"} 0.5']
@@ -0,0 +1,111 @@
+import struct
+
+import pytest
+
+from ogg_opus import OggError, Page, encode_page, ogg_crc, parse_pages, split
+
+
+PRE_SKIP = 312
+FRAME_SAMPLES = 960  # 20 ms at 48 kHz
+
+
+def _reference_crc(data: bytes) -> int:
+    crc = 0
+    for byte in data:
+        crc ^= byte << 24
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x04C11DB7) if crc & 0x80000000 else crc << 1
+            crc &= 0xFFFFFFFF
+    return crc
+
+
+def _page(flags, granule, sequence, packets) -> Page:
+    lacing = bytearray()
+    for packet in packets:
+        lacing += b"\xff" * (len(packet) // 255) + bytes([len(packet) % 255])
+    return Page(flags, granule, 7, sequence, bytes(lacing), b"".join(packets))
+
+
+def _voice_note(page_sizes: list[int]) -> bytes:
+    """One page per second of audio; each entry is that second's packet size in bytes."""
+    head = b"OpusHead" + struct.pack("<BBHIhB", 1, 1, PRE_SKIP, 48000, 0, 0)
+    pages = [_page(0x02, 0, 0, [head]), _page(0, 0, 1, [b"OpusTags" + bytes(8)])]
+    granule = PRE_SKIP
+    for index, size in enumerate(page_sizes):
+        granule += 50 * FRAME_SAMPLES
+        flags = 0x04 if index == len(page_sizes) - 1 else 0
+        pages.append(_page(flags, granule, index + 2, [bytes([index % 256]) * size] * 50))
+    return b"".join(encode_page(page) for page in pages)
+
+
+def test_crc_matches_reference_implementation():
+    data = bytes(range(256)) * 3 + b"OggS"
+    assert ogg_crc(data) == _reference_crc(data)
+    assert ogg_crc(b"") == 0
+
+
+def test_parse_round_trips_encoded_pages():
+    data = _voice_note([80] * 3)
+    pages = parse_pages(data)
+    assert len(pages) == 5
+    assert b"".join(encode_page(page) for page in pages) == data
+
+
+def test_split_cuts_at_the_quietest_page_near_the_target():
+    # 90 s of speech with a quiet second at 28 s and 61 s.
+    sizes = [80] * 90
+    sizes[27] = 3
+    sizes[60] = 3
+    segments = split(_voice_note(sizes), target_seconds=30, overlap_seconds=0, search_seconds=5)
+
+    assert len(segments) == 3
+    first, second, third = (parse_pages(segment) for segment in segments)
+    assert len(first) - 2 == 28
+    assert len(second) - 2 == 33
+    assert len(third) - 2 == 29
+
+
+def test_segments_are_standalone_streams():
+    data = _voice_note([80] * 95)
+    for segment in split(data, target_seconds=30, overlap_seconds=2):
+        pages = parse_pages(segment)
+        raw_offset = 0
+        for sequence, page in enumerate(pages):
+            encoded = encode_page(page)
+            stored_crc = struct.unpack_from("<I", segment, raw_offset + 22)[0]
+            assert stored_crc == _reference_crc(encoded[:22] + b"\0\0\0\0" + encoded[26:])
+            assert page.sequence == sequence
+            raw_offset += len(encoded)
+        assert pages[0].body.startswith(b"OpusHead")
+        assert pages[0].flags & 0x02
+        assert [bool(page.flags & 0x04) for page in pages] == [False] * (len(pages) - 1) + [True]
+        # Granules restart: the first audio page holds one second plus the pre-skip.
+        assert pages[2].granule == PRE_SKIP + 50 * FRAME_SAMPLES
+
+
+def test_segments_overlap_by_whole_pages():
+    data = _voice_note([80] * 95)
+    first, second, _ = split(data, target_seconds=30, overlap_seconds=2)
+    first_bodies = [page.body for page in parse_pages(first)[2:]]
+    second_bodies = [page.body for page in parse_pages(second)[2:]]
+    assert second_bodies[:2] == first_bodies[-2:]
+
+
+def test_max_segments_lengthens_segments():
+    data = _voice_note([80] * 600)
+    assert len(split(data, target_seconds=30)) == 20
+    segments = split(data, target_seconds=30, max_segments=8)
+    assert len(segments) == 8
+    assert sum(len(parse_pages(segment)) - 2 for segment in segments) == 600
+
+
+def test_short_audio_is_left_whole():
+    data = _voice_note([80] * 20)
+    assert split(data, target_seconds=30) == [data]
+
+
+def test_non_opus_input_is_rejected():
+    with pytest.raises(OggError):
+        split(b"RIFF....WAVEfmt ", target_seconds=30)
+    with pytest.raises(OggError):
+        split(encode_page(_page(0x02, 0, 0, [b"\x80theora"])), target_seconds=30)
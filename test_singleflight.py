@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_single_flight_shares_one_call():
+    flight = SingleFlight("test-share")
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"value": 42}
+
+    async def run():
+        return await asyncio.gather(*(flight.do("key", work) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(result == {"value": 42} for result in results)
+    assert flight.stats() == {"in_flight": 0, "calls": 1, "coalesced": 4}
+
+
+def test_single_flight_propagates_errors_and_forgets_key():
+    flight = SingleFlight("test-errors")
+
+    async def fail():
+        raise RuntimeError("boom")
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await flight.do("key", fail)
+        return await flight.do("key", lambda: asyncio.sleep(0, result="ok"))
+
+    assert asyncio.run(run()) == "ok"
+    assert flight.calls == 2
+
+
+def test_single_flight_survives_cancelled_caller():
+    flight = SingleFlight("test-cancel")
+
+    async def work():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def run():
+        first = asyncio.ensure_future(flight.do("key", work))
+        second = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == "done"
@@ -0,0 +1,115 @@
+import asyncio
+
+from cache import TTLCache
+from speculation import SPECULATIONS, CharacterBudget, Speculator, TargetHistory
+
+
+def _history(name: str) -> TargetHistory:
+    return TargetHistory(TTLCache(name, max_entries=10, ttl_seconds=60), size=5)
+
+
+def test_history_bets_on_the_usual_target():
+    history = _history("test-history-usual")
+    for target in ("ru", "en", "ru"):
+        history.record(1, target)
+    assert history.likely(1, min_choices=3, min_share=0.6) == "ru"
+    assert history.likely(1, min_choices=4, min_share=0.6) is None
+    assert history.likely(2, min_choices=1, min_share=0.0) is None
+
+    history.record(1, "en")
+    # 2 of 4 each: below the share, and a tie goes to the most recent.
+    assert history.likely(1, min_choices=3, min_share=0.6) is None
+    assert history.likely(1, min_choices=3, min_share=0.5) == "en"
+
+
+def test_history_keeps_only_recent_choices():
+    history = _history("test-history-recent")
+    for target in ("ru",) * 5 + ("en",) * 3:
+        history.record(1, target)
+    assert history.likely(1, min_choices=5, min_share=0.6) == "en"
+
+
+def test_budget_refills_over_time():
+    now = [0.0]
+    budget = CharacterBudget(600, clock=lambda: now[0])
+    assert budget.try_spend(500)
+    assert not budget.try_spend(200)
+    now[0] = 10.0
+    assert budget.try_spend(200)
+    now[0] = 1000.0
+    assert not budget.try_spend(601)
+
+
+def _speculator(name, translate, busy=False, chars_per_minute=1000):
+    history = _history(f"{name}-history")
+    for _ in range(3):
+        history.record(1, "ru")
+    return Speculator(
+        translate,
+        history,
+        CharacterBudget(chars_per_minute),
+        TTLCache(f"{name}-parked", max_entries=10, ttl_seconds=60),
+        is_busy=lambda: busy,
+        min_choices=3,
+        min_share=0.6,
+    )
+
+
+def test_right_guess_hands_over_the_running_translation():
+    calls = []
+
+    async def translate(text, target, source):
+        calls.append((text, target, source))
+        await asyncio.sleep(0.01)
+        return {"ok": True, "text": "Привет"}
+
+    async def scenario():
+        speculator = _speculator("test-spec-hit", translate)
+        waited = []
+
+        async def on_wait():
+            waited.append(True)
+
+        assert speculator.start("1:10", 1, "Hello", "text") == "ru"
+        result = await speculator.claim("1:10", "ru", on_wait=on_wait)
+        return result, waited, await speculator.claim("1:10", "ru")
+
+    hits = SPECULATIONS.value("hit")
+    result, waited, again = asyncio.run(scenario())
+
+    assert result == {"ok": True, "text": "Привет"}
+    assert waited == [True]
+    assert again is None
+    assert calls == [("Hello", "ru", "text")]
+    assert SPECULATIONS.value("hit") == hits + 1
+
+
+def test_wrong_guess_and_failed_translation_fall_back():
+    async def translate(text, target, source):
+        return {"ok": False, "error": "boom"}
+
+    async def scenario():
+        speculator = _speculator("test-spec-miss", translate)
+        speculator.start("1:1", 1, "Hello", "text")
+        speculator.start("1:2", 1, "Hello", "text")
+        return await speculator.claim("1:1", "en"), await speculator.claim("1:2", "ru")
+
+    misses = SPECULATIONS.value("miss")
+    hits = SPECULATIONS.value("hit")
+    failures = SPECULATIONS.value("failed")
+    assert asyncio.run(scenario()) == (None, None)
+    assert SPECULATIONS.value("miss") == misses + 1
+    assert SPECULATIONS.value("hit") == hits
+    assert SPECULATIONS.value("failed") == failures + 1
+
+
+def test_no_speculation_when_busy_or_over_budget():
+    async def translate(text, target, source):
+        raise AssertionError("should not translate")
+
+    async def scenario():
+        busy = _speculator("test-spec-busy", translate, busy=True)
+        broke = _speculator("test-spec-budget", translate, chars_per_minute=3)
+        return busy.start("1:1", 1, "Hello", "text"), broke.start("1:1", 1, "Hello", "text")
+
+    assert asyncio.run(scenario()) == (None, None)
@@ -0,0 +1,86 @@
+import os
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from static_assets import StaticAsset, _accepted_encodings
+
+
+def _client(asset: StaticAsset) -> TestClient:
+    app = FastAPI()
+
+    @app.get("/asset")
+    async def serve(request: Request):
+        return asset.response(request)
+
+    return TestClient(app)
+
+
+def _asset(tmp_path, content="body { color: red; }\n" * 50, **kwargs) -> StaticAsset:
+    path = tmp_path / "app.css"
+    path.write_text(content, encoding="utf-8")
+    return StaticAsset(path, "text/css; charset=utf-8", "public, max-age=300", **kwargs)
+
+
+def test_accepted_encodings_parses_quality():
+    assert _accepted_encodings("gzip, br;q=0, *;q=0.5") == {"gzip": 1.0, "br": 0.0, "*": 0.5}
+
+
+def test_serves_gzip_with_strong_etag(tmp_path):
+    asset = _asset(tmp_path)
+    response = _client(asset).get("/asset", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["cache-control"] == "public, max-age=300"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"].startswith('"') and response.headers["etag"].endswith('-gzip"')
+    assert response.text == "body { color: red; }\n" * 50
+
+
+def test_prefers_brotli_with_its_own_etag(tmp_path):
+    client = _client(_asset(tmp_path))
+    response = client.get("/asset", headers={"Accept-Encoding": "gzip, br"})
+    gzipped = client.get("/asset", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"].endswith('-br"')
+    assert response.headers["etag"] != gzipped.headers["etag"]
+    # The test client decodes br itself.
+    assert response.content == (tmp_path / "app.css").read_bytes()
+
+
+def test_identity_when_client_does_not_accept_compression(tmp_path):
+    asset = _asset(tmp_path)
+    response = _client(asset).get("/asset", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.content == (tmp_path / "app.css").read_bytes()
+
+
+def test_matching_etag_returns_304(tmp_path):
+    client = _client(_asset(tmp_path))
+    etag = client.get("/asset", headers={"Accept-Encoding": "gzip"}).headers["etag"]
+    response = client.get("/asset", headers={"Accept-Encoding": "gzip", "If-None-Match": f"W/{etag}"})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    other = client.get("/asset", headers={"Accept-Encoding": "identity", "If-None-Match": etag})
+    assert other.status_code == 200
+
+
+def test_incompressible_file_is_only_served_as_identity(tmp_path):
+    asset = _asset(tmp_path, content="x")
+    response = _client(asset).get("/asset", headers={"Accept-Encoding": "gzip, br"})
+    assert "content-encoding" not in response.headers
+
+
+def test_reload_picks_up_changes(tmp_path):
+    asset = _asset(tmp_path, reload=True)
+    client = _client(asset)
+    first = client.get("/asset", headers={"Accept-Encoding": "gzip"}).headers["etag"]
+    path = tmp_path / "app.css"
+    path.write_text("body { color: blue; }\n" * 50, encoding="utf-8")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    response = client.get("/asset", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["etag"] != first
+    assert response.text.startswith("body { color: blue; }")
@@ -0,0 +1,204 @@
+import asyncio
+import email.parser
+import email.policy
+
+import httpx
+
+import stt
+from http_session import RetryTransport
+
+
+def _parse_form(request: httpx.Request) -> dict:
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        b"Content-Type: " + request.headers["Content-Type"].encode() + b"\r\n\r\n" + request.content
+    )
+    return {
+        part.get_param("name", header="content-disposition"): part.get_payload(decode=True)
+        for part in message.iter_parts()
+    }
+
+
+def _sessions(monkeypatch, audio: bytes, stt_status=200, file_headers=None):
+    """``stt_status`` may be a list of statuses returned in turn, the last one repeating."""
+    uploads = []
+    statuses = list(stt_status) if isinstance(stt_status, list) else [stt_status]
+
+    def file_handler(request):
+        return httpx.Response(200, headers=file_headers or {}, content=audio)
+
+    def stt_handler(request):
+        uploads.append(request)
+        status = statuses.pop(0) if len(statuses) > 1 else statuses[0]
+        return httpx.Response(status, json={"text": " hola "})
+
+    monkeypatch.setattr(stt, "OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(
+        stt, "FILE_SESSION", httpx.AsyncClient(transport=httpx.MockTransport(file_handler))
+    )
+    transport = RetryTransport(httpx.MockTransport(stt_handler), backoff_factor=0)
+    monkeypatch.setattr(stt, "OPENAI_SESSION", httpx.AsyncClient(transport=transport))
+    return uploads
+
+
+def test_transcribe_url_streams_download_into_multipart_upload(monkeypatch):
+    audio = b"OggS" + bytes(range(256)) * 40
+    uploads = _sessions(monkeypatch, audio, file_headers={"Content-Length": str(len(audio))})
+
+    text = asyncio.run(stt.transcribe_url("https://files.test/voice.oga"))
+
+    assert text == "hola"
+    [upload] = uploads
+    assert int(upload.headers["Content-Length"]) == len(upload.content)
+    form = _parse_form(upload)
+    assert form["file"] == audio
+    assert form["model"] == stt.OPENAI_STT_MODEL.encode()
+    assert form["prompt"] == stt.STT_PROMPT.encode()
+
+
+def test_transcribe_url_without_length_uploads_chunked(monkeypatch):
+    async def chunks():
+        yield b"OggS"
+        yield b"\x00" * 100
+
+    audio_stream = chunks()
+    uploads = []
+
+    def file_handler(request):
+        return httpx.Response(200, content=audio_stream)
+
+    def stt_handler(request):
+        uploads.append(request)
+        return httpx.Response(200, json={"text": "ok"})
+
+    monkeypatch.setattr(stt, "OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(
+        stt, "FILE_SESSION", httpx.AsyncClient(transport=httpx.MockTransport(file_handler))
+    )
+    monkeypatch.setattr(
+        stt, "OPENAI_SESSION", httpx.AsyncClient(transport=httpx.MockTransport(stt_handler))
+    )
+
+    assert asyncio.run(stt.transcribe_url("https://files.test/voice.oga")) == "ok"
+    assert uploads[0].headers["Transfer-Encoding"] == "chunked"
+    assert _parse_form(uploads[0])["file"] == b"OggS" + b"\x00" * 100
+
+
+def test_streamed_upload_falls_back_to_buffered_retries(monkeypatch):
+    uploads = _sessions(monkeypatch, b"OggS", stt_status=[503, 503, 200])
+
+    assert asyncio.run(stt.transcribe_url("https://files.test/voice.oga")) == "hola"
+    # One streamed attempt, never replayed; then the buffered upload and its retry.
+    assert len(uploads) == 3
+    assert uploads[0].extensions["retry"] is False
+    assert all(_parse_form(upload)["file"] == b"OggS" for upload in uploads[1:])
+
+
+def test_streamed_upload_client_error_is_not_retried(monkeypatch):
+    uploads = _sessions(monkeypatch, b"OggS", stt_status=400)
+
+    assert asyncio.run(stt.transcribe_url("https://files.test/voice.oga")) == ""
+    assert len(uploads) == 1
+
+
+def test_transcript_cache_is_keyed_on_model(monkeypatch):
+    stt.TRANSCRIPT_CACHE.clear()
+    saved = stt.transcript_savings()
+    stt.store_transcript("AgADfile", "hola")
+
+    assert stt.cached_transcript("AgADfile", file_size=1000, duration=4) == "hola"
+    monkeypatch.setattr(stt, "OPENAI_STT_MODEL", "other-model")
+    assert stt.cached_transcript("AgADfile") is None
+    assert stt.transcript_savings() == {
+        "bytes": saved["bytes"] + 1000,
+        "audio_seconds": saved["audio_seconds"] + 4,
+    }
+
+
+def test_stitch_drops_words_repeated_across_the_overlap():
+    texts = ["Hola, ¿cómo estás? Bien,", "bien, gracias. Y tú", "Y tú, ¿qué tal?"]
+    assert stt.stitch_transcripts(texts) == "Hola, ¿cómo estás? Bien, gracias. Y tú ¿qué tal?"
+    assert stt.stitch_transcripts(["uno dos", "tres"]) == "uno dos tres"
+
+
+def _segment_sessions(monkeypatch, reply, segments=(b"s1", b"s2", b"s3")):
+    uploads = []
+
+    def handler(request):
+        audio = _parse_form(request)["file"]
+        uploads.append(audio)
+        return reply(audio)
+
+    monkeypatch.setattr(stt, "OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(stt, "STT_SEGMENT_RETRY_DELAY", 0)
+    monkeypatch.setattr(stt, "split_ogg_opus", lambda audio, *args, **kwargs: list(segments))
+    monkeypatch.setattr(
+        stt, "OPENAI_SESSION", httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    )
+    return uploads
+
+
+def test_transcribe_segmented_stitches_segments_in_order(monkeypatch):
+    words = {b"s1": "one two", b"s2": "two three", b"s3": "four"}
+    uploads = _segment_sessions(
+        monkeypatch, lambda audio: httpx.Response(200, json={"text": words[audio]})
+    )
+
+    assert asyncio.run(stt.transcribe_segmented(b"long audio")) == "one two three four"
+    assert sorted(uploads) == [b"s1", b"s2", b"s3"]
+
+
+def test_transcribe_segmented_retries_only_failed_segments(monkeypatch):
+    failures = {b"s2": 2}
+
+    def reply(audio):
+        if failures.get(audio):
+            failures[audio] -= 1
+            return httpx.Response(400, json={"error": "bad segment"})
+        return httpx.Response(200, json={"text": audio.decode()})
+
+    uploads = _segment_sessions(monkeypatch, reply)
+
+    assert asyncio.run(stt.transcribe_segmented(b"long audio")) == "s1 s2 s3"
+    assert sorted(uploads) == [b"s1", b"s2", b"s2", b"s2", b"s3"]
+
+
+def test_transcribe_segmented_gives_up_without_uploading_the_whole_file(monkeypatch):
+    def reply(audio):
+        if audio == b"s2":
+            return httpx.Response(400, json={"error": "bad segment"})
+        return httpx.Response(200, json={"text": audio.decode()})
+
+    uploads = _segment_sessions(monkeypatch, reply)
+
+    assert asyncio.run(stt.transcribe_segmented(b"long audio")) == ""
+    assert b"long audio" not in uploads
+
+
+def test_many_segments_wait_instead_of_overloading_the_limiter(monkeypatch):
+    segments = [f"s{index}".encode() for index in range(24)]
+    _segment_sessions(
+        monkeypatch, lambda audio: httpx.Response(200, json={"text": audio.decode()}), segments
+    )
+    running = 0
+    peak = 0
+    original = stt._transcribe_request
+
+    async def tracked(files, data):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        try:
+            return await original(files, data)
+        finally:
+            running -= 1
+
+    monkeypatch.setattr(stt, "_transcribe_request", tracked)
+    # No queue at all: any segment beyond the per-note fan-out would be rejected.
+    monkeypatch.setattr(stt.STT_LIMITER, "max_concurrent", stt.STT_SEGMENT_CONCURRENCY)
+    monkeypatch.setattr(stt.STT_LIMITER, "max_queue", 0)
+
+    text = asyncio.run(stt.transcribe_segmented(b"long audio"))
+
+    assert text == " ".join(segment.decode() for segment in segments)
+    assert peak == stt.STT_SEGMENT_CONCURRENCY
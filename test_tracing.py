@@ -0,0 +1,117 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import tracing
+from http_session import RetryTransport
+from tracing import Span, TimingMiddleware, Trace, otlp_payload, server_timing, span
+
+
+def _in_trace(coro_factory):
+    async def run():
+        trace = Trace()
+        token = tracing._TRACE.set(trace)
+        try:
+            await coro_factory()
+        finally:
+            tracing._TRACE.reset(token)
+        return trace
+
+    return asyncio.run(run())
+
+
+def test_span_is_a_noop_outside_a_trace():
+    with span("router") as recorded:
+        assert recorded is None
+
+
+def test_nested_spans_record_their_parent():
+    async def work():
+        with span("outer") as outer:
+            with span("inner", target="ru"):
+                pass
+        assert outer.end_ns >= outer.start_ns
+
+    trace = _in_trace(work)
+    inner, outer = trace.spans
+    assert inner.parent_id == outer.span_id
+    assert outer.parent_id is None
+    assert inner.attributes == {"target": "ru"}
+
+
+def test_server_timing_sums_repeated_spans():
+    root = Span("POST /api/translate", None, {})
+    spans = []
+    for name, start, end in (("deepl", 0, 2_000_000), ("deepl", 0, 3_000_000), ("auth", 0, 500_000)):
+        recorded = Span(name, root.span_id, {})
+        recorded.start_ns, recorded.end_ns = start, end
+        spans.append(recorded)
+    root.start_ns, root.end_ns = 0, 10_000_000
+    assert server_timing(spans + [root]) == 'deepl;dur=5.0;desc="2 calls", auth;dur=0.5, total;dur=10.0'
+
+
+def test_retry_attempts_are_separate_spans():
+    replies = iter([httpx.Response(503, headers={"Retry-After": "0"}), httpx.Response(200)])
+    transport = RetryTransport(httpx.MockTransport(lambda request: next(replies)))
+
+    async def work():
+        async with httpx.AsyncClient(transport=transport) as client:
+            response = await client.get("https://api.example.com/", extensions={"span_name": "openai"})
+        assert response.status_code == 200
+
+    trace = _in_trace(work)
+    assert [recorded.name for recorded in trace.spans] == ["openai.attempt", "openai.attempt"]
+    assert [recorded.attributes["http.status_code"] for recorded in trace.spans] == [503, 200]
+    assert [recorded.attributes["attempt"] for recorded in trace.spans] == [0, 1]
+
+
+def test_middleware_adds_server_timing_and_queues_export(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_EXPORT_URL", "http://collector.local/v1/traces")
+    tracing._EXPORT_QUEUE.clear()
+    app = FastAPI()
+    app.add_middleware(TimingMiddleware)
+
+    @app.get("/api/ping")
+    async def ping():
+        with span("router"):
+            pass
+        return {"ok": True}
+
+    @app.get("/health")
+    async def health():
+        return {"ok": True}
+
+    client = TestClient(app)
+    timing = client.get("/api/ping").headers["server-timing"]
+    assert timing.startswith("router;dur=")
+    assert ", total;dur=" in timing
+    assert "server-timing" not in client.get("/health").headers
+    assert len(tracing._EXPORT_QUEUE) == 1
+
+
+def test_export_posts_otlp_json(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_EXPORT_URL", "http://collector.local/v1/traces")
+    tracing._EXPORT_QUEUE.clear()
+    trace = Trace()
+    root = Span("POST /api/translate", None, {"http.status_code": 200})
+    trace.spans = [Span("openai", root.span_id, {"target": "ru"}), root]
+    tracing._EXPORT_QUEUE.append(trace)
+    received = []
+
+    def collector(request):
+        received.append(request)
+        return httpx.Response(200)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(collector)) as client:
+            return await tracing.export_pending(client)
+
+    assert asyncio.run(run()) == 1
+    assert str(received[0].url) == "http://collector.local/v1/traces"
+    spans = otlp_payload([trace])["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert spans[0]["parentSpanId"] == root.span_id
+    assert spans[0]["attributes"] == [{"key": "target", "value": {"stringValue": "ru"}}]
+    assert spans[1]["attributes"] == [{"key": "http.status_code", "value": {"intValue": "200"}}]
+    assert "parentSpanId" not in spans[1]
@@ -1,8 +1,32 @@
+import asyncio
+import json
+import random
+import re
+from urllib.parse import parse_qs
+
+import httpx
 import pytest
+
+import translate_core as translate_core_module
+from cache import TTLCache
+from circuit_breaker import CircuitBreaker
+from limiter import ConcurrencyLimiter
+from singleflight import SingleFlight
+from http_session import RetryTransport
 from translate_core import (
+    ROUTER_MATCHER,
+    STRONG_TERMS_STT,
+    WEAK_TERMS_STT,
+    TermMatcher,
+    deepl_translate_structured,
     is_structured_text,
     should_use_deepl,
+    split_into_chunks,
+    translate_core,
+    translate_core_stream,
+    translate_many,
     _letters_ratio,
+    _pack_deepl_batches,
     _normalize_router_text,
 )
 
@@ -80,3 +104,634 @@ def test_should_use_deepl_empty():
     # Empty text should not route
     text = ""
     assert should_use_deepl(text, "text") is False
+
+
+def _reference_pattern(term):
+    # Per-term regex the router used before TermMatcher; kept as the oracle.
+    words = term.split()
+    has_wildcard = words[-1].endswith("*")
+    if has_wildcard:
+        words[-1] = words[-1][:-1]
+    pattern = r"\b" + r"\s+".join(re.escape(word) for word in words)
+    if has_wildcard:
+        pattern += r"\w*"
+    return re.compile(pattern + r"\b", re.IGNORECASE)
+
+
+_REFERENCE_STRONG = [(term, _reference_pattern(term)) for term in STRONG_TERMS_STT]
+_REFERENCE_WEAK = [(term, _reference_pattern(term)) for term in WEAK_TERMS_STT]
+
+
+def _reference_hits(text):
+    normalized = _normalize_router_text(text)
+    return (
+        {term for term, pattern in _REFERENCE_STRONG if pattern.search(normalized)},
+        {term for term, pattern in _REFERENCE_WEAK if pattern.search(normalized)},
+    )
+
+
+def test_term_matcher_matches_reference_regexes():
+    rng = random.Random(1234)
+    vocabulary = [
+        word.rstrip("*") + suffix
+        for term in STRONG_TERMS_STT + WEAK_TERMS_STT
+        for word in term.split()
+        for suffix in ("", "s", "ing", "_x", "1")
+    ]
+    vocabulary += ["the", "blow", "job", "hand", "anals", "по", "мне", "sexy", "ох", "porn", "x"]
+    separators = [" ", "  ", "\n", ", ", "!", "-", "ё", "\t", "...", "'"]
+    samples = [
+        "Blow  job and HANDJOB",
+        "blow\njob",
+        "pornography, porno; PORN!",
+        "ёлки секс-чат и сексуальный",
+        "cummings cum-cum",
+        "peito seios goz gozado",
+    ]
+    for _ in range(500):
+        words = rng.choices(vocabulary, k=rng.randint(1, 30))
+        samples.append("".join(word + rng.choice(separators) for word in words))
+    for sample in samples:
+        hits = ROUTER_MATCHER.match(_normalize_router_text(sample))
+        assert (hits["strong"], hits["weak"]) == _reference_hits(sample), sample
+
+
+def test_term_matcher_supports_multiword_wildcards():
+    matcher = TermMatcher({"strong": ["hand job*", "xx"]})
+    assert matcher.match("a hand jobs b")["strong"] == {"hand job*"}
+    assert matcher.match("handjob hand")["strong"] == set()
+
+
+def _mock_session(handler):
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def _openai_reply(content, finish_reason="stop"):
+    return httpx.Response(
+        200,
+        json={"choices": [{"message": {"content": content}, "finish_reason": finish_reason}]},
+    )
+
+
+def _deepl_reply(request, translate):
+    texts = parse_qs(request.content.decode())["text"]
+    return httpx.Response(200, json={"translations": [{"text": translate(t)} for t in texts]})
+
+
+@pytest.fixture
+def providers(monkeypatch):
+    monkeypatch.setattr(translate_core_module, "OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(translate_core_module, "DEEPL_API_KEY", "deepl-test")
+    translate_core_module.TRANSLATION_CACHE.clear()
+    monkeypatch.setattr(translate_core_module, "OPENAI_BREAKER", CircuitBreaker("test-openai"))
+    monkeypatch.setattr(translate_core_module, "DEEPL_BREAKER", CircuitBreaker("test-deepl"))
+    calls = {"openai": [], "deepl": []}
+    handlers = {
+        "openai": lambda request: _openai_reply("Привет"),
+        "deepl": lambda request: _deepl_reply(request, lambda text: "DeepL"),
+    }
+
+    def _handler(name):
+        def handle(request):
+            calls[name].append(request)
+            return handlers[name](request)
+        return handle
+
+    monkeypatch.setattr(translate_core_module, "OPENAI_SESSION", _mock_session(_handler("openai")))
+    monkeypatch.setattr(translate_core_module, "DEEPL_SESSION", _mock_session(_handler("deepl")))
+    return handlers, calls
+
+
+def test_translate_core_openai_success(providers):
+    handlers, calls = providers
+    result = asyncio.run(translate_core("Hello", "ru"))
+    assert result["ok"] is True
+    assert result["text"] == "Привет"
+    assert result["provider_used"] == "openai"
+    assert result["fallback_reason"] is None
+    assert result["openai_finish_reason"] == "stop"
+    assert len(calls["openai"]) == 1
+    assert calls["deepl"] == []
+
+
+def test_translate_core_refusal_falls_back_to_deepl(providers):
+    handlers, calls = providers
+    handlers["openai"] = lambda request: _openai_reply("[REFUSED]")
+    result = asyncio.run(translate_core("Hello", "en"))
+    assert result["ok"] is True
+    assert result["text"] == "DeepL"
+    assert result["provider_used"] == "deepl"
+    assert result["fallback_reason"] == "refusal"
+    assert calls["deepl"][0].url.host == "api-free.deepl.com"
+
+
+def test_translate_core_records_metrics(providers):
+    handlers, calls = providers
+    handlers["openai"] = lambda request: _openai_reply("[REFUSED]")
+    translations = translate_core_module.TRANSLATIONS.value("deepl", "refusal")
+    characters = translate_core_module.DEEPL_CHARACTERS.value()
+    refusals = translate_core_module.PROVIDER_RESPONSES.value("openai", 200)
+    asyncio.run(translate_core("Hello metrics", "en"))
+    assert translate_core_module.TRANSLATIONS.value("deepl", "refusal") == translations + 1
+    assert translate_core_module.DEEPL_CHARACTERS.value() == characters + len("Hello metrics")
+    assert translate_core_module.PROVIDER_RESPONSES.value("openai", 200) == refusals + 1
+
+
+def test_translate_core_falls_back_when_openai_limiter_is_full(providers, monkeypatch):
+    handlers, calls = providers
+    full = ConcurrencyLimiter("test-openai-full", max_concurrent=0, max_queue=0)
+    monkeypatch.setattr(translate_core_module, "OPENAI_LIMITER", full)
+    result = asyncio.run(translate_core("Hello", "en"))
+    assert result["provider_used"] == "deepl"
+    assert result["fallback_reason"] == "overloaded"
+    assert calls["openai"] == []
+    assert full.stats()["rejected"] == 1
+
+
+def test_translate_core_openai_error_and_deepl_error(providers):
+    handlers, calls = providers
+    handlers["openai"] = lambda request: httpx.Response(400, text="bad request")
+    handlers["deepl"] = lambda request: httpx.Response(456, text="quota")
+    result = asyncio.run(translate_core("Hello", "en"))
+    assert result["ok"] is False
+    assert result["status_code"] == 502
+    assert result["status"] == 456
+    assert result["provider_used"] == "deepl"
+    assert result["fallback_reason"] == "openai_error"
+
+
+def test_translate_core_transport_error(providers):
+    handlers, calls = providers
+
+    def fail(request):
+        raise httpx.ConnectError("boom", request=request)
+
+    handlers["openai"] = fail
+    result = asyncio.run(translate_core("Hello", "en"))
+    assert result["provider_used"] == "deepl"
+    assert result["fallback_reason"] == "openai_error"
+
+
+def test_translate_core_structured_batches_deepl_lines(providers):
+    handlers, calls = providers
+    handlers["openai"] = lambda request: _openai_reply("x", finish_reason="content_filter")
+    handlers["deepl"] = lambda request: _deepl_reply(request, str.upper)
+    result = asyncio.run(translate_core("one\ntwo\n\nthree\n  \nfour", "en"))
+    assert result["fallback_reason"] == "content_filter"
+    assert result["text"] == "ONE\nTWO\n\nTHREE\n  \nFOUR"
+    assert len(calls["deepl"]) == 1
+
+
+def test_deepl_translate_structured_splits_at_request_limits(providers, monkeypatch):
+    handlers, calls = providers
+    handlers["deepl"] = lambda request: _deepl_reply(request, str.upper)
+    monkeypatch.setattr(translate_core_module, "DEEPL_MAX_TEXTS_PER_REQUEST", 4)
+    lines = [f"line {i}" if i % 3 else "" for i in range(30)]
+    result = asyncio.run(deepl_translate_structured("\n".join(lines), "EN"))
+    assert result["text"] == "\n".join(line.upper() for line in lines)
+    assert len(calls["deepl"]) == 5
+
+
+def test_deepl_translate_structured_propagates_batch_error(providers):
+    handlers, calls = providers
+    handlers["deepl"] = lambda request: httpx.Response(429, text="slow down")
+    result = asyncio.run(deepl_translate_structured("a\nb\nc", "EN"))
+    assert result["ok"] is False
+    assert result["status"] == 429
+
+
+def test_pack_deepl_batches_respects_byte_limit(monkeypatch):
+    monkeypatch.setattr(translate_core_module, "DEEPL_MAX_REQUEST_BYTES", 40)
+    assert _pack_deepl_batches(["a" * 10, "b" * 10, "c" * 10]) == [[0, 1], [2]]
+
+
+def test_translate_core_serves_repeats_from_cache(providers):
+    handlers, calls = providers
+    first = asyncio.run(translate_core("Hello", "ru"))
+    second = asyncio.run(translate_core("  Hello ", "ru"))
+    assert first["cached"] is False
+    assert second["cached"] is True
+    assert second["text"] == first["text"]
+    assert len(calls["openai"]) == 1
+
+
+def test_translate_core_cache_invalidated_by_prompt_change(providers, monkeypatch):
+    handlers, calls = providers
+    asyncio.run(translate_core("Hello", "ru"))
+    monkeypatch.setitem(translate_core_module.TARGET_PROMPTS, "ru", "Target language: Russian (edited).")
+    result = asyncio.run(translate_core("Hello", "ru"))
+    assert result["cached"] is False
+    assert len(calls["openai"]) == 2
+
+
+def test_translate_core_does_not_cache_errors(providers):
+    handlers, calls = providers
+    handlers["openai"] = lambda request: httpx.Response(500)
+    handlers["deepl"] = lambda request: httpx.Response(500)
+    asyncio.run(translate_core("Hello", "ru"))
+    asyncio.run(translate_core("Hello", "ru"))
+    assert len(translate_core_module.TRANSLATION_CACHE) == 0
+    assert len(calls["openai"]) == 2
+
+
+def test_translate_core_coalesces_identical_concurrent_requests(providers, monkeypatch):
+    handlers, calls = providers
+    handlers["openai"] = _slow(0.02, lambda request: _openai_reply("Привет"))
+    monkeypatch.setattr(translate_core_module, "TRANSLATION_CACHE", TTLCache("test-off", 0, 0))
+    monkeypatch.setattr(translate_core_module, "TRANSLATION_FLIGHTS", SingleFlight("test-flights"))
+
+    async def run():
+        return await asyncio.gather(*(translate_core("Hello", "ru") for _ in range(4)))
+
+    results = asyncio.run(run())
+    assert len(calls["openai"]) == 1
+    assert [result["text"] for result in results] == ["Привет"] * 4
+    results[0].pop("status_code")
+    assert results[1]["status_code"] == 200
+    assert translate_core_module.TRANSLATION_FLIGHTS.coalesced == 3
+
+
+def test_split_into_chunks_prefers_paragraphs_and_round_trips():
+    paragraph = "Sentence one. Sentence two! Sentence three?"
+    text = "\n\n".join([paragraph] * 6) + "\n"
+    chunks = split_into_chunks(text, 100)
+    assert "".join(chunks) == text
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert all(chunk.endswith("\n\n") for chunk in chunks[:-1])
+
+
+def test_split_into_chunks_falls_back_to_sentences_and_hard_cuts():
+    text = "Short one. " * 30 + "x" * 250
+    chunks = split_into_chunks(text, 100)
+    assert "".join(chunks) == text
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert chunks[0].endswith(". ")
+
+
+def test_translate_core_chunks_long_input_with_per_chunk_fallback(providers, monkeypatch):
+    handlers, calls = providers
+    monkeypatch.setattr(translate_core_module, "CHUNK_THRESHOLD_CHARS", 100)
+    monkeypatch.setattr(translate_core_module, "CHUNK_MAX_CHARS", 60)
+
+    def openai_handler(request):
+        content = json.loads(request.content)["messages"][1]["content"]
+        if content.startswith("bad"):
+            return httpx.Response(500)
+        return _openai_reply(content.upper())
+
+    handlers["openai"] = openai_handler
+    handlers["deepl"] = lambda request: _deepl_reply(request, lambda text: "deepl:" + text)
+    paragraphs = ["first paragraph text here", "bad paragraph text here", "third paragraph text here"]
+    text = "  " + "\n\n\n".join(paragraphs * 2) + "\n"
+    result = asyncio.run(translate_core(text, "en"))
+    assert result["ok"] is True
+    assert result["provider_used"] == "mixed"
+    assert result["fallback_reason"] == "openai_error"
+    assert result["text"].count("\n\n\n") == text.count("\n\n\n")
+    assert result["text"].startswith("  FIRST PARAGRAPH")
+    assert result["text"].endswith("\n")
+    assert "deepl:bad paragraph text here" in result["text"]
+    assert len(result["chunks"]) > 1
+    assert len(calls["openai"]) == len(result["chunks"])
+
+
+def test_translate_many_runs_targets_concurrently(providers, monkeypatch):
+    handlers, calls = providers
+    in_flight = []
+    peak = []
+
+    async def fake_translate(text, target, source="text"):
+        in_flight.append(target)
+        peak.append(len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.remove(target)
+        return {"ok": True, "text": f"{text}-{target}", "fallback_reason": None}
+
+    monkeypatch.setattr(translate_core_module, "translate_core", fake_translate)
+    results = asyncio.run(translate_many("hi", ["en", "ru", "en", "es-es"]))
+    assert list(results) == ["en", "ru", "es-es"]
+    assert results["ru"]["text"] == "hi-ru"
+    assert max(peak) == 3
+
+
+def _openai_stream_reply(tokens, finish_reason="stop"):
+    lines = [
+        "data: " + json.dumps({"choices": [{"delta": {"content": token}, "finish_reason": None}]})
+        for token in tokens
+    ]
+    lines.append("data: " + json.dumps({"choices": [{"delta": {}, "finish_reason": finish_reason}]}))
+    lines.append("data: [DONE]")
+    return httpx.Response(200, text="\n\n".join(lines) + "\n\n")
+
+
+async def _collect(stream):
+    return [event async for event in stream]
+
+
+def test_translate_core_stream_emits_deltas_and_result(providers):
+    handlers, calls = providers
+    handlers["openai"] = lambda request: _openai_stream_reply(["¡Ho", "la", " amigo!"])
+    events = asyncio.run(_collect(translate_core_stream("Hello friend!", "es-es")))
+    deltas = [event["text"] for event in events if event["event"] == "delta"]
+    assert "".join(deltas) == "Hola amigo!"
+    assert events[-1]["event"] == "done"
+    assert events[-1]["result"]["text"] == "Hola amigo!"
+    assert events[-1]["result"]["provider_used"] == "openai"
+    assert json.loads(calls["openai"][0].content)["stream"] is True
+
+
+def test_translate_core_stream_holds_back_refusal(providers):
+    handlers, calls = providers
+    handlers["openai"] = lambda request: _openai_stream_reply(["[REF", "USED", "]"])
+    events = asyncio.run(_collect(translate_core_stream("Hello", "en")))
+    assert [event["event"] for event in events] == ["done"]
+    assert events[-1]["result"]["provider_used"] == "deepl"
+    assert events[-1]["result"]["fallback_reason"] == "refusal"
+
+
+def test_translate_core_stream_resets_partial_output_on_fallback(providers):
+    handlers, calls = providers
+    handlers["openai"] = lambda request: _openai_stream_reply(["Short"])
+    text = "This is a long enough message that a five character answer must be rejected " * 2
+    events = asyncio.run(_collect(translate_core_stream(text, "en")))
+    assert [event["event"] for event in events] == ["delta", "reset", "done"]
+    assert events[1]["reason"] == "too_short"
+    assert events[-1]["result"]["text"] == "DeepL"
+    assert events[-1]["result"]["fallback_reason"] == "too_short"
+
+
+def test_long_stream_is_not_a_slow_call(providers, monkeypatch):
+    handlers, calls = providers
+    breaker = CircuitBreaker("test-openai-stream", min_calls=1, window_size=1, slow_call_seconds=0.05)
+    monkeypatch.setattr(translate_core_module, "OPENAI_BREAKER", breaker)
+    handlers["openai"] = lambda request: _openai_stream_reply(["Hola", " amigo", " mío"])
+
+    async def consume_slowly():
+        async for _ in translate_core_module._openai_translate_stream("Hello my friend", "es-es"):
+            await asyncio.sleep(0.03)
+
+    asyncio.run(consume_slowly())
+    assert breaker.state == "closed"
+
+
+def test_open_openai_breaker_goes_straight_to_deepl(providers, monkeypatch):
+    handlers, calls = providers
+    breaker = CircuitBreaker("test-openai-open", min_calls=2, window_size=2, open_seconds=60)
+    monkeypatch.setattr(translate_core_module, "OPENAI_BREAKER", breaker)
+    handlers["openai"] = lambda request: httpx.Response(500)
+    asyncio.run(translate_core("Hello", "ru"))
+    asyncio.run(translate_core("Hello", "ru"))
+    assert breaker.state == "open"
+    result = asyncio.run(translate_core("Hello", "ru"))
+    assert result["provider_used"] == "deepl"
+    assert result["fallback_reason"] == "circuit_open"
+    assert len(calls["openai"]) == 2
+
+
+def test_open_deepl_breaker_fails_fast(providers, monkeypatch):
+    handlers, calls = providers
+    breaker = CircuitBreaker("test-deepl-open", min_calls=1, window_size=1, open_seconds=60)
+    monkeypatch.setattr(translate_core_module, "DEEPL_BREAKER", breaker)
+    handlers["deepl"] = lambda request: httpx.Response(503)
+    assert asyncio.run(deepl_translate_structured("a", "EN"))["status"] == 503
+    result = asyncio.run(deepl_translate_structured("a", "EN"))
+    assert result["details"] == "circuit_open"
+    assert len(calls["deepl"]) == 1
+
+
+@pytest.fixture
+def hedging(providers, monkeypatch):
+    monkeypatch.setattr(translate_core_module, "HEDGE_ENABLED", True)
+    monkeypatch.setattr(translate_core_module, "HEDGE_DELAY_SECONDS", 0.02)
+    for key in translate_core_module.HEDGE_STATS:
+        monkeypatch.setitem(translate_core_module.HEDGE_STATS, key, 0)
+    return providers
+
+
+def _slow(seconds, response):
+    async def handle(request):
+        await asyncio.sleep(seconds)
+        return response(request)
+    return handle
+
+
+def test_hedge_deepl_wins_when_openai_is_slow(hedging):
+    handlers, calls = hedging
+    handlers["openai"] = _slow(1, lambda request: _openai_reply("Привет"))
+    translations = translate_core_module.TRANSLATIONS
+    openai_before = translations.value("openai", None)
+    deepl_before = translations.value("deepl", "hedged")
+    result = asyncio.run(translate_core("Hello", "ru"))
+    assert result["provider_used"] == "deepl"
+    assert result["fallback_reason"] == "hedged"
+    assert translations.value("deepl", "hedged") == deepl_before + 1
+    assert translations.value("openai", None) == openai_before
+    assert translate_core_module.HEDGE_STATS["won_by_deepl"] == 1
+    assert translate_core_module.HEDGE_STATS["deepl_chars"] == len("Hello")
+
+
+def test_hedge_openai_wins_and_deepl_is_cancelled(hedging):
+    handlers, calls = hedging
+    handlers["openai"] = _slow(0.05, lambda request: _openai_reply("Привет"))
+    handlers["deepl"] = _slow(1, lambda request: _deepl_reply(request, str.upper))
+    translations = translate_core_module.TRANSLATIONS
+    openai_before = translations.value("openai", None)
+    deepl_before = translations.value("deepl", "hedged")
+    result = asyncio.run(translate_core("Hello", "ru"))
+    assert result["provider_used"] == "openai"
+    assert translations.value("openai", None) == openai_before + 1
+    assert translations.value("deepl", "hedged") == deepl_before
+    assert result["fallback_reason"] is None
+    assert translate_core_module.HEDGE_STATS["fired"] == 1
+    assert translate_core_module.HEDGE_STATS["won_by_openai"] == 1
+
+
+def test_hedge_reports_openai_reason_when_openai_fails_first(hedging):
+    handlers, calls = hedging
+    handlers["openai"] = _slow(0.05, lambda request: _openai_reply("[REFUSED]"))
+    handlers["deepl"] = _slow(0.3, lambda request: _deepl_reply(request, str.upper))
+    result = asyncio.run(translate_core("Hello", "ru"))
+    assert result["provider_used"] == "deepl"
+    assert result["fallback_reason"] == "refusal"
+    assert translate_core_module.TRANSLATION_CACHE.get(
+        translate_core_module._translation_cache_key("Hello", "ru", "text")
+    ) is not None
+
+
+def test_hedge_records_abandoned_openai_call_as_lower_bound(hedging, monkeypatch):
+    handlers, calls = hedging
+    window = translate_core_module.LatencyWindow(10)
+    monkeypatch.setattr(translate_core_module, "OPENAI_LATENCY", window)
+    handlers["openai"] = _slow(1, lambda request: _openai_reply("Привет"))
+    asyncio.run(translate_core("Hello", "ru"))
+    assert len(window) == 1
+    assert 0.02 <= window.percentile(0.5) < 1
+
+
+def test_fast_openai_failures_are_not_latency_samples(providers, monkeypatch):
+    window = translate_core_module.LatencyWindow(10)
+    monkeypatch.setattr(translate_core_module, "OPENAI_LATENCY", window)
+    monkeypatch.setattr(
+        translate_core_module, "OPENAI_LIMITER", ConcurrencyLimiter("test-openai-none", 0, 0)
+    )
+    result = asyncio.run(translate_core("Hello", "ru"))
+    assert result["fallback_reason"] == "overloaded"
+    assert len(window) == 0
+
+
+def test_hedge_not_fired_for_fast_openai(hedging):
+    handlers, calls = hedging
+    result = asyncio.run(translate_core("Hello", "ru"))
+    assert result["provider_used"] == "openai"
+    assert translate_core_module.HEDGE_STATS["fired"] == 0
+    assert calls["deepl"] == []
+
+
+def test_hedge_delay_learns_from_latency(monkeypatch):
+    window = translate_core_module.LatencyWindow(100)
+    for i in range(100):
+        window.record(i / 10)
+    monkeypatch.setattr(translate_core_module, "OPENAI_LATENCY", window)
+    monkeypatch.setattr(translate_core_module, "HEDGE_DELAY_SECONDS", 0)
+    monkeypatch.setattr(translate_core_module, "HEDGE_PERCENTILE", 0.9)
+    assert translate_core_module.hedge_delay() == 9.0
+
+
+def test_retry_transport_retries_retryable_status():
+    attempts = []
+
+    def handle(request):
+        attempts.append(request)
+        if len(attempts) < 3:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"ok": True})
+
+    async def run():
+        transport = RetryTransport(httpx.MockTransport(handle), backoff_factor=0)
+        async with httpx.AsyncClient(transport=transport) as client:
+            return await client.post("https://example.test/", json={})
+
+    response = asyncio.run(run())
+    assert response.status_code == 200
+    assert len(attempts) == 3
+
+
+def _batch_reply(translate):
+    def handle(request):
+        body = json.loads(request.content)
+        texts = json.loads(body["messages"][-1]["content"])["texts"]
+        return _openai_reply(json.dumps({"translations": [translate(text) for text in texts]}))
+    return handle
+
+
+def test_translate_batch_packs_short_texts_per_target(providers):
+    handlers, calls = providers
+    handlers["openai"] = _batch_reply(lambda text: text.upper())
+    items = [("one", "ru"), ("two", "ru"), ("three", "en"), ("one", "ru")]
+
+    results = asyncio.run(translate_core_module.translate_batch(items))
+
+    assert [result["text"] for result in results] == ["ONE", "TWO", "THREE", "ONE"]
+    assert all(result["provider_used"] == "openai" for result in results)
+    assert len(calls["openai"]) == 2
+    body = json.loads(calls["openai"][0].content)
+    assert body["response_format"] == {"type": "json_object"}
+    assert json.loads(body["messages"][-1]["content"]) == {"texts": ["one", "two"]}
+    assert calls["deepl"] == []
+    # Packed results land in the cache shared with single requests.
+    assert asyncio.run(translate_core("two", "ru"))["cached"] is True
+
+
+def test_translate_batch_falls_back_per_item(providers):
+    handlers, calls = providers
+    handlers["openai"] = _batch_reply(lambda text: "[REFUSED]" if text == "bad" else "ok " + text)
+
+    results = asyncio.run(
+        translate_core_module.translate_batch([("fine", "en"), ("bad", "en"), ("also bad", "en")])
+    )
+
+    assert results[0]["provider_used"] == "openai"
+    assert results[1]["provider_used"] == "deepl"
+    assert results[1]["fallback_reason"] == "refusal"
+    assert results[2]["text"] == "ok also bad"
+    assert parse_qs(calls["deepl"][0].content.decode())["text"] == ["bad"]
+
+
+def test_translate_batch_refused_as_a_whole_retries_items_alone(providers):
+    handlers, calls = providers
+
+    def handle(request):
+        content = json.loads(request.content)["messages"][-1]["content"]
+        if content.startswith('{"texts"') or content == "bad":
+            return _openai_reply("[REFUSED]")
+        return _openai_reply("ok " + content)
+
+    handlers["openai"] = handle
+
+    results = asyncio.run(
+        translate_core_module.translate_batch([("good morning", "en"), ("bad", "en")])
+    )
+
+    assert results[0]["provider_used"] == "openai"
+    assert results[0]["text"] == "ok good morning"
+    assert results[1]["provider_used"] == "deepl"
+    assert results[1]["fallback_reason"] == "refusal"
+    cached = asyncio.run(translate_core("good morning", "en"))
+    assert cached["provider_used"] == "openai"
+    assert cached["cached"] is True
+
+
+def test_translate_batch_mismatched_reply_goes_to_deepl_in_one_call(providers):
+    handlers, calls = providers
+    handlers["openai"] = lambda request: _openai_reply(json.dumps({"translations": ["only one"]}))
+
+    results = asyncio.run(translate_core_module.translate_batch([("a", "ru"), ("b", "ru")]))
+
+    assert [result["fallback_reason"] for result in results] == ["batch_mismatch"] * 2
+    assert [result["text"] for result in results] == ["DeepL", "DeepL"]
+    assert len(calls["deepl"]) == 1
+    assert parse_qs(calls["deepl"][0].content.decode())["text"] == ["a", "b"]
+
+
+def test_translate_batch_caps_its_concurrency(providers, monkeypatch):
+    handlers, calls = providers
+    monkeypatch.setattr(translate_core_module, "BATCH_MAX_CONCURRENCY", 3)
+    running = 0
+    peak = 0
+
+    async def handle(request):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return _openai_reply(json.loads(request.content)["messages"][-1]["content"])
+
+    handlers["openai"] = handle
+    items = [(f"line {index}\nbreak", "ru") for index in range(20)]
+
+    results = asyncio.run(translate_core_module.translate_batch(items))
+
+    assert all(result["provider_used"] == "openai" for result in results)
+    assert peak == 3
+
+
+def test_translate_batch_sends_long_and_multiline_texts_alone(providers, monkeypatch):
+    handlers, calls = providers
+    monkeypatch.setattr(translate_core_module, "BATCH_PACK_MAX_ITEMS", 2)
+    packed = []
+
+    def handle(request):
+        content = json.loads(request.content)["messages"][-1]["content"]
+        if content.startswith('{"texts"'):
+            packed.append(json.loads(content)["texts"])
+            return _batch_reply(lambda text: "p")(request)
+        return _openai_reply(content)
+
+    handlers["openai"] = handle
+    items = [("a", "ru"), ("b", "ru"), ("c", "ru"), ("line\nbreak", "ru"), ("x" * 600, "ru")]
+
+    results = asyncio.run(translate_core_module.translate_batch(items))
+
+    assert [result["text"] for result in results] == ["p", "p", "p", "line\nbreak", "x" * 600]
+    assert sorted(packed) == [["a", "b"], ["c"]]
@@ -0,0 +1,151 @@
+import asyncio
+
+from update_dispatcher import DUPLICATE, QUEUED, REJECTED, UpdateDispatcher, chat_key
+
+
+def _update(update_id: int, chat_id: int) -> dict:
+    return {"update_id": update_id, "message": {"chat": {"id": chat_id}, "text": str(update_id)}}
+
+
+def test_chat_key_reads_chat_or_sender():
+    assert chat_key(_update(1, 7)) == ("chat", 7)
+    callback = {"update_id": 2, "callback_query": {"from": {"id": 9}, "message": {"chat": {"id": 7}}}}
+    assert chat_key(callback) == ("chat", 7)
+    assert chat_key({"update_id": 3, "inline_query": {"from": {"id": 9}}}) == ("user", 9)
+    assert chat_key({"update_id": 4}) is None
+
+
+def test_updates_of_one_chat_run_in_order_while_chats_run_in_parallel():
+    async def scenario():
+        log = []
+        running = set()
+        overlapped = []
+
+        async def process(payload):
+            chat = payload["message"]["chat"]["id"]
+            assert chat not in running
+            running.add(chat)
+            if len(running) > 1:
+                overlapped.append(True)
+            # Earlier updates take longer, so a reordering would show up.
+            await asyncio.sleep(0.01 * (4 - payload["update_id"] % 4))
+            log.append(payload["update_id"])
+            running.discard(chat)
+
+        dispatcher = UpdateDispatcher(process, workers=4, max_queue=100, dedup_window=100)
+        dispatcher.start()
+        for update_id in range(8):
+            assert dispatcher.submit(_update(update_id, update_id // 4)) == QUEUED
+        assert await dispatcher.drain(5)
+        return log, overlapped
+
+    log, overlapped = asyncio.run(scenario())
+
+    assert [update_id for update_id in log if update_id < 4] == [0, 1, 2, 3]
+    assert [update_id for update_id in log if update_id >= 4] == [4, 5, 6, 7]
+    assert overlapped
+
+
+def test_redelivered_update_is_dropped_within_the_window():
+    async def scenario():
+        processed = []
+
+        async def process(payload):
+            processed.append(payload["update_id"])
+
+        dispatcher = UpdateDispatcher(process, workers=2, max_queue=100, dedup_window=2)
+        dispatcher.start()
+        outcomes = [dispatcher.submit(_update(update_id, 1)) for update_id in (1, 1, 2, 3, 1)]
+        await dispatcher.drain(5)
+        return outcomes, processed, dispatcher.stats()
+
+    outcomes, processed, stats = asyncio.run(scenario())
+
+    # update 1 has left the two-entry window by the time it comes back.
+    assert outcomes == [QUEUED, DUPLICATE, QUEUED, QUEUED, QUEUED]
+    assert processed == [1, 2, 3, 1]
+    assert stats["duplicates"] == 1
+
+
+def test_full_queue_rejects_without_remembering_the_update():
+    async def scenario():
+        release = asyncio.Event()
+
+        async def process(payload):
+            await release.wait()
+
+        dispatcher = UpdateDispatcher(process, workers=1, max_queue=2, dedup_window=100)
+        dispatcher.start()
+        outcomes = [dispatcher.submit(_update(update_id, update_id)) for update_id in (1, 2)]
+        await asyncio.sleep(0)
+        # The worker holds update 1, so one more fits before the queue is full.
+        outcomes.append(dispatcher.submit(_update(3, 3)))
+        outcomes.append(dispatcher.submit(_update(4, 4)))
+        release.set()
+        await asyncio.sleep(0.01)
+        outcomes.append(dispatcher.submit(_update(4, 4)))
+        await dispatcher.drain(5)
+        return outcomes, dispatcher.stats()
+
+    outcomes, stats = asyncio.run(scenario())
+
+    assert outcomes == [QUEUED, QUEUED, QUEUED, REJECTED, QUEUED]
+    assert stats["rejected"] == 1
+    assert stats["processed"] == 4
+
+
+def test_drain_finishes_queued_updates_and_refuses_new_ones():
+    async def scenario():
+        processed = []
+
+        async def process(payload):
+            await asyncio.sleep(0.01)
+            processed.append(payload["update_id"])
+
+        dispatcher = UpdateDispatcher(process, workers=1, max_queue=100, dedup_window=100)
+        dispatcher.start()
+        for update_id in range(3):
+            dispatcher.submit(_update(update_id, 1))
+        drained = await dispatcher.drain(5)
+        return drained, processed, dispatcher.submit(_update(9, 1))
+
+    drained, processed, late = asyncio.run(scenario())
+
+    assert drained
+    assert processed == [0, 1, 2]
+    assert late == REJECTED
+
+
+def test_drain_gives_up_at_the_deadline():
+    async def scenario():
+        async def process(payload):
+            await asyncio.sleep(10)
+
+        dispatcher = UpdateDispatcher(process, workers=1, max_queue=100, dedup_window=100)
+        dispatcher.start()
+        dispatcher.submit(_update(1, 1))
+        return await dispatcher.drain(0.05)
+
+    assert asyncio.run(scenario()) is False
+
+
+def test_failing_update_does_not_stop_the_chat():
+    async def scenario():
+        processed = []
+
+        async def process(payload):
+            if payload["update_id"] == 1:
+                raise RuntimeError("boom")
+            processed.append(payload["update_id"])
+
+        dispatcher = UpdateDispatcher(process, workers=1, max_queue=100, dedup_window=100)
+        dispatcher.start()
+        for update_id in (1, 2):
+            dispatcher.submit(_update(update_id, 1))
+        await dispatcher.drain(5)
+        return processed, dispatcher.stats()
+
+    processed, stats = asyncio.run(scenario())
+
+    assert processed == [2]
+    assert stats["failed"] == 1
@@ -0,0 +1,214 @@
+import asyncio
+import os
+import secrets
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+import httpx
+
+
+TRACE_EXPORT_URL = os.getenv("TRACE_EXPORT_URL", "")
+TRACE_EXPORT_INTERVAL_SECONDS = float(os.getenv("TRACE_EXPORT_INTERVAL_SECONDS", "5"))
+TRACE_EXPORT_MAX_PENDING = 1000
+TRACE_SERVICE_NAME = "translator-backend"
+TRACED_PATH_PREFIXES = ("/api/",)
+
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "end_ns", "attributes")
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: dict) -> None:
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = self.start_ns
+        self.attributes = attributes
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ms": round(self.start_ns / 1e6, 3),
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+        }
+
+
+class Trace:
+    """Spans recorded while handling one request."""
+
+    def __init__(self) -> None:
+        self.trace_id = secrets.token_hex(16)
+        self.spans: list[Span] = []
+
+
+_TRACE: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+_CURRENT_SPAN: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+_EXPORT_QUEUE: deque[Trace] = deque(maxlen=TRACE_EXPORT_MAX_PENDING)
+
+
+def current_trace() -> Optional[Trace]:
+    return _TRACE.get()
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Optional[Span]]:
+    """Time the enclosed block as a child of the current span; a no-op outside a trace."""
+    trace = _TRACE.get()
+    if trace is None:
+        yield None
+        return
+    parent = _CURRENT_SPAN.get()
+    current = Span(name, parent.span_id if parent else None, attributes)
+    token = _CURRENT_SPAN.set(current)
+    try:
+        yield current
+    finally:
+        current.end_ns = time.time_ns()
+        _CURRENT_SPAN.reset(token)
+        trace.spans.append(current)
+
+
+def server_timing(spans: list[Span]) -> str:
+    """``Server-Timing`` value with the total time spent per span name."""
+    totals: dict[str, list] = {}
+    for recorded in spans:
+        if recorded.parent_id is None:
+            continue
+        total = totals.setdefault(recorded.name.replace(" ", "_"), [0.0, 0])
+        total[0] += recorded.duration_ms
+        total[1] += 1
+    parts = []
+    for name, (duration, count) in totals.items():
+        part = f"{name};dur={duration:.1f}"
+        if count > 1:
+            part += f';desc="{count} calls"'
+        parts.append(part)
+    roots = [recorded for recorded in spans if recorded.parent_id is None]
+    if roots:
+        parts.append(f"total;dur={roots[-1].duration_ms:.1f}")
+    return ", ".join(parts)
+
+
+class TimingMiddleware:
+    """Pure ASGI middleware that traces API requests.
+
+    The root span covers the whole request. ``Server-Timing`` is added when
+    the response starts, so a streamed response only reports the phases
+    finished by then. Finished traces are queued for export when
+    ``TRACE_EXPORT_URL`` is set.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(TRACED_PATH_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+        trace = Trace()
+        trace_token = _TRACE.set(trace)
+        root = Span(f"{scope['method']} {scope['path']}", None, {"http.method": scope["method"]})
+        span_token = _CURRENT_SPAN.set(root)
+
+        async def send_with_timing(message) -> None:
+            if message["type"] == "http.response.start":
+                root.end_ns = time.time_ns()
+                root.attributes["http.status_code"] = message["status"]
+                timing = server_timing(trace.spans + [root])
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timing.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            root.end_ns = time.time_ns()
+            trace.spans.append(root)
+            _CURRENT_SPAN.reset(span_token)
+            _TRACE.reset(trace_token)
+            if TRACE_EXPORT_URL:
+                _EXPORT_QUEUE.append(trace)
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def otlp_payload(traces: list[Trace]) -> dict:
+    """OTLP/HTTP JSON body for ``traces``."""
+    spans = []
+    for trace in traces:
+        for recorded in trace.spans:
+            otlp_span = {
+                "traceId": trace.trace_id,
+                "spanId": recorded.span_id,
+                "name": recorded.name,
+                "kind": 2 if recorded.parent_id is None else 1,
+                "startTimeUnixNano": str(recorded.start_ns),
+                "endTimeUnixNano": str(recorded.end_ns),
+                "attributes": [
+                    {"key": key, "value": _otlp_value(value)}
+                    for key, value in recorded.attributes.items()
+                ],
+            }
+            if recorded.parent_id:
+                otlp_span["parentSpanId"] = recorded.parent_id
+            spans.append(otlp_span)
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        {"key": "service.name", "value": {"stringValue": TRACE_SERVICE_NAME}}
+                    ]
+                },
+                "scopeSpans": [{"scope": {"name": "tracing"}, "spans": spans}],
+            }
+        ]
+    }
+
+
+async def export_pending(client: httpx.AsyncClient) -> int:
+    """Send queued traces to ``TRACE_EXPORT_URL``; returns how many were sent."""
+    traces = []
+    while _EXPORT_QUEUE:
+        traces.append(_EXPORT_QUEUE.popleft())
+    if not traces:
+        return 0
+    try:
+        response = await client.post(TRACE_EXPORT_URL, json=otlp_payload(traces), timeout=5)
+    except httpx.HTTPError as exc:
+        print(f"trace_export_failed traces={len(traces)} error={exc!r}")
+        return 0
+    if response.status_code >= 300:
+        print(f"trace_export_failed traces={len(traces)} status={response.status_code}")
+        return 0
+    return len(traces)
+
+
+async def export_periodically(interval_seconds: float = TRACE_EXPORT_INTERVAL_SECONDS) -> None:
+    """Export queued traces forever; run as a task for the app's lifespan."""
+    async with httpx.AsyncClient() as client:
+        try:
+            while True:
+                await asyncio.sleep(interval_seconds)
+                await export_pending(client)
+        finally:
+            await export_pending(client)
@@ -1,19 +1,123 @@
+import asyncio
+import functools
+import hashlib
 import json
 import os
 import re
+import time
+import unicodedata
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Optional
+from urllib.parse import quote_plus
 
-import requests
+import httpx
 
+from cache import TTLCache
+from circuit_breaker import CircuitBreaker
 from gpt_prompts import BASE_SYSTEM_PROMPT, TARGET_PROMPTS
 from http_session import create_session
+from limiter import ConcurrencyLimiter, Overloaded
+from metrics import Counter, Histogram
+from singleflight import SingleFlight
+from tracing import span
 
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 DEEPL_API_KEY = os.getenv("DEEPL_API_KEY", "")
+OPENAI_CHAT_URL = os.getenv("OPENAI_CHAT_URL", "https://api.openai.com/v1/chat/completions")
+DEEPL_API_URL = os.getenv("DEEPL_API_URL", "https://api-free.deepl.com/v2/translate")
+# DeepL accepts up to 50 texts and 128 KiB of body per request; keep a margin.
+DEEPL_MAX_TEXTS_PER_REQUEST = 50
+DEEPL_MAX_REQUEST_BYTES = 120 * 1024
 
 OPENAI_SESSION = create_session()
 DEEPL_SESSION = create_session()
+OPENAI_BREAKER = CircuitBreaker("openai")
+DEEPL_BREAKER = CircuitBreaker("deepl")
+# Upstream concurrency per provider; callers beyond the queue are turned away
+# instead of piling up behind a slow provider.
+OPENAI_LIMITER = ConcurrencyLimiter.from_env("openai", max_concurrent=32, max_queue=128)
+DEEPL_LIMITER = ConcurrencyLimiter.from_env("deepl", max_concurrent=16, max_queue=256)
+DEEPL_STRUCTURED_LIMITER = ConcurrencyLimiter.from_env(
+    "deepl_structured", max_concurrent=8, max_queue=64
+)
+REQUEST_TIMEOUT = httpx.Timeout(20, connect=3)
+
+PROVIDER_LATENCY = Histogram(
+    "translator_provider_request_seconds", "Provider call latency.", ("provider",)
+)
+PROVIDER_RESPONSES = Counter(
+    "translator_provider_responses_total",
+    "Provider calls by HTTP status (0 for transport errors).",
+    ("provider", "status"),
+)
+TRANSLATIONS = Counter(
+    "translator_translations_total",
+    "Translations by provider and fallback reason.",
+    ("provider_used", "fallback_reason"),
+)
+OPENAI_FINISH_REASONS = Counter(
+    "translator_openai_finish_reason_total", "Finished OpenAI completions.", ("finish_reason",)
+)
+ROUTER_HITS = Counter(
+    "translator_router_term_hits_total", "Router term matches by class.", ("term_class",)
+)
+ROUTER_DECISIONS = Counter(
+    "translator_router_decisions_total", "Router checks by source and outcome.", ("source", "routed")
+)
+DEEPL_CHARACTERS = Counter("translator_deepl_characters_total", "Characters sent to DeepL.")
+
+TRANSLATION_CACHE_MAX_ENTRIES = int(os.getenv("TRANSLATION_CACHE_MAX_ENTRIES", "2000"))
+TRANSLATION_CACHE_MAX_BYTES = int(os.getenv("TRANSLATION_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+TRANSLATION_CACHE_TTL_SECONDS = int(os.getenv("TRANSLATION_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+TRANSLATION_CACHE = TTLCache(
+    "translation",
+    max_entries=TRANSLATION_CACHE_MAX_ENTRIES,
+    ttl_seconds=TRANSLATION_CACHE_TTL_SECONDS,
+    max_bytes=TRANSLATION_CACHE_MAX_BYTES,
+)
+# Inputs longer than the threshold are split into chunks translated concurrently.
+CHUNK_THRESHOLD_CHARS = int(os.getenv("CHUNK_THRESHOLD_CHARS", "2500"))
+CHUNK_MAX_CHARS = int(os.getenv("CHUNK_MAX_CHARS", "1500"))
+
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "") == "1"
+# A fixed delay wins when set; otherwise the delay is learned from recent OpenAI latency.
+HEDGE_DELAY_SECONDS = float(os.getenv("HEDGE_DELAY_SECONDS", "0"))
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.95"))
+HEDGE_INITIAL_DELAY_SECONDS = float(os.getenv("HEDGE_INITIAL_DELAY_SECONDS", "5"))
+HEDGE_MIN_DELAY_SECONDS = float(os.getenv("HEDGE_MIN_DELAY_SECONDS", "1"))
+HEDGE_MIN_SAMPLES = 20
+HEDGE_WINDOW_SIZE = 200
+
+TRANSLATION_FLIGHTS = SingleFlight("translation")
+
+# Batch translation packs short texts for one target into a single chat
+# completion; longer or multi-line texts are translated one by one.
+BATCH_PACK_MAX_ITEMS = int(os.getenv("BATCH_PACK_MAX_ITEMS", "40"))
+BATCH_PACK_MAX_CHARS = int(os.getenv("BATCH_PACK_MAX_CHARS", "4000"))
+BATCH_PACK_ITEM_MAX_CHARS = 500
+# Provider calls one batch may have in flight, well below OPENAI_MAX_QUEUE so
+# a large batch cannot take the whole shared queue from other callers.
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+BATCH_SYSTEM_PROMPT = """
+Batch mode: the user message is a JSON object {"texts": [...]}. Translate every string in "texts" on its own, applying all rules above to each one.
+Respond with ONLY a JSON object {"translations": [...]} with exactly one translation per input string, in the same order.
+For a single string you are unable or unwilling to translate, put exactly [REFUSED] in its place.
+""".strip()
+
+# Fallbacks caused by a transient OpenAI problem are not cached, so the next
+# request gets another chance at the primary provider.
+_CACHEABLE_FALLBACK_REASONS = {None, "nsfw_router", "refusal", "content_filter", "empty", "too_short"}
+
+DEEPL_TARGETS = {
+    "en": "EN",
+    "ru": "RU",
+    "es-es": "ES",
+    "es-latam": "ES",
+    "pt-br": "PT-BR",
+    "pt-pt": "PT-PT",
+}
 
 LIST_LINE_PATTERN = re.compile(
     r"^\s*(\d+[\.\)]|[-•—*]|[A-Za-zА-Яа-я]\))\s+",
@@ -131,20 +235,6 @@ def _letters_ratio(text: str) -> float:
     return letters / total
 
 
-def _compile_term_pattern(term: str) -> re.Pattern:
-    words = term.split()
-    last_word = words[-1]
-    has_wildcard = last_word.endswith("*")
-    if has_wildcard:
-        words[-1] = last_word[:-1]
-    escaped_words = [re.escape(word) for word in words]
-    pattern = r"\b" + r"\s+".join(escaped_words)
-    if has_wildcard:
-        pattern += r"\w*"
-    pattern += r"\b"
-    return re.compile(pattern, re.IGNORECASE)
-
-
 def _remove_inverted_punctuation(text: str) -> str:
     """Remove inverted Spanish punctuation marks for casual messaging."""
     text = text.replace('¿', '')
@@ -152,8 +242,86 @@ def _remove_inverted_punctuation(text: str) -> str:
     return text
 
 
-STRONG_PATTERNS_STT = [(_term, _compile_term_pattern(_term)) for _term in STRONG_TERMS_STT]
-WEAK_PATTERNS_STT = [(_term, _compile_term_pattern(_term)) for _term in WEAK_TERMS_STT]
+class _WordNode:
+    __slots__ = ("children", "prefixes", "terms")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _WordNode] = {}
+        self.prefixes: dict[str, _CharNode] = {}
+        self.terms: list[tuple[str, str]] = []
+
+
+class _CharNode:
+    __slots__ = ("children", "terms")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _CharNode] = {}
+        self.terms: list[tuple[str, str]] = []
+
+
+class TermMatcher:
+    """Finds every router term in a single scan of normalized text.
+
+    Terms are stored in a trie keyed by whole words, so multi-word terms
+    such as "blow job" follow consecutive tokens. A trailing ``*`` turns the
+    last word into a prefix, held in a per-node character trie that is
+    walked along the token. Input must already be normalized by
+    ``_normalize_router_text`` (lowercase, only word characters and
+    whitespace), which makes whitespace-separated tokens exactly the spans
+    between ``\\b`` boundaries.
+    """
+
+    def __init__(self, terms_by_class: dict[str, list[str]]) -> None:
+        self._root = _WordNode()
+        self._classes = list(terms_by_class)
+        for term_class, terms in terms_by_class.items():
+            for term in terms:
+                self._add(term_class, term)
+
+    def _add(self, term_class: str, term: str) -> None:
+        words = term.lower().split()
+        node = self._root
+        for word in words[:-1]:
+            node = node.children.setdefault(word, _WordNode())
+        last_word = words[-1]
+        if last_word.endswith("*"):
+            char_nodes = node.prefixes
+            char_node = None
+            for char in last_word[:-1]:
+                char_node = char_nodes.setdefault(char, _CharNode())
+                char_nodes = char_node.children
+            char_node.terms.append((term_class, term))
+        else:
+            node = node.children.setdefault(last_word, _WordNode())
+            node.terms.append((term_class, term))
+
+    def match(self, normalized: str) -> dict[str, set[str]]:
+        hits: dict[str, set[str]] = {term_class: set() for term_class in self._classes}
+        tokens = normalized.split()
+        root = self._root
+        for start in range(len(tokens)):
+            node = root
+            position = start
+            while node is not None and position < len(tokens):
+                token = tokens[position]
+                if node.prefixes:
+                    char_nodes = node.prefixes
+                    for char in token:
+                        char_node = char_nodes.get(char)
+                        if char_node is None:
+                            break
+                        for term_class, term in char_node.terms:
+                            hits[term_class].add(term)
+                        char_nodes = char_node.children
+                node = node.children.get(token)
+                if node is not None:
+                    for term_class, term in node.terms:
+                        hits[term_class].add(term)
+                position += 1
+        return hits
+
+
+ROUTER_MATCHER = TermMatcher({"strong": STRONG_TERMS_STT, "weak": WEAK_TERMS_STT})
 
 
 def _route_by_terms(text: str, source: str, min_len: int, min_ratio: float) -> bool:
@@ -163,17 +331,21 @@ def _route_by_terms(text: str, source: str, min_len: int, min_ratio: float) -> b
                 f"router_source={source} router_score=0 router_threshold={THRESHOLD_STT} "
                 "router_hits=[] strong=[] weak=[]"
             )
+        ROUTER_DECISIONS.inc(source, False)
         return False
 
-    normalized = _normalize_router_text(text)
-    strong_hits = sorted({t for t, p in STRONG_PATTERNS_STT if p.search(normalized)})
-    weak_hits = sorted({t for t, p in WEAK_PATTERNS_STT if p.search(normalized)})
+    hits = ROUTER_MATCHER.match(_normalize_router_text(text))
+    strong_hits = sorted(hits["strong"])
+    weak_hits = sorted(hits["weak"])
     matched_terms = sorted(set(strong_hits) | set(weak_hits))
     score = len(strong_hits) * 2 + len(weak_hits)
+    ROUTER_HITS.inc("strong", amount=len(strong_hits))
+    ROUTER_HITS.inc("weak", amount=len(weak_hits))
 
     should_route = score >= THRESHOLD_STT or (
         len(strong_hits) >= 1 and (len(strong_hits) + len(weak_hits)) >= 2
     )
+    ROUTER_DECISIONS.inc(source, should_route)
     if should_route or os.getenv("DEBUG_ROUTER") == "1":
         print(
             f"router_source={source} "
@@ -205,20 +377,66 @@ def _count_nonempty_lines(lines: list[str]) -> int:
     return sum(1 for line in lines if line.strip())
 
 
-def deepl_translate(text: str, target_lang: str) -> dict:
+def _deepl_overloaded() -> dict:
+    return {
+        "ok": False,
+        "status_code": 503,
+        "error": "DeepL error",
+        "status": 0,
+        "details": "overloaded",
+    }
+
+
+async def deepl_translate_many(texts: list[str], target_lang: str) -> dict:
+    """Translate several texts in one DeepL request; ``texts`` come back in order."""
+    try:
+        async with DEEPL_LIMITER.slot():
+            return await _deepl_translate_guarded(texts, target_lang)
+    except Overloaded:
+        return _deepl_overloaded()
+
+
+async def _deepl_translate_guarded(texts: list[str], target_lang: str) -> dict:
+    if not DEEPL_BREAKER.allow():
+        return {
+            "ok": False,
+            "status_code": 503,
+            "error": "DeepL error",
+            "status": 0,
+            "details": "circuit_open",
+        }
+    started = time.monotonic()
+    result = None
     try:
-        deepl_response = DEEPL_SESSION.post(
-            "https://api-free.deepl.com/v2/translate",
+        with span("deepl", texts=len(texts), target=target_lang):
+            result = await _deepl_request(texts, target_lang)
+    finally:
+        if result is None:
+            DEEPL_BREAKER.abandon()
+        else:
+            elapsed = time.monotonic() - started
+            DEEPL_BREAKER.record(result["ok"], elapsed)
+            PROVIDER_LATENCY.observe(elapsed, "deepl")
+            PROVIDER_RESPONSES.inc("deepl", 200 if result["ok"] else result.get("status", 0))
+    return result
+
+
+async def _deepl_request(texts: list[str], target_lang: str) -> dict:
+    DEEPL_CHARACTERS.inc(amount=sum(len(text) for text in texts))
+    try:
+        deepl_response = await DEEPL_SESSION.post(
+            DEEPL_API_URL,
             headers={"Authorization": f"DeepL-Auth-Key {DEEPL_API_KEY}"},
             data={
-                "text": text,
+                "text": texts,
                 "target_lang": target_lang,
                 "preserve_formatting": "1",
                 "split_sentences": "nonewlines",
             },
-            timeout=(3, 20),
+            timeout=REQUEST_TIMEOUT,
+            extensions={"span_name": "deepl"},
         )
-    except requests.RequestException as exc:
+    except httpx.HTTPError as exc:
         return {
             "ok": False,
             "status_code": 502,
@@ -238,11 +456,11 @@ def deepl_translate(text: str, target_lang: str) -> dict:
 
     try:
         deepl_data = deepl_response.json()
-        deepl_translated = deepl_data["translations"][0]["text"]
-    except (KeyError, IndexError, TypeError, json.JSONDecodeError):
-        deepl_translated = ""
+        deepl_translated = [item["text"] for item in deepl_data["translations"]]
+    except (KeyError, TypeError, json.JSONDecodeError):
+        deepl_translated = []
 
-    if not deepl_translated:
+    if len(deepl_translated) != len(texts) or not all(deepl_translated):
         return {
             "ok": False,
             "status_code": 502,
@@ -253,21 +471,66 @@ def deepl_translate(text: str, target_lang: str) -> dict:
     return {
         "ok": True,
         "status_code": 200,
-        "text": deepl_translated,
+        "texts": deepl_translated,
     }
 
 
-def deepl_translate_structured(text: str, target_lang: str) -> dict:
+async def deepl_translate(text: str, target_lang: str) -> dict:
+    result = await deepl_translate_many([text], target_lang)
+    if not result["ok"]:
+        return result
+    return {
+        "ok": True,
+        "status_code": 200,
+        "text": result["texts"][0],
+    }
+
+
+def _pack_deepl_batches(texts: list[str]) -> list[list[int]]:
+    """Group text indices into as few requests as DeepL's per-request limits allow."""
+    batches: list[list[int]] = []
+    current: list[int] = []
+    current_bytes = 0
+    for index, text in enumerate(texts):
+        # Each value is sent form-encoded as ``&text=<value>``.
+        size = len(quote_plus(text)) + 6
+        if current and (
+            len(current) >= DEEPL_MAX_TEXTS_PER_REQUEST
+            or current_bytes + size > DEEPL_MAX_REQUEST_BYTES
+        ):
+            batches.append(current)
+            current = []
+            current_bytes = 0
+        current.append(index)
+        current_bytes += size
+    if current:
+        batches.append(current)
+    return batches
+
+
+async def deepl_translate_structured(text: str, target_lang: str) -> dict:
+    try:
+        async with DEEPL_STRUCTURED_LIMITER.slot():
+            return await _deepl_translate_lines(text, target_lang)
+    except Overloaded:
+        return _deepl_overloaded()
+
+
+async def _deepl_translate_lines(text: str, target_lang: str) -> dict:
     lines = text.splitlines(keepends=False)
-    translated_lines = []
-    for line in lines:
-        if not line.strip():
-            translated_lines.append(line)
-            continue
-        result = deepl_translate(line, target_lang)
+    positions = [index for index, line in enumerate(lines) if line.strip()]
+    texts = [lines[index] for index in positions]
+    batches = _pack_deepl_batches(texts)
+    results = await asyncio.gather(
+        *(deepl_translate_many([texts[i] for i in batch], target_lang) for batch in batches)
+    )
+
+    translated_lines = list(lines)
+    for batch, result in zip(batches, results):
         if not result["ok"]:
             return result
-        translated_lines.append(result["text"])
+        for i, translated in zip(batch, result["texts"]):
+            translated_lines[positions[i]] = translated
 
     return {
         "ok": True,
@@ -276,34 +539,257 @@ def deepl_translate_structured(text: str, target_lang: str) -> dict:
     }
 
 
-def translate_core(text: str, target: str, source: str = "text") -> dict:
+def _translation_cache_key(text: str, target: str, source: str) -> tuple:
+    normalized = unicodedata.normalize("NFC", text).strip()
+    text_hash = hashlib.sha256(normalized.encode("utf-8")).digest()
+    prompt = f"{BASE_SYSTEM_PROMPT}\n{TARGET_PROMPTS[target]}"
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).digest()[:16]
+    return (text_hash, target, source, OPENAI_MODEL, prompt_hash)
+
+
+def _is_cacheable(result: dict) -> bool:
+    return bool(result.get("ok")) and result.get("fallback_reason") in _CACHEABLE_FALLBACK_REASONS
+
+
+async def translate_core(text: str, target: str, source: str = "text") -> dict:
     if target not in TARGET_PROMPTS:
+        return await _translate_uncached(text, target, source)
+
+    cache_key = _translation_cache_key(text, target, source)
+    if TRANSLATION_CACHE.enabled:
+        cached = TRANSLATION_CACHE.get(cache_key)
+        if cached is not None:
+            print(f"provider_used={cached['provider_used']} cache=hit")
+            return {**cached, "cached": True}
+
+    # Concurrent identical requests share one upstream call; each caller
+    # gets its own copy because callers mutate the result.
+    result = await TRANSLATION_FLIGHTS.do(
+        cache_key, lambda: _translate_and_store(cache_key, text, target, source)
+    )
+    return dict(result)
+
+
+async def _translate_and_store(cache_key: tuple, text: str, target: str, source: str) -> dict:
+    result = await _translate_uncached(text, target, source)
+    _store_in_cache(cache_key, text, result)
+    return result
+
+
+def _store_in_cache(cache_key: tuple, text: str, result: dict) -> None:
+    if TRANSLATION_CACHE.enabled and _is_cacheable(result):
+        size = len(text.encode("utf-8")) + len(result["text"].encode("utf-8"))
+        TRANSLATION_CACHE.set(cache_key, dict(result), size=size)
+    if result.get("ok"):
+        result["cached"] = False
+
+
+async def translate_many(text: str, targets: list[str], source: str = "text") -> dict[str, dict]:
+    """Translate ``text`` into every target concurrently; results are keyed by target."""
+    unique_targets = list(dict.fromkeys(targets))
+    results = await asyncio.gather(
+        *(translate_core(text, target, source=source) for target in unique_targets)
+    )
+    return dict(zip(unique_targets, results))
+
+
+async def translate_batch(items: list[tuple[str, str]], source: str = "text") -> list[dict]:
+    """Translate ``(text, target)`` pairs; results come back in input order.
+
+    Short single-line texts for the same target share one chat completion
+    and fall back to DeepL together in multi-text requests. Every item is
+    still validated, cached and falls back on its own.
+    """
+    unique = list(dict.fromkeys(items))
+    results: dict[tuple[str, str], dict] = {}
+    packed: dict[tuple[str, Optional[str]], list[str]] = {}
+    singles: list[tuple[str, str]] = []
+    for text, target in unique:
+        if target not in TARGET_PROMPTS or _target_error(target):
+            singles.append((text, target))
+            continue
+        if TRANSLATION_CACHE.enabled:
+            cached = TRANSLATION_CACHE.get(_translation_cache_key(text, target, source))
+            if cached is not None:
+                results[(text, target)] = {**cached, "cached": True}
+                continue
+        if len(text) > BATCH_PACK_ITEM_MAX_CHARS or "\n" in text:
+            singles.append((text, target))
+            continue
+        # Texts the router sends straight to DeepL are grouped by that reason.
+        packed.setdefault((target, _primary_skip_reason(text, source)), []).append(text)
+
+    gate = asyncio.Semaphore(max(1, BATCH_MAX_CONCURRENCY))
+
+    async def gated(job: Callable[[], Awaitable]):
+        async with gate:
+            return await job()
+
+    jobs = []
+    job_targets = []
+    for (target, skip_reason), texts in packed.items():
+        for group in _pack_openai_batches(texts):
+            job_targets.append(target)
+            if skip_reason:
+                jobs.append(functools.partial(_deepl_batch, group, target, skip_reason, None, None))
+            else:
+                jobs.append(functools.partial(_openai_batch, group, target))
+    single_results, packed_results = await asyncio.gather(
+        asyncio.gather(
+            *(
+                gated(functools.partial(translate_core, text, target, source=source))
+                for text, target in singles
+            )
+        ),
+        asyncio.gather(*(gated(job) for job in jobs)),
+    )
+    results.update(zip(singles, single_results))
+    alone = []
+    for target, by_text in zip(job_targets, packed_results):
+        for text, result in by_text.items():
+            if result is None:
+                alone.append((text, target))
+                continue
+            _store_in_cache(_translation_cache_key(text, target, source), text, result)
+            results[(text, target)] = result
+    alone_results = await asyncio.gather(
+        *(
+            gated(functools.partial(translate_core, text, target, source=source))
+            for text, target in alone
+        )
+    )
+    results.update(zip(alone, alone_results))
+    return [dict(results[item]) for item in items]
+
+
+def _pack_openai_batches(texts: list[str]) -> list[list[str]]:
+    batches: list[list[str]] = []
+    current: list[str] = []
+    current_chars = 0
+    for text in texts:
+        if current and (
+            len(current) >= BATCH_PACK_MAX_ITEMS or current_chars + len(text) > BATCH_PACK_MAX_CHARS
+        ):
+            batches.append(current)
+            current = []
+            current_chars = 0
+        current.append(text)
+        current_chars += len(text)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _openai_batch_body(packed_text: str, target: str) -> dict:
+    body = _openai_body(packed_text, target)
+    body["messages"][0]["content"] += f"\n\n{BATCH_SYSTEM_PROMPT}"
+    body["response_format"] = {"type": "json_object"}
+    return body
+
+
+def _parse_batch_translations(content: str, expected: int) -> Optional[list[str]]:
+    try:
+        translations = json.loads(content)["translations"]
+    except (json.JSONDecodeError, KeyError, TypeError):
+        return None
+    if not isinstance(translations, list) or len(translations) != expected:
+        return None
+    if not all(isinstance(item, str) for item in translations):
+        return None
+    return translations
+
+
+async def _openai_batch(texts: list[str], target: str) -> dict[str, Optional[dict]]:
+    """Results per text; None marks texts to translate on their own."""
+    packed_text = json.dumps({"texts": texts}, ensure_ascii=False)
+    openai = await _openai_translate(packed_text, target, _openai_batch_body(packed_text, target))
+    finish_reason = openai["finish_reason"]
+    if openai["fallback_reason"] in ("refusal", "content_filter"):
+        # Likely one text's fault; a shared verdict must not be cached for the others.
+        print(f"openai_batch_{openai['fallback_reason']} target={target} items={len(texts)}")
+        return {text: None for text in texts}
+    translations = _parse_batch_translations(openai["text"], len(texts)) if openai["text"] else None
+    if translations is None:
+        reason = openai["fallback_reason"] or ("batch_mismatch" if openai["text"] else None)
+        return await _deepl_batch(texts, target, reason, finish_reason, openai["error"])
+
+    results: dict[str, dict] = {}
+    retry: dict[str, list[str]] = {}
+    with span("quality", items=len(texts)):
+        for text, translated in zip(texts, translations):
+            translated = translated.strip()
+            if translated == "[REFUSED]":
+                reason = "refusal"
+            elif not translated:
+                reason = "empty"
+            else:
+                reason = _quality_fallback_reason(text, translated)
+            if reason:
+                retry.setdefault(reason, []).append(text)
+            else:
+                results[text] = _openai_result(translated, target, finish_reason)
+    for reason, failed in retry.items():
+        results.update(await _deepl_batch(failed, target, reason, finish_reason, None))
+    return results
+
+
+async def _deepl_batch(
+    texts: list[str],
+    target: str,
+    fallback_reason: Optional[str],
+    finish_reason: Optional[str],
+    openai_error: Optional[dict],
+) -> dict[str, dict]:
+    """DeepL fallback for several texts at once, in as few requests as DeepL allows."""
+    if not fallback_reason:
+        fallback_reason = "openai_error"
+    print(f"provider_used=deepl fallback_reason={fallback_reason} items={len(texts)}")
+    TRANSLATIONS.inc("deepl", fallback_reason, amount=len(texts))
+    if not DEEPL_API_KEY:
+        failure = _missing_deepl_key(openai_error)
         return {
-            "ok": False,
-            "status_code": 400,
-            "error": "Unsupported target",
-            "details": "unsupported_target",
-            "provider_used": None,
-        }
-    deepl_target = {
-        "en": "EN",
-        "ru": "RU",
-        "es-es": "ES",
-        "es-latam": "ES",
-        "pt-br": "PT-BR",
-        "pt-pt": "PT-PT",
-    }.get(target)
-    if deepl_target is None:
-        return {
-            "ok": False,
-            "status_code": 400,
-            "error": "Unsupported target",
-            "details": "unsupported_deepl_target",
-            "provider_used": None,
+            text: _deepl_fallback_result(failure, target, fallback_reason, finish_reason)
+            for text in texts
         }
+    batches = _pack_deepl_batches(texts)
+    deepl_target = DEEPL_TARGETS[target]
+    responses = await asyncio.gather(
+        *(deepl_translate_many([texts[i] for i in batch], deepl_target) for batch in batches)
+    )
+    results = {}
+    for batch, response in zip(batches, responses):
+        for position, index in enumerate(batch):
+            if response["ok"]:
+                deepl_result = {"ok": True, "status_code": 200, "text": response["texts"][position]}
+            else:
+                deepl_result = response
+            results[texts[index]] = _deepl_fallback_result(
+                deepl_result, target, fallback_reason, finish_reason
+            )
+    return results
 
+
+def _unsupported_target(details: str) -> dict:
+    return {
+        "ok": False,
+        "status_code": 400,
+        "error": "Unsupported target",
+        "details": details,
+        "provider_used": None,
+    }
+
+
+def _target_error(target: str) -> Optional[dict]:
+    if target not in TARGET_PROMPTS:
+        return _unsupported_target("unsupported_target")
+    if target not in DEEPL_TARGETS:
+        return _unsupported_target("unsupported_deepl_target")
+    return None
+
+
+def _openai_body(text: str, target: str) -> dict:
     system_prompt = f"{TARGET_PROMPTS[target]}\n\n{BASE_SYSTEM_PROMPT}"
-    body = {
+    return {
         "model": OPENAI_MODEL,
         "temperature": 0,
         "messages": [
@@ -312,121 +798,209 @@ def translate_core(text: str, target: str, source: str = "text") -> dict:
         ],
     }
 
-    translated = ""
-    openai_error = None
-    finish_reason = None
-    fallback_reason = None
-    use_deepl_only = should_use_deepl(text, source)
-    if use_deepl_only:
-        fallback_reason = "nsfw_router"
-    else:
-        if not OPENAI_API_KEY:
-            fallback_reason = "missing_openai_api_key"
-        else:
-            try:
-                response = OPENAI_SESSION.post(
-                    "https://api.openai.com/v1/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {OPENAI_API_KEY}",
-                        "Content-Type": "application/json",
-                    },
-                    json=body,
-                    timeout=(3, 20),
-                )
-                if response.status_code != 200:
-                    openai_error = {
-                        "status": response.status_code,
-                        "details": response.text[:1000],
-                    }
-                else:
-                    try:
-                        data = response.json()
-                    except json.JSONDecodeError:
-                        openai_error = {"status": response.status_code, "details": "json"}
-                    else:
-                        if data.get("error"):
-                            openai_error = {
-                                "status": response.status_code,
-                                "details": str(data.get("error")),
-                            }
-                        else:
-                            try:
-                                choice = data["choices"][0]
-                                translated = choice["message"]["content"].strip()
-                                finish_reason = choice.get("finish_reason")
-                                if translated == "[REFUSED]":
-                                    translated = ""
-                                    fallback_reason = "refusal"
-                                    print(f"openai_refusal target={target} text_preview={text[:80]!r}")
-                                else:
-                                    if finish_reason == "content_filter":
-                                        translated = ""
-                                        openai_error = {
-                                            "status": response.status_code,
-                                            "details": "content_filter",
-                                        }
-                                        fallback_reason = "content_filter"
-                                    elif not translated:
-                                        fallback_reason = "empty"
-                            except (KeyError, IndexError, TypeError):
-                                translated = ""
-                                finish_reason = None
-                                openai_error = {
-                                    "status": response.status_code,
-                                    "details": "malformed response",
-                                }
-            except requests.RequestException as exc:
-                openai_error = {"status": 0, "details": str(exc)}
-
-    if translated:
-        if len(text) > 80 and len(translated) < 12:
-            fallback_reason = "too_short"
-            translated = ""
-        elif len(text) > 120 and len(translated) < int(len(text) * 0.08):
-            fallback_reason = "too_short"
-            translated = ""
-        else:
-            # Post-process: remove inverted punctuation for Spanish
-            if target in ("es-es", "es-latam"):
-                translated = _remove_inverted_punctuation(translated)
-            
-            print("provider_used=openai fallback_reason=None")
-            return {
-                "ok": True,
-                "status_code": 200,
-                "text": translated,
-                "provider": "openai",
-                "provider_used": "openai",
-                "fallback_reason": None,
-                "openai_finish_reason": finish_reason,
-            }
 
-    if not translated and not fallback_reason:
-        fallback_reason = "openai_error"
+def _openai_headers() -> dict:
+    return {
+        "Authorization": f"Bearer {OPENAI_API_KEY}",
+        "Content-Type": "application/json",
+    }
 
-    if not translated:
-        print(f"provider_used=deepl fallback_reason={fallback_reason}")
 
-    if not DEEPL_API_KEY:
+def _openai_outcome(
+    content: str, finish_reason: Optional[str], status: int, text: str, target: str
+) -> dict:
+    """Apply the refusal/content-filter/empty rules to a finished completion."""
+    OPENAI_FINISH_REASONS.inc(finish_reason)
+    translated = content.strip()
+    if translated == "[REFUSED]":
+        print(f"openai_refusal target={target} text_preview={text[:80]!r}")
+        return {"text": "", "finish_reason": finish_reason, "fallback_reason": "refusal", "error": None}
+    if finish_reason == "content_filter":
         return {
-            "ok": False,
-            "status_code": 502,
-            "error": "DEEPL_API_KEY is missing",
-            "status": (openai_error or {}).get("status", 0),
-            "details": (openai_error or {}).get("details", ""),
-            "provider_used": "deepl",
-            "fallback_reason": fallback_reason,
-            "openai_finish_reason": finish_reason,
+            "text": "",
+            "finish_reason": finish_reason,
+            "fallback_reason": "content_filter",
+            "error": {"status": status, "details": "content_filter"},
         }
+    if not translated:
+        return {"text": "", "finish_reason": finish_reason, "fallback_reason": "empty", "error": None}
+    return {"text": translated, "finish_reason": finish_reason, "fallback_reason": None, "error": None}
+
 
-    lines = text.splitlines()
-    nonempty_lines = _count_nonempty_lines(lines)
-    use_structured = is_structured_text(text) and nonempty_lines <= 60
-    if use_structured:
-        deepl_result = deepl_translate_structured(text, deepl_target)
+def _openai_failure(status: int, details: str) -> dict:
+    return {
+        "text": "",
+        "finish_reason": None,
+        "fallback_reason": None,
+        "error": {"status": status, "details": details},
+    }
+
+
+def _circuit_open_failure() -> dict:
+    return {
+        "text": "",
+        "finish_reason": None,
+        "fallback_reason": "circuit_open",
+        "error": {"status": 0, "details": "circuit_open"},
+    }
+
+
+def _overloaded_failure() -> dict:
+    return {
+        "text": "",
+        "finish_reason": None,
+        "fallback_reason": "overloaded",
+        "error": {"status": 0, "details": "overloaded"},
+    }
+
+
+def _record_openai_health(
+    outcome: Optional[dict], started: float, responsive_seconds: Optional[float] = None
+) -> None:
+    """``responsive_seconds``, when given, is what the breaker judges slowness by."""
+    if outcome is None:
+        OPENAI_BREAKER.abandon()
+        return
+    error = outcome["error"]
+    # A content-filtered answer is still a healthy provider.
+    success = error is None or error["details"] == "content_filter"
+    elapsed = time.monotonic() - started
+    OPENAI_BREAKER.record(success, elapsed if responsive_seconds is None else responsive_seconds)
+    PROVIDER_LATENCY.observe(elapsed, "openai")
+    PROVIDER_RESPONSES.inc("openai", 200 if error is None else error["status"])
+
+
+async def _openai_translate(text: str, target: str, body: Optional[dict] = None) -> dict:
+    try:
+        async with OPENAI_LIMITER.slot():
+            return await _openai_translate_guarded(text, target, body)
+    except Overloaded:
+        return _overloaded_failure()
+
+
+async def _openai_translate_guarded(text: str, target: str, body: Optional[dict] = None) -> dict:
+    if not OPENAI_BREAKER.allow():
+        return _circuit_open_failure()
+    started = time.monotonic()
+    outcome = None
+    try:
+        with span("openai", target=target):
+            outcome = await _openai_request(text, target, body)
+    finally:
+        _record_openai_health(outcome, started)
+    return outcome
+
+
+async def _openai_request(text: str, target: str, body: Optional[dict] = None) -> dict:
+    try:
+        response = await OPENAI_SESSION.post(
+            OPENAI_CHAT_URL,
+            headers=_openai_headers(),
+            json=body or _openai_body(text, target),
+            timeout=REQUEST_TIMEOUT,
+            extensions={"span_name": "openai"},
+        )
+    except httpx.HTTPError as exc:
+        return _openai_failure(0, str(exc))
+    if response.status_code != 200:
+        return _openai_failure(response.status_code, response.text[:1000])
+    try:
+        data = response.json()
+    except json.JSONDecodeError:
+        return _openai_failure(response.status_code, "json")
+    if data.get("error"):
+        return _openai_failure(response.status_code, str(data.get("error")))
+    try:
+        choice = data["choices"][0]
+        content = choice["message"]["content"]
+        finish_reason = choice.get("finish_reason")
+        return _openai_outcome(content, finish_reason, response.status_code, text, target)
+    except (KeyError, IndexError, TypeError, AttributeError):
+        return _openai_failure(response.status_code, "malformed response")
+
+
+def _quality_fallback_reason(text: str, translated: str) -> Optional[str]:
+    if len(text) > 80 and len(translated) < 12:
+        return "too_short"
+    if len(text) > 120 and len(translated) < int(len(text) * 0.08):
+        return "too_short"
+    return None
+
+
+def _postprocess(translated: str, target: str) -> str:
+    # Post-process: remove inverted punctuation for Spanish
+    if target in ("es-es", "es-latam"):
+        return _remove_inverted_punctuation(translated)
+    return translated
+
+
+def _openai_result(translated: str, target: str, finish_reason: Optional[str]) -> dict:
+    print("provider_used=openai fallback_reason=None")
+    TRANSLATIONS.inc("openai", None)
+    return {
+        "ok": True,
+        "status_code": 200,
+        "text": _postprocess(translated, target),
+        "provider": "openai",
+        "provider_used": "openai",
+        "fallback_reason": None,
+        "openai_finish_reason": finish_reason,
+    }
+
+
+async def _deepl_fallback(
+    text: str,
+    target: str,
+    fallback_reason: Optional[str],
+    finish_reason: Optional[str],
+    openai_error: Optional[dict],
+) -> dict:
+    if not fallback_reason:
+        fallback_reason = "openai_error"
+    _count_deepl(fallback_reason)
+    return await _deepl_translate_fallback(text, target, fallback_reason, finish_reason, openai_error)
+
+
+def _count_deepl(fallback_reason: str) -> None:
+    print(f"provider_used=deepl fallback_reason={fallback_reason}")
+    TRANSLATIONS.inc("deepl", fallback_reason)
+
+
+async def _deepl_translate_fallback(
+    text: str,
+    target: str,
+    fallback_reason: str,
+    finish_reason: Optional[str],
+    openai_error: Optional[dict],
+) -> dict:
+    """The DeepL half of :func:`_deepl_fallback`, without counting the translation."""
+    if not DEEPL_API_KEY:
+        deepl_result = _missing_deepl_key(openai_error)
     else:
-        deepl_result = deepl_translate(text, deepl_target)
+        deepl_target = DEEPL_TARGETS[target]
+        lines = text.splitlines()
+        nonempty_lines = _count_nonempty_lines(lines)
+        use_structured = is_structured_text(text) and nonempty_lines <= 60
+        if use_structured:
+            deepl_result = await deepl_translate_structured(text, deepl_target)
+        else:
+            deepl_result = await deepl_translate(text, deepl_target)
+    return _deepl_fallback_result(deepl_result, target, fallback_reason, finish_reason)
+
+
+def _missing_deepl_key(openai_error: Optional[dict]) -> dict:
+    return {
+        "ok": False,
+        "status_code": 502,
+        "error": "DEEPL_API_KEY is missing",
+        "status": (openai_error or {}).get("status", 0),
+        "details": (openai_error or {}).get("details", ""),
+    }
 
+
+def _deepl_fallback_result(
+    deepl_result: dict, target: str, fallback_reason: str, finish_reason: Optional[str]
+) -> dict:
     if not deepl_result["ok"]:
         return {
             "ok": False,
@@ -439,18 +1013,414 @@ def translate_core(text: str, target: str, source: str = "text") -> dict:
             "openai_finish_reason": finish_reason,
         }
 
-    deepl_translated = deepl_result["text"]
-    
-    # Post-process: remove inverted punctuation for Spanish
-    if target in ("es-es", "es-latam"):
-        deepl_translated = _remove_inverted_punctuation(deepl_translated)
-
     return {
         "ok": True,
         "status_code": 200,
-        "text": deepl_translated,
+        "text": _postprocess(deepl_result["text"], target),
         "provider": "deepl",
         "provider_used": "deepl",
         "fallback_reason": fallback_reason,
         "openai_finish_reason": finish_reason,
     }
+
+
+def _primary_skip_reason(text: str, source: str) -> Optional[str]:
+    """Reason to go straight to DeepL without asking OpenAI, if any."""
+    if should_use_deepl(text, source):
+        return "nsfw_router"
+    if not OPENAI_API_KEY:
+        return "missing_openai_api_key"
+    return None
+
+
+class LatencyWindow:
+    """Sliding window of recent latencies for percentile estimates."""
+
+    def __init__(self, size: int) -> None:
+        self._samples: deque[float] = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(fraction * len(ordered)))
+        return ordered[index]
+
+
+OPENAI_LATENCY = LatencyWindow(HEDGE_WINDOW_SIZE)
+HEDGE_STATS = {
+    "fired": 0,
+    "won_by_openai": 0,
+    "won_by_deepl": 0,
+    "deepl_chars": 0,
+    "wasted_deepl_chars": 0,
+}
+
+
+def hedge_delay() -> float:
+    """Seconds to wait for OpenAI before starting a speculative DeepL request."""
+    if HEDGE_DELAY_SECONDS > 0:
+        return HEDGE_DELAY_SECONDS
+    if len(OPENAI_LATENCY) < HEDGE_MIN_SAMPLES:
+        return HEDGE_INITIAL_DELAY_SECONDS
+    return max(HEDGE_MIN_DELAY_SECONDS, OPENAI_LATENCY.percentile(HEDGE_PERCENTILE))
+
+
+def hedge_stats() -> dict:
+    return {
+        **HEDGE_STATS,
+        "enabled": HEDGE_ENABLED,
+        "delay_seconds": round(hedge_delay(), 3),
+        "openai_latency_p50": OPENAI_LATENCY.percentile(0.5),
+        "openai_latency_p95": OPENAI_LATENCY.percentile(0.95),
+    }
+
+
+async def _openai_attempt(text: str, target: str) -> dict:
+    """OpenAI call plus quality checks; ``result`` is set when the answer is usable."""
+    started = time.monotonic()
+    try:
+        openai = await _openai_translate(text, target)
+    except asyncio.CancelledError:
+        # Abandoned for a hedge that won: the call took at least this long.
+        OPENAI_LATENCY.record(time.monotonic() - started)
+        raise
+    # Failures such as overloaded or circuit_open return at once and would
+    # drag the learned hedge delay down; only real answers are samples.
+    if openai["error"] is None:
+        OPENAI_LATENCY.record(time.monotonic() - started)
+    openai["result"] = None
+    if openai["text"]:
+        with span("quality"):
+            openai["fallback_reason"] = _quality_fallback_reason(text, openai["text"])
+        if not openai["fallback_reason"]:
+            openai["result"] = _openai_result(openai["text"], target, openai["finish_reason"])
+    return openai
+
+
+async def _translate_uncached(text: str, target: str, source: str) -> dict:
+    target_error = _target_error(target)
+    if target_error:
+        return target_error
+
+    with span("router", source=source):
+        fallback_reason = _primary_skip_reason(text, source)
+    if fallback_reason:
+        return await _deepl_fallback(text, target, fallback_reason, None, None)
+
+    if len(text) > CHUNK_THRESHOLD_CHARS:
+        chunks = split_into_chunks(text, CHUNK_MAX_CHARS)
+        if len(chunks) > 1:
+            return await _translate_chunked(chunks, target)
+    return await _translate_via_openai(text, target)
+
+
+async def _translate_via_openai(text: str, target: str) -> dict:
+    if HEDGE_ENABLED and DEEPL_API_KEY:
+        return await _translate_hedged(text, target)
+
+    openai = await _openai_attempt(text, target)
+    if openai["result"]:
+        return openai["result"]
+    return await _deepl_fallback(
+        text, target, openai["fallback_reason"], openai["finish_reason"], openai["error"]
+    )
+
+
+# Boundaries to split long text at, from most to least preferred. Each
+# separator stays attached to the text before it.
+_CHUNK_BOUNDARIES = [
+    re.compile(r"\n[ \t]*\n\s*"),
+    re.compile(r"\n"),
+    re.compile(r"(?<=[.!?…])\s+"),
+    re.compile(r"\s+"),
+]
+
+
+def _split_at(text: str, pattern: re.Pattern) -> list[str]:
+    pieces = []
+    position = 0
+    for match in pattern.finditer(text):
+        if match.end() > position:
+            pieces.append(text[position:match.end()])
+            position = match.end()
+    if position < len(text):
+        pieces.append(text[position:])
+    return pieces
+
+
+def _split_units(text: str, max_chars: int, level: int = 0) -> list[str]:
+    if len(text) <= max_chars:
+        return [text]
+    if level == len(_CHUNK_BOUNDARIES):
+        return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+    units = []
+    for piece in _split_at(text, _CHUNK_BOUNDARIES[level]):
+        units.extend(_split_units(piece, max_chars, level + 1))
+    return units
+
+
+def split_into_chunks(text: str, max_chars: int) -> list[str]:
+    """Split ``text`` into chunks of at most ``max_chars`` at paragraph, line or
+    sentence boundaries; ``"".join(chunks) == text``."""
+    chunks: list[str] = []
+    current = ""
+    for unit in _split_units(text, max_chars):
+        if current and len(current) + len(unit) > max_chars:
+            chunks.append(current)
+            current = ""
+        current += unit
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+async def _translate_chunked(chunks: list[str], target: str) -> dict:
+    """Translate chunks concurrently, each with its own DeepL fallback."""
+    parts = []
+    for chunk in chunks:
+        core = chunk.strip()
+        start = len(chunk) - len(chunk.lstrip())
+        parts.append((chunk[:start], core, chunk[start + len(core):]))
+
+    async def translate_part(core: str) -> Optional[dict]:
+        if not core:
+            return None
+        return await _translate_via_openai(core, target)
+
+    results = await asyncio.gather(*(translate_part(core) for _, core, _ in parts))
+    translated_results = [result for result in results if result is not None]
+    for result in translated_results:
+        if not result["ok"]:
+            return result
+
+    text = "".join(
+        leading + (result["text"] if result else "") + trailing
+        for (leading, _, trailing), result in zip(parts, results)
+    )
+    providers = {result["provider_used"] for result in translated_results}
+    fallback_reasons = [r["fallback_reason"] for r in translated_results if r["fallback_reason"]]
+    finish_reasons = [r["openai_finish_reason"] for r in translated_results if r["openai_finish_reason"]]
+    provider = providers.pop() if len(providers) == 1 else "mixed"
+    print(f"chunked_translation chunks={len(translated_results)} provider_used={provider}")
+    return {
+        "ok": True,
+        "status_code": 200,
+        "text": text,
+        "provider": provider,
+        "provider_used": provider,
+        "fallback_reason": fallback_reasons[0] if fallback_reasons else None,
+        "openai_finish_reason": next(
+            (reason for reason in finish_reasons if reason != "stop"),
+            finish_reasons[0] if finish_reasons else None,
+        ),
+        "chunks": [
+            {
+                "chars": len(core),
+                "provider_used": result["provider_used"],
+                "fallback_reason": result["fallback_reason"],
+            }
+            for (_, core, _), result in zip(parts, results)
+            if result is not None
+        ],
+    }
+
+
+async def _translate_hedged(text: str, target: str) -> dict:
+    """Start DeepL alongside a slow OpenAI call; the first acceptable answer wins."""
+    openai_task = asyncio.create_task(_openai_attempt(text, target))
+    done, _ = await asyncio.wait({openai_task}, timeout=hedge_delay())
+    if done:
+        openai = openai_task.result()
+        if openai["result"]:
+            return openai["result"]
+        return await _deepl_fallback(
+            text, target, openai["fallback_reason"], openai["finish_reason"], openai["error"]
+        )
+
+    print(f"hedge_fired target={target} chars={len(text)}")
+    HEDGE_STATS["fired"] += 1
+    HEDGE_STATS["deepl_chars"] += len(text)
+    # Not counted in TRANSLATIONS unless its result is the one returned.
+    deepl_task = asyncio.create_task(
+        _deepl_translate_fallback(text, target, "hedged", None, None)
+    )
+    try:
+        done, _ = await asyncio.wait({openai_task, deepl_task}, return_when=asyncio.FIRST_COMPLETED)
+        if openai_task not in done and deepl_task.result()["ok"]:
+            openai_task.cancel()
+            HEDGE_STATS["won_by_deepl"] += 1
+            _count_deepl("hedged")
+            return deepl_task.result()
+
+        openai = await openai_task
+        if openai["result"]:
+            deepl_task.cancel()
+            HEDGE_STATS["won_by_openai"] += 1
+            HEDGE_STATS["wasted_deepl_chars"] += len(text)
+            return openai["result"]
+        openai_first = not deepl_task.done()
+        result = await deepl_task
+        if result["ok"]:
+            HEDGE_STATS["won_by_deepl"] += 1
+        if openai_first:
+            # OpenAI gave up before DeepL answered, so its reason is the real one.
+            result["fallback_reason"] = openai["fallback_reason"] or "openai_error"
+        result["openai_finish_reason"] = openai["finish_reason"]
+        _count_deepl(result["fallback_reason"])
+        return result
+    finally:
+        openai_task.cancel()
+        deepl_task.cancel()
+
+
+def _streamable_text(content: str) -> str:
+    """Part of a partial completion that is safe to show.
+
+    Output is held back while it could still turn out to be the
+    ``[REFUSED]`` sentinel, and leading whitespace is dropped as in the
+    non-streaming path.
+    """
+    visible = content.lstrip()
+    if "[REFUSED]".startswith(visible.rstrip()):
+        return ""
+    return visible
+
+
+async def _openai_translate_stream(text: str, target: str) -> AsyncIterator[dict]:
+    """Yield ``delta`` events as tokens arrive, then one ``outcome`` event."""
+    try:
+        await OPENAI_LIMITER.acquire()
+    except Overloaded:
+        yield {"event": "outcome", "outcome": _overloaded_failure()}
+        return
+    try:
+        if not OPENAI_BREAKER.allow():
+            yield {"event": "outcome", "outcome": _circuit_open_failure()}
+            return
+        started = time.monotonic()
+        # A long text streams for longer than the slow-call limit, and the
+        # total includes time the consumer spends between events; the breaker
+        # judges the stream by how soon OpenAI started answering instead.
+        first_event = None
+        outcome = None
+        try:
+            async for event in _openai_stream_events(text, target):
+                if first_event is None:
+                    first_event = time.monotonic() - started
+                if event["event"] == "outcome":
+                    outcome = event["outcome"]
+                yield event
+        finally:
+            _record_openai_health(outcome, started, first_event)
+    finally:
+        OPENAI_LIMITER.release()
+
+
+async def _openai_stream_events(text: str, target: str) -> AsyncIterator[dict]:
+    body = {**_openai_body(text, target), "stream": True}
+    content = ""
+    sent = 0
+    finish_reason = None
+    try:
+        async with OPENAI_SESSION.stream(
+            "POST",
+            OPENAI_CHAT_URL,
+            headers=_openai_headers(),
+            json=body,
+            timeout=REQUEST_TIMEOUT,
+            extensions={"span_name": "openai"},
+        ) as response:
+            if response.status_code != 200:
+                details = (await response.aread()).decode("utf-8", "replace")[:1000]
+                yield {"event": "outcome", "outcome": _openai_failure(response.status_code, details)}
+                return
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                payload = line[len("data:"):].strip()
+                if payload == "[DONE]":
+                    break
+                try:
+                    chunk = json.loads(payload)
+                except json.JSONDecodeError:
+                    yield {"event": "outcome", "outcome": _openai_failure(response.status_code, "json")}
+                    return
+                if chunk.get("error"):
+                    failure = _openai_failure(response.status_code, str(chunk.get("error")))
+                    yield {"event": "outcome", "outcome": failure}
+                    return
+                choices = chunk.get("choices") or []
+                if not choices:
+                    continue
+                finish_reason = choices[0].get("finish_reason") or finish_reason
+                content += (choices[0].get("delta") or {}).get("content") or ""
+                visible = _streamable_text(content)
+                if len(visible) > sent and finish_reason != "content_filter":
+                    yield {"event": "delta", "text": _postprocess(visible[sent:], target)}
+                    sent = len(visible)
+    except httpx.HTTPError as exc:
+        yield {"event": "outcome", "outcome": _openai_failure(0, str(exc))}
+        return
+    yield {
+        "event": "outcome",
+        "outcome": _openai_outcome(content, finish_reason, 200, text, target),
+    }
+
+
+async def translate_core_stream(text: str, target: str, source: str = "text") -> AsyncIterator[dict]:
+    """Streaming variant of :func:`translate_core`.
+
+    Yields ``delta`` events with partial OpenAI output, a ``reset`` event when
+    that output is retracted because the translation falls back to DeepL, and
+    a final ``done`` event whose ``result`` is what translate_core returns.
+    """
+    target_error = _target_error(target)
+    if target_error:
+        yield {"event": "done", "result": target_error}
+        return
+
+    cache_key = None
+    if TRANSLATION_CACHE.enabled:
+        cache_key = _translation_cache_key(text, target, source)
+        cached = TRANSLATION_CACHE.get(cache_key)
+        if cached is not None:
+            print(f"provider_used={cached['provider_used']} cache=hit")
+            yield {"event": "done", "result": {**cached, "cached": True}}
+            return
+
+    with span("router", source=source):
+        fallback_reason = _primary_skip_reason(text, source)
+    if fallback_reason:
+        result = await _deepl_fallback(text, target, fallback_reason, None, None)
+    else:
+        openai = _openai_failure(0, "stream ended without outcome")
+        emitted = False
+        async for event in _openai_translate_stream(text, target):
+            if event["event"] == "outcome":
+                openai = event["outcome"]
+                continue
+            emitted = True
+            yield event
+        result = None
+        fallback_reason = openai["fallback_reason"]
+        if openai["text"]:
+            fallback_reason = _quality_fallback_reason(text, openai["text"])
+            if not fallback_reason:
+                result = _openai_result(openai["text"], target, openai["finish_reason"])
+        if result is None:
+            if emitted:
+                yield {"event": "reset", "reason": fallback_reason or "openai_error"}
+            result = await _deepl_fallback(
+                text, target, fallback_reason, openai["finish_reason"], openai["error"]
+            )
+
+    if cache_key is not None:
+        _store_in_cache(cache_key, text, result)
+    yield {"event": "done", "result": result}
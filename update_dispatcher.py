@@ -0,0 +1,162 @@
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from metrics import Counter
+
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_UPDATES = Counter(
+    "translator_webhook_updates_total",
+    "Webhook updates by outcome.",
+    ("outcome",),
+)
+
+QUEUED = "queued"
+DUPLICATE = "duplicate"
+REJECTED = "rejected"
+
+
+def chat_key(payload: dict) -> Optional[Hashable]:
+    """Chat (or, failing that, user) an update belongs to, read from the raw payload."""
+    for field, value in payload.items():
+        if field == "update_id" or not isinstance(value, dict):
+            continue
+        chat = value.get("chat") or (value.get("message") or {}).get("chat")
+        if isinstance(chat, dict) and "id" in chat:
+            return ("chat", chat["id"])
+        sender = value.get("from") or value.get("user")
+        if isinstance(sender, dict) and "id" in sender:
+            return ("user", sender["id"])
+    return None
+
+
+class UpdateDispatcher:
+    """Processes webhook updates on a fixed pool of workers.
+
+    Updates of one chat run strictly in arrival order; different chats run
+    in parallel. :meth:`submit` never blocks: it returns ``REJECTED`` once
+    ``max_queue`` updates are waiting, and ``DUPLICATE`` for an
+    ``update_id`` seen among the last ``dedup_window`` accepted updates
+    (Telegram redelivers when an ack is slow or lost).
+    """
+
+    def __init__(
+        self,
+        process: Callable[[dict], Awaitable[Any]],
+        workers: int,
+        max_queue: int,
+        dedup_window: int,
+    ) -> None:
+        self._process = process
+        self.workers = workers
+        self.max_queue = max_queue
+        self.dedup_window = dedup_window
+        self._seen: "OrderedDict[int, None]" = OrderedDict()
+        # Chats with pending updates; each appears in _ready (or is being
+        # processed by a worker) exactly once, which keeps a chat serial.
+        self._chats: dict[Hashable, deque] = {}
+        self._ready: Optional[asyncio.Queue] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._tasks: list[asyncio.Task] = []
+        self._closing = False
+        self.queued = 0
+        self.active = 0
+        self.processed = 0
+        self.failed = 0
+        self.duplicates = 0
+        self.rejected = 0
+
+    def start(self) -> None:
+        self._ready = asyncio.Queue()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    def submit(self, payload: dict) -> str:
+        update_id = payload.get("update_id")
+        if isinstance(update_id, int) and update_id in self._seen:
+            self.duplicates += 1
+            WEBHOOK_UPDATES.inc("duplicate")
+            return DUPLICATE
+        if self._closing or self._ready is None or self.queued >= self.max_queue:
+            self.rejected += 1
+            WEBHOOK_UPDATES.inc("rejected")
+            return REJECTED
+        if isinstance(update_id, int):
+            self._seen[update_id] = None
+            if len(self._seen) > self.dedup_window:
+                self._seen.popitem(last=False)
+        key = chat_key(payload)
+        if key is None:
+            key = ("update", update_id if update_id is not None else id(payload))
+        pending = self._chats.get(key)
+        if pending is None:
+            self._chats[key] = deque([payload])
+            self._ready.put_nowait(key)
+        else:
+            pending.append(payload)
+        self.queued += 1
+        self._idle.clear()
+        return QUEUED
+
+    async def _work(self) -> None:
+        while True:
+            key = await self._ready.get()
+            pending = self._chats[key]
+            payload = pending.popleft()
+            self.queued -= 1
+            self.active += 1
+            try:
+                await self._process(payload)
+                self.processed += 1
+                WEBHOOK_UPDATES.inc("processed")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.failed += 1
+                WEBHOOK_UPDATES.inc("failed")
+                logger.exception("Webhook update %s failed", payload.get("update_id"))
+            finally:
+                self.active -= 1
+                if pending:
+                    # Back of the line, so a busy chat cannot starve the others.
+                    self._ready.put_nowait(key)
+                else:
+                    del self._chats[key]
+                    if not self._chats:
+                        self._idle.set()
+
+    async def drain(self, timeout: float) -> bool:
+        """Stop accepting updates, finish queued ones for up to ``timeout`` seconds, then stop.
+
+        Returns False when updates were still pending at the deadline.
+        """
+        self._closing = True
+        drained = True
+        if self._idle is not None:
+            try:
+                await asyncio.wait_for(self._idle.wait(), timeout)
+            except asyncio.TimeoutError:
+                drained = False
+                logger.warning("Webhook drain timed out with %s updates queued", self.queued)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        return drained
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queued": self.queued,
+            "active": self.active,
+            "chats": len(self._chats),
+            "max_queue": self.max_queue,
+            "processed": self.processed,
+            "failed": self.failed,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+        }